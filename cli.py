@@ -0,0 +1,286 @@
+import os
+import sys
+import glob
+import json
+import queue
+import signal
+import argparse
+import platform
+
+# این ماژول هیچ بخشی از Qt را وارد نمی‌کند تا روی سرورهای بدون نمایشگر اجرا شود
+from merge_job import (DEFAULT_SETTINGS, VIDEO_EXTENSIONS, IMAGE_EXTENSIONS, job_settings, estimate_job_cost,
+                       is_merge_output)
+from job_manifest import manifest_path
+from engine import Engine, JobSpec
+from job_queue import JobQueue
+from folder_watcher import FolderWatcher
+
+
+# مقادیر مجاز تنظیماتی که فقط چند حالت مشخص دارند
+SETTING_CHOICES = {
+    "output_resolution": ["original", "480p", "720p", "1080p"],
+    "sort_method": ["date", "name", "capture_time", "custom"],
+    "output_path_type": ["same_folder", "fixed_folder", "ask_user"],
+    "queue_policy": ["shortest_first", "fifo"],
+    "scaling_mode": ["fit", "fill", "stretch"],
+}
+
+# نام‌های کوتاه‌تر برای تنظیمات پرکاربرد
+SETTING_ALIASES = {
+    "max_concurrent_jobs": ["-j", "--workers"],
+}
+
+
+def default_cache_dir():
+    """پوشه کش برنامه در پوشه کش سیستم؛ همان پوشه نسخه گرافیکی (GenericCacheLocation در Qt)"""
+    system = platform.system()
+    if system == "Windows":
+        cache_home = os.path.join(os.environ.get("LOCALAPPDATA", os.path.expanduser("~")), "cache")
+    elif system == "Darwin":
+        cache_home = os.path.expanduser("~/Library/Caches")
+    else:
+        cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "Stellar")
+
+
+def build_parser():
+    """ساخت پارامترهای خط فرمان؛ برای هر تنظیم برنامه یک گزینه با همان مقدار پیش‌فرض"""
+    parser = argparse.ArgumentParser(
+        prog="stellar-cli",
+        description="ادغام ویدیوها و تصاویر پوشه‌ها بدون رابط گرافیکی؛ پیشرفت به‌صورت JSON در هر خط چاپ می‌شود")
+    parser.add_argument("folders", nargs="*",
+                        help="مسیر پوشه‌ها یا الگوی glob پوشه‌ها (مثلاً '/data/*/DCIM')؛ با --watch-folder اختیاری است")
+    parser.add_argument("--overwrite", action="store_true", help="بازنویسی فایل خروجی موجود (در غیر این صورت آن پوشه لغو می‌شود)")
+    parser.add_argument("--cache-dir", default=default_cache_dir(), help="پوشه فایل‌های کش (پیش‌فرض: %(default)s)")
+
+    settings_group = parser.add_argument_group("تنظیمات")
+    for key, default in DEFAULT_SETTINGS.items():
+        names = SETTING_ALIASES.get(key, []) + ["--" + key.replace("_", "-")]
+        if isinstance(default, bool):
+            settings_group.add_argument(*names, dest=key, default=default, action=argparse.BooleanOptionalAction)
+        else:
+            settings_group.add_argument(*names, dest=key, default=default, type=type(default),
+                                        choices=SETTING_CHOICES.get(key), help="پیش‌فرض: %(default)s")
+    return parser
+
+
+def expand_folders(patterns):
+    """تبدیل مسیرها و الگوهای glob به فهرست پوشه‌های بدون تکرار (به ترتیب ورود)"""
+    folders = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = sorted(path for path in glob.glob(os.path.expanduser(pattern)) if os.path.isdir(path))
+        else:
+            # مسیر نامعتبر هم به صف می‌رود تا خطای آن مانند بقیه پوشه‌ها گزارش شود
+            matches = [os.path.expanduser(pattern)]
+        for path in matches:
+            folder = os.path.abspath(path)
+            if folder not in folders:
+                folders.append(folder)
+    return folders
+
+
+class BatchJob:
+    """یک پوشه در صف خط فرمان همراه با کار آن در موتور"""
+
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self.handle = None  # کنترل کار در موتور (پس از شروع)
+        self.result = None  # (موفقیت، پیام) پس از پایان کار
+        self.rerun_pending = False  # فایل‌های جدید در حین پردازش رسیده‌اند
+
+
+def _interrupt(signum, frame):
+    """تبدیل SIGTERM به KeyboardInterrupt تا کارها مانند Ctrl+C لغو و پاک‌سازی شوند"""
+    raise KeyboardInterrupt()
+
+
+class BatchRunner:
+    """اجرای گروهی پوشه‌ها با همان موتور ادغام و زمان‌بندی صف نسخه گرافیکی"""
+
+    def __init__(self, folders, values, cache_dir, overwrite=False, out=None):
+        self.values = dict(values)
+        self.cache_dir = cache_dir
+        self.overwrite = overwrite
+        self.out = out or sys.stdout
+        # چاپ‌های متنی پردازه‌های کار به stderr می‌روند تا stdout فقط شامل رویدادهای JSON باشد
+        self.engine = Engine(stdout_to_stderr=True)
+        self.events = queue.Queue()  # رویدادهای موتور و پایش پوشه برای رسیدگی در ترد اصلی
+        self.folders = folders
+        self.jobs = {}  # پوشه -> آخرین کار آن
+        self.queue = JobQueue(self.values["max_concurrent_jobs"], self.values["queue_policy"],
+                              estimate_fn=self._estimate_cost)
+        self.watcher = None
+        self.cancelled = False
+
+    def emit(self, event, folder_path=None, **fields):
+        """چاپ یک رویداد به‌صورت یک خط JSON"""
+        record = {"event": event}
+        if folder_path is not None:
+            record["folder"] = folder_path
+        record.update(fields)
+        self.out.write(json.dumps(record) + "\n")
+        self.out.flush()
+
+    def _estimate_cost(self, job):
+        """برآورد هزینه پوشه یک کار برای ترتیب صف"""
+        return estimate_job_cost(job.folder_path, job_settings(self.values, self.cache_dir))["cost"]
+
+    def _forward(self, job, name):
+        """callback موتور که رویداد را برای رسیدگی به ترد اصلی می‌فرستد"""
+        return lambda handle, *args: self.events.put((job, name, args))
+
+    def add_folder(self, folder_path):
+        """افزودن یک پوشه به صف (پوشه در حال پردازش پس از پایان دوباره اجرا می‌شود)"""
+        job = self.jobs.get(folder_path)
+        if job is not None and job in self.queue.running:
+            job.rerun_pending = True
+            return
+        if job is not None and job in self.queue.queue:
+            return
+        job = self.jobs[folder_path] = BatchJob(folder_path)
+        self.queue.add(job)
+        self.emit("queued", folder_path)
+
+    def start_watching(self, root):
+        """پایش یک درخت پوشه و افزودن خودکار پوشه‌هایی که بارگذاری فایل‌هایشان تمام شده است"""
+        settings = job_settings(self.values, self.cache_dir)
+        self.watcher = FolderWatcher(
+            root,
+            on_ready=lambda folder: self.events.put((None, "folder_ready", (folder,))),
+            extensions=VIDEO_EXTENSIONS + IMAGE_EXTENSIONS,
+            settle_seconds=self.values["watch_settle_seconds"],
+            ignore=lambda file_path: is_merge_output(file_path, settings))
+        self.watcher.start()
+        self.emit("watching", os.path.abspath(root))
+
+    def stop_watching(self):
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+
+    def start_ready(self):
+        """شروع کارهای صف تا جایی که ظرفیت و هسته آزاد وجود دارد"""
+        for job, share in self.queue.take_ready():
+            spec = JobSpec(job.folder_path, job_settings(self.values, self.cache_dir, share))
+            job.handle = self.engine.submit(
+                spec,
+                on_progress=self._forward(job, "progress"),
+                on_stage=self._forward(job, "stage"),
+                on_finished=self._forward(job, "finished"),
+                on_output_exists=self._forward(job, "output_exists"),
+                on_ask_output_path=self._forward(job, "ask_output_path"))
+            self.emit("started", job.folder_path, cpu_share=share)
+
+    def finish(self, job, success, message):
+        """ثبت نتیجه یک کار (فقط اولین نتیجه)"""
+        if job.result is None:
+            job.result = (success, message)
+            self.emit("finished", job.folder_path, success=success, message=message)
+
+    def cancel_all(self):
+        """لغو همه کارها: کارهای صف اجرا نمی‌شوند و کارهای در حال اجرا فرمان لغو دریافت می‌کنند"""
+        self.cancelled = True
+        self.stop_watching()
+        for job in list(self.queue.queue):
+            self.queue.remove(job)
+            self.finish(job, False, "عملیات لغو شد")
+        for job in self.queue.running:
+            job.rerun_pending = False
+            job.handle.cancel()
+
+    def terminate(self):
+        """بستن فوری پردازه‌های کار و همه زیرپردازه‌هایشان (با وقفه دوم)"""
+        for job in self.queue.running:
+            process = job.handle.process
+            if process.exitcode is not None:
+                continue
+            if hasattr(os, "killpg"):
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except OSError:
+                    pass
+            else:
+                process.kill()
+
+    def handle(self, job, name, args):
+        """پاسخ به یک رویداد کار"""
+        if name == "progress":
+            self.emit("progress", job.folder_path, percent=round(args[0], 1))
+        elif name == "stage":
+            self.emit("stage", job.folder_path, stage=args[0])
+        elif name == "folder_ready":
+            self.add_folder(args[0])
+            self.start_ready()
+        elif name == "output_exists":
+            # در حالت پایش، خروجی قبلی خود برنامه با فایل‌های جدید دوباره ساخته می‌شود
+            overwrite = self.overwrite or bool(self.watcher and os.path.exists(manifest_path(args[0])))
+            if not overwrite:
+                # بدون تایید کاربر، فایل موجود دست نمی‌خورد
+                self.emit("skipped", job.folder_path, output=args[0], reason="output_exists")
+            job.handle.confirm_overwrite(overwrite)
+        elif name == "ask_output_path":
+            # پرسش مسیر در خط فرمان ممکن نیست؛ فایل در همان پوشه ذخیره می‌شود
+            job.handle.set_output_path(os.path.join(job.folder_path, args[0]))
+        elif name == "finished":
+            self.finish(job, args[0], args[1])
+            self.queue.remove(job)
+            if job.rerun_pending:
+                self.add_folder(job.folder_path)
+            if not self.cancelled:
+                self.start_ready()
+
+    def run(self, watch_folder=None):
+        """اجرای همه پوشه‌ها تا پایان (یا با پایش پوشه تا وقفه)؛ تعداد کارهای ناموفق را برمی‌گرداند"""
+        for folder in self.folders:
+            self.add_folder(folder)
+        if watch_folder:
+            self.start_watching(watch_folder)
+        self.start_ready()
+
+        while self.watcher or self.queue.running or self.queue.queue:
+            try:
+                self.handle(*self.events.get())
+            except KeyboardInterrupt:
+                if self.cancelled:
+                    self.terminate()
+                    raise
+                self.cancel_all()
+
+        # انتظار برای بسته شدن پردازه‌های کار پیش از خروج
+        for job in self.jobs.values():
+            if job.handle:
+                job.handle.wait()
+        failed = len([job for job in self.jobs.values() if not job.result[0]])
+        self.emit("summary", succeeded=len(self.jobs) - failed, failed=failed)
+        return failed
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    folders = expand_folders(args.folders)
+    if not folders and not args.watch_folder:
+        print("هیچ پوشه‌ای با الگوهای داده شده پیدا نشد", file=sys.stderr)
+        return 2
+    if args.watch_folder and not os.path.isdir(args.watch_folder):
+        print(f"پوشه پایش وجود ندارد: {args.watch_folder}", file=sys.stderr)
+        return 2
+
+    values = {key: getattr(args, key) for key in DEFAULT_SETTINGS}
+    os.makedirs(args.cache_dir, exist_ok=True)
+
+    # رویدادهای JSON تنها خروجی stdout هستند؛ چاپ‌های متنی برنامه به stderr می‌روند
+    out = sys.stdout
+    sys.stdout = sys.stderr
+    signal.signal(signal.SIGTERM, _interrupt)
+
+    runner = BatchRunner(folders, values, args.cache_dir, overwrite=args.overwrite, out=out)
+    try:
+        failed = runner.run(args.watch_folder)
+    except KeyboardInterrupt:
+        return 130
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
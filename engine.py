@@ -0,0 +1,233 @@
+import os
+import sys
+import threading
+import multiprocessing
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+from merge_job import DEFAULT_SETTINGS, MergeJob, job_settings, run_job_process
+
+
+# مشخصات ثابت یک کار ادغام: پوشه ورودی و تنظیمات (JobSettings)
+JobSpec = namedtuple("JobSpec", ["folder_path", "settings"])
+
+# رویداد کار -> نام callback متناظر
+EVENT_CALLBACKS = {
+    "progress_updated": "on_progress",  # (handle, percent)
+    "stage_updated": "on_stage",  # (handle, stage_description)
+    "process_finished": "on_finished",  # (handle, success, message)
+    "check_output_file": "on_output_exists",  # (handle, output_file_path)
+    "ask_output_path": "on_ask_output_path",  # (handle, default_filename)
+}
+
+
+def job_spec(folder_path, cache_dir, cpu_share=None, **overrides):
+    """ساخت مشخصات یک کار از تنظیمات پیش‌فرض و مقادیر تغییر یافته (مثلاً output_resolution="720p")"""
+    unknown = sorted(set(overrides) - set(DEFAULT_SETTINGS))
+    if unknown:
+        raise ValueError(f"تنظیم ناشناخته: {', '.join(unknown)}")
+    values = dict(DEFAULT_SETTINGS, **overrides)
+    return JobSpec(folder_path, job_settings(values, cache_dir, cpu_share))
+
+
+class JobHandle(ABC):
+    """کنترل یک کار ادغام و رساندن رویدادهای آن به callbackها
+
+    callbackها ممکن است از ترد دیگری فراخوانی شوند. پاسخ پرسش‌ها (بازنویسی فایل موجود، مسیر خروجی)
+    می‌تواند همان لحظه یا بعداً با confirm_overwrite، set_output_path یا cancel داده شود.
+    بدون callback، فایل موجود بازنویسی نمی‌شود و خروجی در همان پوشه ذخیره می‌شود.
+    """
+
+    def __init__(self, spec, callbacks):
+        unknown = sorted(set(callbacks) - set(EVENT_CALLBACKS.values()))
+        if unknown:
+            raise TypeError(f"callback ناشناخته: {', '.join(unknown)}")
+        self.spec = spec
+        self.callbacks = callbacks
+        self.result = None  # (موفقیت، پیام) پس از پایان کار
+        self.finished = threading.Event()
+
+    @property
+    def folder_path(self):
+        return self.spec.folder_path
+
+    def dispatch(self, message):
+        """رساندن یک رویداد کار به callback متناظر"""
+        name, folder_path, *args = message
+        if name == "process_finished":
+            if self.result is not None:
+                return
+            self.result = tuple(args)
+        callback = self.callbacks.get(EVENT_CALLBACKS.get(name))
+        if callback:
+            callback(self, *args)
+        elif name == "check_output_file":
+            self.cancel()
+        elif name == "ask_output_path":
+            self.set_output_path(os.path.join(folder_path, args[0]))
+
+    @abstractmethod
+    def send_command(self, command, *args):
+        """رساندن یک فرمان کنترلی (CONTROL_COMMANDS) به کار"""
+
+    def cancel(self):
+        """لغو کار"""
+        self.send_command("cancel")
+
+    def pause(self):
+        """توقف موقت کار"""
+        self.send_command("pause")
+
+    def resume(self):
+        """ادامه کار متوقف شده"""
+        self.send_command("resume")
+
+    def confirm_overwrite(self, confirmed=True):
+        """پاسخ به پرسش بازنویسی فایل خروجی موجود"""
+        if confirmed:
+            self.send_command("set_overwrite_confirmed", True)
+        else:
+            self.cancel()
+
+    def set_output_path(self, path):
+        """پاسخ به پرسش مسیر فایل خروجی"""
+        self.send_command("set_output_filename", path)
+
+    def wait(self, timeout=None):
+        """انتظار برای پایان کار؛ (موفقیت، پیام) یا None در صورت پایان مهلت"""
+        if not self.finished.wait(timeout):
+            return None
+        return self.result
+
+
+class LocalJob(JobHandle):
+    """اجرای یک کار در همین پردازه، مثلاً درون پردازه‌های کاری یک سرویس دیگر"""
+
+    def __init__(self, spec, callbacks):
+        super().__init__(spec, callbacks)
+        self.job = MergeJob(spec.folder_path, spec.settings, self.dispatch)
+
+    def send_command(self, command, *args):
+        getattr(self.job, command)(*args)
+
+    def run(self):
+        """اجرای کامل کار در ترد فعلی؛ (موفقیت، پیام) برمی‌گرداند"""
+        try:
+            self.job.run()
+        finally:
+            self.finished.set()
+        return self.result
+
+
+def run_job(spec, **callbacks):
+    """اجرای کامل یک کار در همین پردازه و ترد؛ (موفقیت، پیام) برمی‌گرداند"""
+    return LocalJob(spec, callbacks).run()
+
+
+class ProcessJob(JobHandle):
+    """کاری که در پردازه جداگانه اجرا می‌شود؛ در توقف، خود پردازه کار زیرپردازه‌هایش را متوقف می‌کند"""
+
+    def __init__(self, spec, callbacks, process, control_queue):
+        super().__init__(spec, callbacks)
+        self.process = process
+        self.control_queue = control_queue
+
+    def send_command(self, command, *args):
+        self.control_queue.put((command,) + args)
+
+    def process_exited(self):
+        """پایان پردازه کار (حتی غیرمنتظره)"""
+        self.control_queue.put(None)
+        self.process.join()
+        try:
+            self.dispatch(("process_finished", self.folder_path, False,
+                           f"پردازه پردازش به‌طور غیرمنتظره متوقف شد (کد {self.process.exitcode})"))
+        finally:
+            self.finished.set()
+
+
+class _JobEvents:
+    """ارسال رویدادهای یک کار همراه با شناسه آن در صف رویدادهای مشترک موتور"""
+
+    def __init__(self, job_id, event_queue):
+        self.job_id = job_id
+        self.event_queue = event_queue
+
+    def put(self, message):
+        self.event_queue.put((self.job_id, message))
+
+
+def _run_engine_job(job_id, spec, event_queue, control_queue, stdout_to_stderr):
+    """نقطه شروع پردازه کار موتور"""
+    if stdout_to_stderr:
+        # چاپ‌های متنی کار (و زیرپردازه‌هایش) خروجی ماشین‌خوان برنامه میزبان را خراب نکنند
+        sys.stdout.flush()
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    run_job_process(spec.folder_path, spec.settings, _JobEvents(job_id, event_queue), control_queue)
+
+
+class Engine:
+    """اجرای کارهای ادغام در پردازه‌های جداگانه
+
+    رویدادهای همه کارها از یک صف مشترک خوانده و در یک ترد توزیع به callbackها رسانده می‌شوند.
+    """
+
+    def __init__(self, stdout_to_stderr=False):
+        # پردازه‌ها به‌صورت spawn ساخته می‌شوند تا fork از برنامه چندتردی رخ ندهد
+        self.context = multiprocessing.get_context("spawn")
+        self.stdout_to_stderr = stdout_to_stderr
+        self.event_queue = None
+        self.dispatcher = None
+        self.jobs = {}  # شناسه -> کار در حال اجرا
+        self.next_id = 0
+        self.lock = threading.Lock()
+
+    def submit(self, spec, **callbacks):
+        """شروع یک کار در پردازه جداگانه؛ JobHandle آن را برمی‌گرداند
+
+        callbackها: on_progress، on_stage، on_finished، on_output_exists و on_ask_output_path
+        (همه در ترد توزیع موتور فراخوانی می‌شوند).
+        """
+        with self.lock:
+            if self.dispatcher is None:
+                self.event_queue = self.context.Queue()
+                self.dispatcher = threading.Thread(target=self._dispatch_events, daemon=True)
+                self.dispatcher.start()
+            job_id = self.next_id
+            self.next_id += 1
+
+        control_queue = self.context.Queue()
+        process = self.context.Process(
+            target=_run_engine_job,
+            args=(job_id, spec, self.event_queue, control_queue, self.stdout_to_stderr))
+        handle = ProcessJob(spec, callbacks, process, control_queue)
+        self.jobs[job_id] = handle
+        process.start()
+        # پایان پردازه (حتی غیرمنتظره) با یک پیام None در صف رویدادها اعلام می‌شود
+        threading.Thread(target=self._watch_process, args=(job_id, process), daemon=True).start()
+        return handle
+
+    def _watch_process(self, job_id, process):
+        """انتظار برای پایان پردازه کار و اعلام آن به ترد توزیع"""
+        process.join()
+        self.event_queue.put((job_id, None))
+
+    def _dispatch_events(self):
+        """توزیع رویدادهای همه کارها به callbackهای آن‌ها"""
+        while True:
+            try:
+                job_id, message = self.event_queue.get()
+            except (EOFError, OSError):
+                # صف رویدادها هنگام خروج برنامه بسته شده است
+                return
+            handle = self.jobs.get(job_id)
+            if handle is None:
+                continue
+            try:
+                if message is None:
+                    del self.jobs[job_id]
+                    handle.process_exited()
+                else:
+                    handle.dispatch(message)
+            except Exception as e:
+                print(f"خطا در رسیدگی به رویداد کار {handle.folder_path}: {e}")
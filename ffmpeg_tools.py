@@ -0,0 +1,315 @@
+import os
+import re
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+
+
+# نام استریم خروجی هر انکودر، برای مقایسه با کدک فایل‌های ورودی
+ENCODER_CODEC_NAMES = {
+    "libx264": "h264",
+    "libx265": "hevc",
+    "mpeg4": "mpeg4",
+    "libvpx": "vp8",
+    "libvpx-vp9": "vp9",
+}
+
+AUDIO_ENCODER_CODEC_NAMES = {
+    "aac": "aac",
+    "mp3": "mp3",
+    "libvorbis": "vorbis",
+    "libopus": "opus",
+}
+
+# پروفایل‌هایی که انکودرهای x264/x265 با همین نام می‌پذیرند
+ENCODER_PROFILES = {
+    "baseline": "baseline",
+    "constrained baseline": "baseline",
+    "main": "main",
+    "high": "high",
+    "main 10": "main10",
+}
+
+# کدک‌هایی که ffmpeg هنگام چسباندن، پارامترهای جدید (SPS/PPS) هر قطعه را درون استریم تکرار می‌کند
+SEGMENT_JOIN_CODECS = ("h264", "hevc")
+
+
+# در حالت نرخ فریم متغیر، هر تصویر ثابت فقط با یک فریم در هر ثانیه ذخیره می‌شود
+STILL_VFR_FPS = 1
+# فاصله فریم‌های کلیدی تصویر ثابت در حالت نرخ فریم متغیر (برای جابه‌جایی سریع در پخش)
+STILL_VFR_KEYINT = 5
+
+
+class FFmpegError(Exception):
+    """خطای اجرای ffmpeg یا خواندن اطلاعات فایل"""
+
+
+def get_ffmpeg_binary():
+    """مسیر فایل اجرایی ffmpeg (همان نسخه‌ای که moviepy استفاده می‌کند)"""
+    try:
+        from moviepy.config import get_setting
+        return get_setting("FFMPEG_BINARY")
+    except Exception:
+        return "ffmpeg"
+
+
+def _popen_params():
+    """پارامترهای مشترک اجرای زیرپردازه"""
+    params = {"stdin": subprocess.DEVNULL}
+    # جلوگیری از باز شدن پنجره کنسول در ویندوز
+    if os.name == "nt":
+        params["creationflags"] = 0x08000000  # CREATE_NO_WINDOW
+    return params
+
+
+def _split_fields(text):
+    """جدا کردن فیلدهای یک خط استریم با کاما (بدون شکستن پرانتزها)"""
+    fields = []
+    depth = 0
+    current = ""
+    for char in text:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            fields.append(current.strip())
+            current = ""
+        else:
+            current += char
+    if current.strip():
+        fields.append(current.strip())
+    return fields
+
+
+def _parse_rate(value):
+    """تبدیل مقادیری مثل 29.97 یا 90k به عدد"""
+    value = value.strip()
+    if value.endswith("k"):
+        return float(value[:-1]) * 1000
+    return float(value)
+
+
+def empty_media_info(kind="video"):
+    """ساختار پیش‌فرض اطلاعات یک فایل (ویدیو یا تصویر)"""
+    return {
+        "kind": kind,
+        "duration": None,
+        "has_video": False,
+        "video_codec": None,
+        "video_profile": None,
+        "pix_fmt": None,
+        "width": None,
+        "height": None,
+        "fps": None,
+        "timescale": None,
+        "rotation": 0,
+        "has_audio": False,
+        "audio_codec": None,
+        "sample_rate": None,
+        "channel_layout": None,
+        "capture_time": None,  # زمان ثبت (ثانیه از مبدا یونیکس) از فراداده فایل، در صورت وجود
+    }
+
+
+def parse_creation_time(value):
+    """تبدیل creation_time فایل ویدیو (مانند 2021-05-01T12:34:56.000000Z) به ثانیه از مبدا یونیکس"""
+    try:
+        created = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if created.tzinfo is None:
+        # creation_time کانتینرها به وقت جهانی ثبت می‌شود
+        created = created.replace(tzinfo=timezone.utc)
+    # بعضی دوربین‌ها بدون ساعت تنظیم شده تاریخ صفر (1904 یا 1970) می‌نویسند
+    if created.year <= 1970:
+        return None
+    return created.timestamp()
+
+
+def parse_probe_output(output):
+    """استخراج اطلاعات استریم‌ها از خروجی `ffmpeg -i`"""
+    info = empty_media_info()
+
+    match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", output)
+    if match:
+        hours, minutes, seconds = match.groups()
+        info["duration"] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    match = re.search(r"rotation of (-?\d+(?:\.\d+)?) degrees", output) or \
+        re.search(r"rotate\s*:\s*(-?\d+)", output)
+    if match:
+        info["rotation"] = int(round(float(match.group(1)))) % 360
+
+    # اولین creation_time مربوط به خود فایل است (پیش از فراداده استریم‌ها)
+    match = re.search(r"creation_time\s*:\s*(\S+)", output)
+    if match:
+        info["capture_time"] = parse_creation_time(match.group(1))
+
+    for line in output.splitlines():
+        match = re.search(r"Stream #\d+:\d+.*?: (Video|Audio): (.*)", line)
+        if not match:
+            continue
+        stream_type, description = match.groups()
+        fields = _split_fields(description)
+        codec_field = fields[0] if fields else ""
+        codec_match = re.match(r"(\w+)(?: \(([^)]*)\))?", codec_field)
+        if not codec_match:
+            continue
+
+        if stream_type == "Video" and not info["has_video"] and "(attached pic)" not in line:
+            info["has_video"] = True
+            info["video_codec"] = codec_match.group(1)
+            profile = codec_match.group(2)
+            if profile and "/" not in profile:
+                info["video_profile"] = profile
+            if len(fields) > 1:
+                info["pix_fmt"] = fields[1].split("(")[0].strip()
+            for field in fields[1:]:
+                size_match = re.match(r"(\d+)x(\d+)", field)
+                # فیلد آخر ممکن است پسوندی مثل (default) داشته باشد
+                rate_match = re.match(r"(\d+(?:\.\d+)?k?) (fps|tbr|tbn)\b", field)
+                if size_match and info["width"] is None:
+                    info["width"], info["height"] = int(size_match.group(1)), int(size_match.group(2))
+                elif rate_match:
+                    value, unit = rate_match.groups()
+                    if unit == "fps" or (unit == "tbr" and info["fps"] is None):
+                        info["fps"] = _parse_rate(value)
+                    elif unit == "tbn":
+                        info["timescale"] = int(_parse_rate(value))
+
+        elif stream_type == "Audio" and not info["has_audio"]:
+            info["has_audio"] = True
+            info["audio_codec"] = codec_match.group(1)
+            for index, field in enumerate(fields[1:], start=1):
+                if field.endswith(" Hz"):
+                    info["sample_rate"] = int(field[:-3])
+                    if index + 1 < len(fields):
+                        info["channel_layout"] = fields[index + 1]
+
+    if info["duration"] is None and not info["has_video"] and not info["has_audio"]:
+        raise FFmpegError(f"اطلاعات فایل قابل خواندن نیست: {output.strip().splitlines()[-1:]}")
+
+    return info
+
+
+def probe_media(file_path):
+    """خواندن اطلاعات یک فایل ویدیویی با ffmpeg"""
+    cmd = [get_ffmpeg_binary(), "-hide_banner", "-i", file_path]
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, **_popen_params())
+    return parse_probe_output(proc.stderr.decode("utf8", errors="replace"))
+
+
+def stream_signature(info):
+    """کلید مقایسه پارامترهای استریم دو فایل برای ادغام بدون رندر"""
+    fps = round(info["fps"], 3) if info["fps"] else None
+    audio = None
+    if info["has_audio"]:
+        audio = (info["audio_codec"], info["sample_rate"], info["channel_layout"])
+    return (info["video_codec"], info["video_profile"], info["pix_fmt"],
+            info["width"], info["height"], fps, info["rotation"], audio)
+
+
+def run_ffmpeg(args, duration=None, progress_fn=None, is_cancelled=None):
+    """اجرای ffmpeg با گزارش پیشرفت؛ در صورت لغو False برمی‌گرداند"""
+    cmd = [get_ffmpeg_binary(), "-y", "-hide_banner", "-nostdin",
+           "-loglevel", "error", "-progress", "pipe:1"] + list(args)
+
+    # خروجی خطا در فایل موقت نوشته می‌شود تا پایپ پر نشود
+    with tempfile.TemporaryFile() as stderr_file:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file, **_popen_params())
+        try:
+            for raw_line in proc.stdout:
+                if is_cancelled and is_cancelled():
+                    proc.kill()
+                    proc.wait()
+                    return False
+
+                key, _, value = raw_line.decode("utf8", errors="replace").strip().partition("=")
+                if key in ("out_time_us", "out_time_ms") and progress_fn and duration:
+                    try:
+                        position = int(value) / 1000000
+                    except ValueError:
+                        continue
+                    progress_fn(min(position / duration, 1.0))
+            proc.wait()
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+        if is_cancelled and is_cancelled():
+            return False
+
+        if proc.returncode != 0:
+            stderr_file.seek(0)
+            message = stderr_file.read().decode("utf8", errors="replace").strip()
+            raise FFmpegError(message or f"ffmpeg با کد {proc.returncode} متوقف شد")
+
+    return True
+
+
+def encoder_profile_params(profile):
+    """پارامتر -profile:v متناسب با پروفایل استریم مرجع (در صورت شناخته بودن)"""
+    name = ENCODER_PROFILES.get((profile or "").lower())
+    return ["-profile:v", name] if name else []
+
+
+def encode_still(frame_path, output_path, duration, fps, video_codec, video_bitrate, preset, threads,
+                 audio=None, extra_params=None, vfr=False, progress_fn=None, is_cancelled=None):
+    """رندر یک تصویر آماده (هم‌اندازه خروجی) به قطعه ویدیویی با حلقه تصویر خود ffmpeg
+
+    audio: در صورت نیاز به صدای خالی، دیکشنری شامل codec, bitrate, sample_rate و channel_layout
+    vfr: به‌جای fps فریم در ثانیه، فقط STILL_VFR_FPS فریم با مدت نمایش طولانی نوشته می‌شود (با همان بیت‌ریت تنظیم شده)
+    """
+    input_fps = STILL_VFR_FPS if vfr else fps
+    args = ["-loop", "1", "-framerate", str(input_fps), "-t", f"{duration:.3f}", "-i", frame_path]
+    if audio:
+        args += ["-f", "lavfi", "-t", f"{duration:.3f}",
+                 "-i", f"anullsrc=r={audio['sample_rate']}:cl={audio['channel_layout']}"]
+
+    args += ["-map", "0:v:0"]
+    if audio:
+        args += ["-map", "1:a:0", "-c:a", audio["codec"], "-b:a", audio["bitrate"]]
+
+    args += ["-c:v", video_codec, "-preset", preset, "-threads", str(threads), "-pix_fmt", "yuv420p",
+             "-b:v", video_bitrate]
+    if vfr:
+        # بدون B-frame تا تأخیر DTS چندثانیه‌ای در قطعه ایجاد نشود و چسباندن دقیق بماند
+        args += ["-g", str(STILL_VFR_KEYINT), "-bf", "0"]
+    else:
+        args += ["-r", str(fps)]
+    if video_codec == "libx264":
+        # تنظیم انکودر برای محتوای ثابت
+        args += ["-tune", "stillimage"]
+    if extra_params:
+        args += list(extra_params)
+    args.append(output_path)
+
+    return run_ffmpeg(args, duration=duration, progress_fn=progress_fn, is_cancelled=is_cancelled)
+
+
+def write_concat_list(file_paths):
+    """ساخت فایل لیست برای concat demuxer و برگرداندن مسیر آن"""
+    fd, list_path = tempfile.mkstemp(prefix="stellar_concat_", suffix=".txt")
+    with os.fdopen(fd, "w", encoding="utf8") as list_file:
+        for file_path in file_paths:
+            escaped = os.path.abspath(file_path).replace("'", "'\\''")
+            list_file.write(f"file '{escaped}'\n")
+    return list_path
+
+
+def concat_copy(file_paths, output_path, duration=None, progress_fn=None, is_cancelled=None):
+    """چسباندن فایل‌ها با concat demuxer و کپی مستقیم استریم‌ها (بدون رندر)"""
+    list_path = write_concat_list(file_paths)
+    try:
+        return run_ffmpeg(
+            ["-f", "concat", "-safe", "0", "-i", list_path,
+             "-map", "0:v:0", "-map", "0:a:0?",
+             "-c", "copy", "-movflags", "+faststart", output_path],
+            duration=duration, progress_fn=progress_fn, is_cancelled=is_cancelled)
+    finally:
+        try:
+            os.remove(list_path)
+        except OSError:
+            pass
@@ -0,0 +1,184 @@
+import os
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+import time
+
+
+# پرچم‌های inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# رویدادهایی که پایش می‌شوند: نوشتن و جابه‌جایی فایل‌ها و ساخت پوشه‌های جدید
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+# سربرگ هر رویداد: wd, mask, cookie, len
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_libc():
+    """کتابخانه C با توابع inotify، یا None در سیستم‌های بدون inotify"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+_libc = _load_libc()
+
+
+def watch_supported():
+    """آیا پایش رویدادمحور پوشه‌ها (inotify) در این سیستم در دسترس است"""
+    return _libc is not None
+
+
+class FolderWatcher:
+    """پایش یک درخت پوشه با inotify و اعلام پوشه‌هایی که بارگذاری فایل‌هایشان تمام شده است
+
+    هر رویداد فایل رسانه‌ای زمان انتظار پوشه آن را از نو شروع می‌کند؛ وقتی settle_seconds ثانیه رویدادی
+    در آن پوشه رخ ندهد، on_ready(folder_path) (در ترد پایش) فراخوانی می‌شود.
+    ignore(file_path) فایل‌هایی را که خود برنامه می‌نویسد (مانند خروجی ادغام) کنار می‌گذارد.
+    """
+
+    def __init__(self, root, on_ready, extensions, settle_seconds=30, ignore=None):
+        if _libc is None:
+            raise OSError("پایش پوشه فقط در سیستم‌های دارای inotify (لینوکس) پشتیبانی می‌شود")
+        self.root = os.path.abspath(root)
+        self.on_ready = on_ready
+        self.extensions = {extension.lower() for extension in extensions}
+        self.settle_seconds = settle_seconds
+        self.ignore = ignore
+        self.fd = None
+        self.paths = {}  # شناسه پایش -> مسیر پوشه
+        self.pending = {}  # پوشه دارای فایل جدید -> زمان اعلام آماده بودن
+        self.stop_read, self.stop_write = os.pipe()
+        self.thread = None
+
+    def start(self):
+        """شروع پایش در ترد پس‌زمینه"""
+        self.fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self._watch_tree(self.root)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """پایان پایش و آزاد کردن منابع"""
+        if self.thread is not None:
+            os.write(self.stop_write, b"x")
+            self.thread.join()
+            self.thread = None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        os.close(self.stop_read)
+        os.close(self.stop_write)
+
+    def _is_media(self, file_path):
+        """آیا فایل یک ورودی رسانه‌ای جدید است (نه فایل مخفی، موقت یا خروجی خود برنامه)"""
+        name = os.path.basename(file_path)
+        if name.startswith(".") or os.path.splitext(name)[1].lower() not in self.extensions:
+            return False
+        return not (self.ignore and self.ignore(file_path))
+
+    def _add_watch(self, path):
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                print(f"خطا در پایش پوشه {path}: سقف پایش inotify پر شده است (fs.inotify.max_user_watches)")
+            else:
+                print(f"خطا در پایش پوشه {path}: {os.strerror(error)}")
+            return
+        self.paths[wd] = path
+
+    def _watch_tree(self, root, mark_existing=False):
+        """افزودن پایش برای یک پوشه و همه زیرپوشه‌های آن
+
+        mark_existing برای پوشه‌هایی که یکجا منتقل شده‌اند: فایل‌های موجود آن‌ها هم جدید به حساب می‌آیند.
+        """
+        for directory, subdirectories, files in os.walk(root):
+            # پوشه‌های مخفی (مانند پوشه قطعه‌های موقت ادغام هوشمند) پایش نمی‌شوند
+            subdirectories[:] = [name for name in subdirectories if not name.startswith(".")]
+            self._add_watch(directory)
+            if mark_existing and any(self._is_media(os.path.join(directory, name)) for name in files):
+                self._touch(directory)
+
+    def _touch(self, directory):
+        """شروع دوباره زمان انتظار یک پوشه"""
+        self.pending[directory] = time.monotonic() + self.settle_seconds
+
+    def _handle_events(self):
+        """خواندن و رسیدگی به همه رویدادهای آماده"""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # رویدادها از دست رفته‌اند: همه پوشه‌های دارای فایل رسانه‌ای دوباره بررسی می‌شوند
+                print("صف رویدادهای inotify پر شد، بررسی دوباره پوشه‌های پایش شده")
+                for path in list(self.paths.values()):
+                    self._watch_tree(path, mark_existing=True)
+                continue
+            if mask & IN_IGNORED:
+                self.paths.pop(wd, None)
+                continue
+
+            directory = self.paths.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and not name.startswith("."):
+                    self._watch_tree(path, mark_existing=True)
+            elif self._is_media(path) or directory in self.pending:
+                # هر تغییر در پوشه‌ای که منتظر آرام شدن است زمان انتظار را از نو شروع می‌کند
+                self._touch(directory)
+
+    def _run(self):
+        while True:
+            timeout = None
+            if self.pending:
+                timeout = max(0, min(self.pending.values()) - time.monotonic())
+            readable, _, _ = select.select([self.fd, self.stop_read], [], [], timeout)
+            if self.stop_read in readable:
+                return
+            if self.fd in readable:
+                self._handle_events()
+
+            now = time.monotonic()
+            for directory, deadline in list(self.pending.items()):
+                if deadline <= now:
+                    del self.pending[directory]
+                    try:
+                        self.on_ready(directory)
+                    except Exception as e:
+                        print(f"خطا در افزودن پوشه پایش شده {directory}: {e}")
@@ -0,0 +1,201 @@
+import subprocess
+import tempfile
+import multiprocessing
+from multiprocessing import shared_memory
+from queue import Empty
+
+import numpy as np
+
+from ffmpeg_tools import FFmpegError, get_ffmpeg_binary, _popen_params
+from scaling import open_scaled_image
+
+# تعداد خانه‌های حلقه حافظه مشترک (هر خانه یک فریم کامل خروجی)
+RING_SLOTS = 8
+
+
+def _read_into(stream, view):
+    """پر کردن کامل یک خانه حلقه از خروجی دیکدر؛ تعداد بایت خوانده شده را برمی‌گرداند"""
+    filled = 0
+    while filled < len(view):
+        count = stream.readinto(view[filled:])
+        if not count:
+            break
+        filled += count
+    return filled
+
+
+def _produce_frames(shm_name, frame_shape, sources, fps, free_slots, filled_slots, cancel_event):
+    """مرحله دیکد و مقیاس‌دهی (اجرا در پردازه جداگانه)
+
+    ویدیوها با دیکدر ffmpeg (همراه با فیلتر مقیاس‌دهی) مستقیماً درون خانه‌های حافظه مشترک خوانده می‌شوند
+    و تصاویر یک بار مقیاس‌دهی و برای هر فریم در خانه آزاد کپی می‌شوند.
+    پایان فریم‌ها با None و خطا با پیام آن (str) در صف خانه‌های پر اعلام می‌شود.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frame_size = int(np.prod(frame_shape))
+    slots = [shm.buf[index * frame_size:(index + 1) * frame_size] for index in range(RING_SLOTS)]
+    end_message = None
+    try:
+        for source in sources:
+            if cancel_event.is_set():
+                break
+
+            if source["kind"] == "image":
+                image = np.asarray(open_scaled_image(
+                    source["file_path"], (frame_shape[1], frame_shape[0]), *source["scaling"]))
+                for _ in range(source["frames"]):
+                    slot = free_slots.get()
+                    if cancel_event.is_set():
+                        break
+                    np.copyto(np.ndarray(frame_shape, dtype=np.uint8, buffer=slots[slot]), image)
+                    filled_slots.put(slot)
+                continue
+
+            cmd = [get_ffmpeg_binary(), "-hide_banner", "-nostdin", "-loglevel", "error",
+                   "-i", source["file_path"], "-an",
+                   # تعداد فریم دقیقاً برابر مدت کلیپ روی خط زمان تا صدا جابه‌جا نشود؛ وقتی مدت کانتینر
+                   # (مثلاً به‌خاطر صدای طولانی‌تر) از استریم ویدیو بیشتر است فریم آخر تا هر اندازه لازم تکرار می‌شود
+                   "-vf", f"{source['filter']},fps={fps},tpad=stop=-1:stop_mode=clone",
+                   "-frames:v", str(source["frames"]), "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"]
+            with tempfile.TemporaryFile() as stderr_file:
+                decoder = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file,
+                                           bufsize=0, **_popen_params())
+                try:
+                    while not cancel_event.is_set():
+                        slot = free_slots.get()
+                        if _read_into(decoder.stdout, slots[slot]) < frame_size:
+                            # پایان ویدیو (فریم ناقص احتمالی کنار گذاشته می‌شود)
+                            free_slots.put(slot)
+                            break
+                        filled_slots.put(slot)
+                finally:
+                    if cancel_event.is_set() and decoder.poll() is None:
+                        decoder.kill()
+                    decoder.wait()
+                # دیکدر ناموفق نباید به‌عنوان پایان عادی ویدیو (و خروجی کوتاه‌تر با صدای جابه‌جا) برداشت شود
+                if decoder.returncode != 0 and not cancel_event.is_set():
+                    stderr_file.seek(0)
+                    message = stderr_file.read().decode("utf8", errors="replace").strip()
+                    raise FFmpegError(f"خطا در دیکد {source['file_path']}: "
+                                      f"{message or f'ffmpeg با کد {decoder.returncode} متوقف شد'}")
+    except Exception as e:
+        end_message = str(e) or type(e).__name__
+    finally:
+        filled_slots.put(end_message)
+        for view in slots:
+            view.release()
+        shm.close()
+
+
+def render_frames(sources, output_path, frame_size, fps, encoder_args, audio_path=None,
+                  total_frames=None, progress_fn=None, is_cancelled=None, check_pause=None,
+                  track_process=None, untrack_process=None):
+    """رندر خط زمان با خط لوله دیکد/مقیاس‌دهی/انکد روی حلقه حافظه مشترک
+
+    sources: فهرست منابع به ترتیب؛ ویدیو {"kind": "video", "file_path", "filter", "frames"} و تصویر
+    {"kind": "image", "file_path", "frames", "scaling": (scaling_mode, maintain_aspect_ratio, bg_color)}
+    encoder_args: پارامترهای انکودر ویدیو و صدا (کدک، بیت‌ریت، ...) پیش از مسیر خروجی
+    track_process/untrack_process: ثبت زیرپردازه انکودر تا با لغو کار فوراً بسته شود
+    در صورت لغو False برمی‌گرداند؛ خطای دیکد یا تعداد فریم کمتر از total_frames خطای FFmpegError است.
+    """
+    width, height = frame_size
+    frame_shape = (height, width, 3)
+    slot_size = width * height * 3
+
+    context = multiprocessing.get_context("spawn")
+    shm = shared_memory.SharedMemory(create=True, size=slot_size * RING_SLOTS)
+    free_slots = context.Queue()
+    filled_slots = context.Queue()
+    cancel_event = context.Event()
+    for slot in range(RING_SLOTS):
+        free_slots.put(slot)
+
+    producer = context.Process(target=_produce_frames, args=(
+        shm.name, frame_shape, sources, fps, free_slots, filled_slots, cancel_event))
+    producer.start()
+
+    cmd = [get_ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error",
+           "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "pipe:0"]
+    if audio_path:
+        cmd += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0"]
+    cmd += list(encoder_args) + [output_path]
+
+    cancelled = False
+    producer_error = None
+    with tempfile.TemporaryFile() as stderr_file:
+        params = _popen_params()
+        params["stdin"] = subprocess.PIPE
+        encoder = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=stderr_file, **params)
+        if track_process:
+            track_process(encoder)
+        try:
+            written = 0
+            while True:
+                if check_pause:
+                    check_pause()
+                if is_cancelled and is_cancelled():
+                    cancelled = True
+                    break
+                try:
+                    slot = filled_slots.get(timeout=0.5)
+                except Empty:
+                    if not producer.is_alive() and filled_slots.empty():
+                        producer_error = f"پردازه دیکد به‌طور غیرمنتظره متوقف شد (کد {producer.exitcode})"
+                        break
+                    continue
+                if slot is None:
+                    break
+                if isinstance(slot, str):
+                    producer_error = slot
+                    break
+                # فریم بدون کپی از حافظه مشترک به ورودی انکودر نوشته می‌شود
+                view = shm.buf[slot * slot_size:(slot + 1) * slot_size]
+                try:
+                    encoder.stdin.write(view)
+                except (BrokenPipeError, OSError):
+                    break
+                finally:
+                    view.release()
+                free_slots.put(slot)
+
+                written += 1
+                if progress_fn and total_frames:
+                    progress_fn(min(written / total_frames, 1.0))
+
+            # انکودر ممکن است در میانه نوشتن فریم با لغو کار بسته شده باشد
+            cancelled = cancelled or bool(is_cancelled and is_cancelled())
+            if not cancelled and not producer_error and total_frames and written < total_frames \
+                    and encoder.poll() is None:
+                producer_error = f"فقط {written} فریم از {total_frames} فریم خط زمان تولید شد"
+            if cancelled or producer_error:
+                # خروجی ناقص نهایی نمی‌شود
+                encoder.kill()
+            else:
+                try:
+                    encoder.stdin.close()
+                except OSError:
+                    pass
+            encoder.wait()
+        finally:
+            if untrack_process:
+                untrack_process(encoder)
+            cancel_event.set()
+            # آزاد کردن تولیدکننده‌ای که ممکن است منتظر خانه آزاد باشد
+            for slot in range(RING_SLOTS):
+                free_slots.put(slot)
+            producer.join()
+            if encoder.poll() is None:
+                encoder.kill()
+                encoder.wait()
+            shm.close()
+            shm.unlink()
+
+        if cancelled:
+            return False
+        if producer_error:
+            raise FFmpegError(producer_error)
+        if encoder.returncode != 0:
+            stderr_file.seek(0)
+            message = stderr_file.read().decode("utf8", errors="replace").strip()
+            raise FFmpegError(message or f"ffmpeg با کد {encoder.returncode} متوقف شد")
+    return True
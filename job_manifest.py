@@ -0,0 +1,67 @@
+import os
+import json
+
+
+MANIFEST_VERSION = 1
+
+# تنظیماتی که روی محتوای فایل خروجی اثری ندارند و در مقایسه نادیده گرفته می‌شوند
+OUTPUT_INDEPENDENT_SETTINGS = (
+    "threads",
+    "cpu_share",
+    "max_concurrent_jobs",
+    "queue_policy",
+    "segment_workers",
+    "segment_cache_size_mb",
+    "output_path_type",
+    "output_filename_format",
+    "fixed_output_folder",
+    "watch_folder",
+    "watch_settle_seconds",
+)
+
+
+def manifest_path(output_path):
+    """مسیر فایل مشخصات کار، کنار فایل خروجی (فایل مخفی)"""
+    directory, file_name = os.path.split(os.path.abspath(output_path))
+    return os.path.join(directory, f".{file_name}.stellar.json")
+
+
+def _file_entry(file_path):
+    """هویت یک فایل: مسیر، حجم و زمان تغییر"""
+    stat = os.stat(file_path)
+    return [os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns]
+
+
+def build_manifest(output_path, input_files, settings):
+    """ساخت مشخصات کار از ترتیب فایل‌های ورودی و تنظیمات موثر بر خروجی"""
+    return {
+        "version": MANIFEST_VERSION,
+        "inputs": [_file_entry(file_path) for file_path in input_files],
+        "settings": {key: value for key, value in sorted(settings.items())
+                     if key not in OUTPUT_INDEPENDENT_SETTINGS},
+        "output": _file_entry(output_path) if os.path.exists(output_path) else None,
+    }
+
+
+def is_up_to_date(output_path, input_files, settings):
+    """آیا فایل خروجی دقیقاً از همین ورودی‌ها و تنظیمات ساخته شده و پس از آن تغییری نکرده است"""
+    if not os.path.exists(output_path):
+        return False
+    try:
+        with open(manifest_path(output_path), encoding="utf8") as manifest_file:
+            saved = json.load(manifest_file)
+        # مقادیر تنظیمات از مسیر JSON عبور می‌کنند تا مقایسه (مثلاً tuple و list) یکسان باشد
+        current = json.loads(json.dumps(build_manifest(output_path, input_files, settings)))
+    except (OSError, ValueError):
+        return False
+    return saved == current
+
+
+def write_manifest(output_path, input_files, settings):
+    """ذخیره مشخصات کار پس از ساخت موفق فایل خروجی"""
+    try:
+        with open(manifest_path(output_path), "w", encoding="utf8") as manifest_file:
+            json.dump(build_manifest(output_path, input_files, settings), manifest_file,
+                      ensure_ascii=False, indent=1)
+    except OSError as e:
+        print(f"خطا در ذخیره مشخصات کار: {e}")
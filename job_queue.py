@@ -0,0 +1,150 @@
+import time
+import threading
+
+from segment_encoder import available_cpus
+
+
+# حداقل هسته برای هر کار در حالت خودکار تا کارهای همزمان زیاد انکودرها را کند نکنند
+MIN_CORES_PER_JOB = 2
+
+
+class JobQueue:
+    """زمان‌بندی صف کارهای ادغام بدون وابستگی به Qt (مشترک بین رابط کاربری و خط فرمان)
+
+    هر کار یک شیء دلخواه است؛ estimate_fn(job) هزینه آن را برای سیاست shortest_first برآورد می‌کند.
+    """
+
+    def __init__(self, max_concurrent=0, policy="shortest_first", estimate_fn=None):
+        self.queue = []  # لیست کارهای در صف
+        self.running = []  # لیست کارهای در حال اجرا
+        self.max_concurrent = max_concurrent  # حداکثر تعداد کارهای همزمان (0 = خودکار براساس هسته‌ها)
+        self.cpu_budget = available_cpus()  # کل هسته‌هایی که بین کارهای در حال اجرا تقسیم می‌شود
+        self.cpu_shares = {}  # کار در حال اجرا -> تعداد هسته‌های اختصاص داده شده
+        self.suspended = set()  # کارهای متوقف شده که هسته‌هایشان در اختیار صف قرار گرفته است
+        self.policy = policy  # سیاست انتخاب از صف: shortest_first یا fifo
+        self.estimate_fn = estimate_fn
+        self.costs = {}  # کار در صف -> هزینه برآورد شده (ثانیه وزن‌دار رسانه)
+        self.enqueued_at = {}  # کار در صف -> زمان ورود به صف
+        self.high_priority = set()  # کارهایی که کاربر جلوتر از بقیه قرار داده است
+        # برآورد هزینه پوشه‌ها در پس‌زمینه (حداکثر دو پوشه همزمان) تا افزودن کار منتظر بررسی فایل‌ها نماند
+        self.estimate_slots = threading.Semaphore(2)
+        self.costs_lock = threading.Lock()  # ثبت هزینه برآورد شده در برابر خروج همزمان کار از صف
+
+    def concurrency_limit(self):
+        """حداکثر تعداد کارهای همزمان فعلی"""
+        if self.max_concurrent > 0:
+            return self.max_concurrent
+        return max(1, self.cpu_budget // MIN_CORES_PER_JOB)
+
+    def free_cores(self):
+        """هسته‌هایی که به هیچ کار در حال اجرایی اختصاص داده نشده‌اند (کارهای متوقف هسته‌ای مصرف نمی‌کنند)"""
+        return self.cpu_budget - sum(share for job, share in self.cpu_shares.items()
+                                     if job not in self.suspended)
+
+    def active_count(self):
+        """تعداد کارهای در حال اجرا که متوقف نشده‌اند"""
+        return len([job for job in self.running if job not in self.suspended])
+
+    def set_high_priority(self, job, high):
+        """قرار دادن یک کار صف جلوتر از بقیه (یا بازگرداندن به اولویت عادی)"""
+        if high:
+            self.high_priority.add(job)
+        else:
+            self.high_priority.discard(job)
+
+    def _estimate_cost(self, job):
+        """برآورد هزینه یک کار (اجرا در ترد پس‌زمینه)"""
+        with self.estimate_slots:
+            if job not in self.queue:
+                return
+            try:
+                cost = self.estimate_fn(job)
+            except Exception as e:
+                print(f"خطا در برآورد هزینه پردازش: {e}")
+                return
+            with self.costs_lock:
+                # کاری که در حین برآورد از صف خارج شده است دیگر هزینه‌ای ثبت نمی‌کند
+                if job in self.queue:
+                    self.costs[job] = cost
+
+    def _queue_rank(self, job, now, default_cost):
+        """کلید مرتب‌سازی صف؛ کوچک‌ترین مقدار زودتر اجرا می‌شود
+
+        در حالت shortest_first از نسبت پاسخ (زمان انتظار + هزینه) / هزینه استفاده می‌شود:
+        کارهای کوتاه زودتر اجرا می‌شوند ولی نسبت کارهای طولانی هم با انتظار رشد می‌کند و گرسنه نمی‌مانند.
+        """
+        priority = 0 if job in self.high_priority else 1
+        if self.policy != "shortest_first":
+            return (priority, 0, self.enqueued_at[job])
+        cost = max(self.costs.get(job, default_cost), 1.0)
+        waited = now - self.enqueued_at[job]
+        return (priority, -(waited + cost) / cost, self.enqueued_at[job])
+
+    def _pick_next(self):
+        """انتخاب کار بعدی صف براساس اولویت کاربر و سیاست زمان‌بندی"""
+        now = time.monotonic()
+        known = [self.costs[job] for job in self.queue if job in self.costs]
+        # پوشه‌هایی که برآوردشان هنوز آماده نیست با میانگین بقیه سنجیده می‌شوند
+        default_cost = sum(known) / len(known) if known else 1.0
+        return min(self.queue, key=lambda job: self._queue_rank(job, now, default_cost))
+
+    def add(self, job):
+        """افزودن یک کار به انتهای صف و شروع برآورد هزینه آن"""
+        self.queue.append(job)
+        self.enqueued_at[job] = time.monotonic()
+        if self.policy == "shortest_first" and self.estimate_fn:
+            threading.Thread(target=self._estimate_cost, args=(job,), daemon=True).start()
+
+    def take_ready(self):
+        """خارج کردن کارهایی که همین حالا می‌توانند شروع شوند؛ فهرست (کار، سهم هسته‌ها) برمی‌گرداند"""
+        ready = []
+        while self.queue and self.active_count() < self.concurrency_limit():
+            if self.max_concurrent > 0:
+                # تعداد ثابت تعیین شده توسط کاربر: هسته‌ها به‌طور مساوی بین همه جایگاه‌ها تقسیم می‌شوند
+                share = max(1, self.cpu_budget // self.max_concurrent)
+            else:
+                # هسته‌های آزاد بین کارهایی که همین حالا می‌توانند شروع شوند تقسیم می‌شوند؛
+                # سهم هر کار از سهم یک جایگاه بیشتر نمی‌شود تا کارهای بعدی منتظر پایان کارهای طولانی نمانند
+                slots = min(self.concurrency_limit() - self.active_count(), len(self.queue))
+                share = min(self.free_cores() // slots, self.cpu_budget // self.concurrency_limit())
+                if share < MIN_CORES_PER_JOB:
+                    if self.active_count():
+                        # منتظر آزاد شدن هسته‌ها با پایان کارهای در حال اجرا
+                        break
+                    share = max(1, self.free_cores())
+
+            job = self._pick_next()
+            self.queue.remove(job)
+            self._forget_queued(job)
+            self.running.append(job)
+            self.cpu_shares[job] = share
+            ready.append((job, share))
+        return ready
+
+    def _forget_queued(self, job):
+        """پاک کردن اطلاعات زمان‌بندی کاری که از صف خارج شده است"""
+        self.enqueued_at.pop(job, None)
+        with self.costs_lock:
+            self.costs.pop(job, None)
+        self.high_priority.discard(job)
+
+    def remove(self, job):
+        """خارج کردن یک کار پایان یافته یا لغو شده؛ True اگر کار در حال اجرا بوده است"""
+        if job in self.running:
+            self.running.remove(job)
+            self.cpu_shares.pop(job, None)
+            self.suspended.discard(job)
+            return True
+        if job in self.queue:
+            self.queue.remove(job)
+            self._forget_queued(job)
+        return False
+
+    def suspend(self, job):
+        """ثبت توقف یک کار در حال اجرا تا هسته‌هایش به کارهای صف داده شود"""
+        if job in self.running:
+            self.suspended.add(job)
+
+    def unsuspend(self, job):
+        """ثبت ادامه کار متوقف؛ کار بلافاصله ادامه می‌یابد حتی اگر هسته‌هایش موقتاً به کار دیگری داده شده باشد"""
+        self.suspended.discard(job)
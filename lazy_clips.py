@@ -0,0 +1,128 @@
+import bisect
+
+import numpy as np
+from moviepy.editor import VideoClip, AudioClip, AudioFileClip
+
+
+class ClipDescriptor:
+    """توصیف سبک یک کلیپ روی خط زمان؛ خواننده فایل فقط هنگام رندر همان بازه باز می‌شود"""
+
+    def __init__(self, file_path, duration, size, has_audio, open_fn):
+        self.file_path = file_path
+        self.duration = duration
+        self.size = tuple(size)
+        self.has_audio = has_audio
+        self.open_fn = open_fn  # تابعی که کلیپ moviepy مقیاس‌دهی شده را می‌سازد
+
+
+class LazyTimeline:
+    """چسباندن کلیپ‌ها پشت سر هم (مانند concatenate با روش compose) با حداکثر یک خواننده باز
+
+    خواننده تصویر و صدا جداگانه نگه داشته می‌شوند چون moviepy ابتدا کل صدا و سپس کل تصویر را می‌نویسد.
+    """
+
+    def __init__(self, descriptors, audio_fps=44100):
+        self.descriptors = list(descriptors)
+        self.starts = []
+        position = 0
+        for descriptor in self.descriptors:
+            self.starts.append(position)
+            position += descriptor.duration
+        self.duration = position
+        self.audio_fps = audio_fps
+
+        # قاب خروجی به اندازه بزرگ‌ترین کلیپ؛ کلیپ‌های کوچک‌تر در مرکز قرار می‌گیرند
+        self.size = (max(d.size[0] for d in self.descriptors), max(d.size[1] for d in self.descriptors))
+        self.canvas = np.zeros((self.size[1], self.size[0], 3), dtype=np.uint8)
+
+        self.video_index = None
+        self.video_clip = None
+        self.audio_index = None
+        self.audio_clip = None
+
+    def _index_at(self, t):
+        """اندیس کلیپی که زمان t در بازه آن قرار دارد"""
+        index = bisect.bisect_right(self.starts, t) - 1
+        return min(max(index, 0), len(self.descriptors) - 1)
+
+    def _open_video(self, index):
+        """باز کردن خواننده کلیپ مورد نیاز و بستن خواننده قبلی"""
+        if index != self.video_index:
+            self._close_video()
+            self.video_clip = self.descriptors[index].open_fn()
+            self.video_index = index
+        return self.video_clip
+
+    def _open_audio(self, index):
+        """باز کردن فقط خواننده صدای کلیپ مورد نیاز و بستن خواننده قبلی"""
+        if index != self.audio_index:
+            self._close_audio()
+            self.audio_clip = AudioFileClip(self.descriptors[index].file_path, fps=self.audio_fps)
+            self.audio_index = index
+        return self.audio_clip
+
+    def _close_video(self):
+        if self.video_clip is not None:
+            try:
+                self.video_clip.close()
+            except:
+                pass
+        self.video_clip = None
+        self.video_index = None
+
+    def _close_audio(self):
+        if self.audio_clip is not None:
+            try:
+                self.audio_clip.close()
+            except:
+                pass
+        self.audio_clip = None
+        self.audio_index = None
+
+    def make_frame(self, t):
+        index = self._index_at(t)
+        clip = self._open_video(index)
+        local_t = min(max(t - self.starts[index], 0), clip.duration)
+        frame = clip.get_frame(local_t)
+        if clip.mask is not None:
+            # نواحی شفاف مانند compose روی پس‌زمینه سیاه قرار می‌گیرند
+            frame = (frame * clip.mask.get_frame(local_t)[:, :, np.newaxis]).astype(np.uint8)
+
+        height, width = frame.shape[:2]
+        if (width, height) == self.size:
+            return frame
+        self.canvas[:] = 0
+        x = (self.size[0] - width) // 2
+        y = (self.size[1] - height) // 2
+        self.canvas[y:y + height, x:x + width] = frame[:, :, :3]
+        return self.canvas
+
+    def make_audio_frame(self, t):
+        times = np.atleast_1d(t)
+        result = np.zeros((len(times), 2))
+        indices = np.searchsorted(self.starts, times, side="right") - 1
+        indices = np.clip(indices, 0, len(self.descriptors) - 1)
+        for index in np.unique(indices):
+            if not self.descriptors[index].has_audio:
+                continue
+            audio = self._open_audio(index)
+            selected = indices == index
+            local_times = np.clip(times[selected] - self.starts[index], 0, audio.duration - 1.0 / audio.fps)
+            chunk = audio.get_frame(local_times)
+            result[selected] = chunk.reshape(len(local_times), -1)[:, :2]
+        if np.ndim(t) == 0:
+            return result[0]
+        return result
+
+    def clip(self):
+        """کلیپ moviepy کل خط زمان برای نوشتن در فایل خروجی"""
+        video = VideoClip(self.make_frame, duration=self.duration)
+        video.size = self.size
+        if any(descriptor.has_audio for descriptor in self.descriptors):
+            video = video.set_audio(AudioClip(self.make_audio_frame, duration=self.duration, fps=self.audio_fps))
+        return video
+
+    def close(self):
+        """بستن خواننده‌های باز باقی‌مانده"""
+        self._close_video()
+        self._close_audio()
@@ -1,9 +1,8 @@
 import sys
 import os
-import time
 import json
-import re
-from PySide6.QtCore import (Qt, QThread, Signal, Slot, QDir, QSettings,
+import multiprocessing
+from PySide6.QtCore import (Qt, QObject, Signal, Slot, QDir, QSettings, QStandardPaths,
                             QMimeData, QUrl, QMetaObject, Q_ARG, QEvent, QTimer)
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QDialog,
@@ -15,10 +14,14 @@ from PySide6.QtWidgets import (
 from PySide6.QtGui import QIcon, QDragEnterEvent, QDropEvent, QPixmap, QColor, QDesktopServices
 
 # فایل‌های مورد نیاز برای پردازش ویدیو
-import glob
 import platform
-from proglog import ProgressBarLogger
-from moviepy.editor import ImageClip, VideoFileClip, concatenate_videoclips, ColorClip, CompositeVideoClip
+from merge_job import (DEFAULT_SETTINGS, VIDEO_EXTENSIONS, IMAGE_EXTENSIONS, job_settings, estimate_job_cost,
+                       is_merge_output)
+from job_manifest import manifest_path
+from folder_watcher import FolderWatcher, watch_supported
+from engine import Engine, JobSpec
+from segment_encoder import available_cpus
+from job_queue import JobQueue
 
 
 class Settings:
@@ -27,33 +30,7 @@ class Settings:
         self.qsettings = QSettings("Stellar", "FolderVideoMerger")
 
         # تنظیمات پیش‌فرض
-        self.default_settings = {
-            "image_duration": 10,  # مدت زمان نمایش هر تصویر (ثانیه)
-            "output_resolution": "original",  # سایز خروجی (original, 720p, 1080p, etc.)
-            "output_width": 1920,  # عرض خروجی سفارشی
-            "output_height": 1080,  # ارتفاع خروجی سفارشی
-            "use_custom_resolution": False,  # استفاده از رزولوشن سفارشی
-            "sort_method": "date",  # روش مرتب‌سازی: date, name یا custom
-            "custom_regex": r"_(\d+)_(\d+)_(\d+)_(\d+)_(\d+)_(\d+)\s(AM|PM)",  # رجکس سفارشی
-            "output_path_type": "same_folder",  # same_folder, fixed_folder, ask_user
-            "output_filename_format": "{folder_name}_video.mp4",  # فرمت نام فایل خروجی
-            "fixed_output_folder": os.path.expanduser("~/Videos"),  # پوشه ثابت (پیش‌فرض: پوشه ویدیوها)
-
-            # تنظیمات کیفیت خروجی
-            "video_codec": "libx264",  # کدک ویدیو
-            "video_bitrate": "700k",  # نرخ بیت ویدیو
-            "audio_codec": "aac",  # کدک صدا
-            "audio_bitrate": "128k",  # نرخ بیت صدا
-            "fps": 30,  # فریم بر ثانیه
-            "preset": "medium",  # پیش‌تنظیم کدک
-            "threads": 2,  # تعداد ترد برای کدینگ
-
-            # تنظیمات مقیاس‌دهی
-            "scaling_mode": "fit",  # شیوه مقیاس‌دهی: fit, fill, stretch
-            "background_color": "#000000",  # رنگ پس‌زمینه برای حالت fit
-            "maintain_aspect_ratio": True,  # حفظ نسبت تصویر
-            "normalize_all_clips": True,  # یکسان‌سازی ابعاد همه کلیپ‌ها
-        }
+        self.default_settings = dict(DEFAULT_SETTINGS)
 
         # بارگذاری تنظیمات از فایل یا استفاده از مقادیر پیش‌فرض
         self.load_settings()
@@ -78,6 +55,20 @@ class Settings:
         for key, value in self.settings.items():
             self.qsettings.setValue(key, value)
 
+    def cache_dir(self):
+        """پوشه فایل‌های کش برنامه در پوشه کش سیستم (همان پوشه پیش‌فرض نسخه خط فرمان)"""
+        # نام برنامه تنظیم نشده است، پس CacheLocation به نام فایل اجرایی بستگی دارد؛ پوشه کش عمومی ثابت است
+        cache_home = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+        return os.path.join(cache_home, "Stellar")
+
+    def snapshot(self, cpu_share=None):
+        """نسخه ثابت تنظیمات فعلی برای ارسال به پردازه کار
+
+        cpu_share تعداد هسته‌هایی است که مدیر صف به این کار اختصاص داده است.
+        """
+        values = {key: self.get(key) for key in self.default_settings}
+        return job_settings(values, self.cache_dir(), cpu_share)
+
     def get(self, key):
         """دریافت مقدار یک تنظیم"""
         return self.settings.get(key, self.default_settings.get(key))
@@ -90,25 +81,53 @@ class Settings:
 
 # مدیر صف برای کنترل تعداد پردازش‌های همزمان
 class QueueManager:
-    def __init__(self, max_concurrent=2, parent=None):
-        self.queue = []  # لیست پردازش‌های در صف
-        self.running = []  # لیست پردازش‌های در حال اجرا
-        self.max_concurrent = max_concurrent  # حداکثر تعداد پردازش‌های همزمان
+    def __init__(self, max_concurrent=0, policy="shortest_first", parent=None):
+        # زمان‌بندی صف (سهم هسته‌ها، اولویت و ترتیب اجرا) بدون وابستگی به Qt انجام می‌شود
+        self.jobs = JobQueue(max_concurrent, policy, estimate_fn=self._estimate_cost)
+        # موتور ادغام مشترک همه پوشه‌ها: هر کار یک پردازه دارد ولی رویدادها در یک ترد توزیع می‌شوند
+        self.engine = Engine()
+        self.invoker = MainThreadInvoker()
         self.widgets = {}  # ذخیره ویجت مرتبط با هر پردازش
         self.parent = parent  # نگهداری مرجع به پنجره اصلی برای به‌روزرسانی UI
 
+    def create_job(self, folder_path, settings, replace_own_output=False):
+        """ساخت کار ادغام یک پوشه روی موتور مشترک"""
+        return FolderJob(folder_path, settings, self.engine, self.invoker, replace_own_output)
+
+    @property
+    def queue(self):
+        """لیست پردازش‌های در صف"""
+        return self.jobs.queue
+
+    @property
+    def running(self):
+        """لیست پردازش‌های در حال اجرا"""
+        return self.jobs.running
+
+    def set_max_concurrent(self, max_concurrent):
+        """تغییر حداکثر پردازش‌های همزمان و شروع کارهای صف در صورت وجود ظرفیت"""
+        self.jobs.max_concurrent = max_concurrent
+        self._start_next()
+
+    def set_policy(self, policy):
+        """تغییر سیاست انتخاب وظیفه بعدی از صف"""
+        self.jobs.policy = policy
+
+    def set_high_priority(self, thread, high):
+        """قرار دادن یک وظیفه صف جلوتر از بقیه (یا بازگرداندن به اولویت عادی)"""
+        self.jobs.set_high_priority(thread, high)
+
+    def _estimate_cost(self, thread):
+        """برآورد هزینه پوشه یک وظیفه (اجرا در ترد پس‌زمینه)"""
+        return estimate_job_cost(thread.folder_path, thread.settings.snapshot())["cost"]
+
     def add_task(self, widget, thread):
         """افزودن یک وظیفه جدید به مدیر صف"""
         self.widgets[thread] = widget
-        if len(self.running) < self.max_concurrent:
-            # اجرای مستقیم اگر ظرفیت وجود دارد
-            self.running.append(thread)
-            widget.status_changed("running")
-            thread.start()
-        else:
-            # افزودن به صف اگر ظرفیت تکمیل است
-            self.queue.append(thread)
-            widget.status_changed("queued")
+        self.jobs.add(thread)
+        widget.status_changed("queued")
+        # شروع با تاخیر تا پوشه‌هایی که با هم اضافه شده‌اند در تقسیم هسته‌ها با هم دیده شوند
+        QTimer.singleShot(0, self._start_next)
 
         # به‌روزرسانی نمایش وضعیت صف
         if self.parent:
@@ -119,7 +138,7 @@ class QueueManager:
     def task_finished(self, thread):
         """وقتی یک وظیفه به پایان می‌رسد، این متد را فراخوانی می‌کند"""
         if thread in self.running:
-            self.running.remove(thread)
+            self.jobs.remove(thread)
             self._start_next()
 
         # به‌روزرسانی نمایش وضعیت صف
@@ -132,23 +151,24 @@ class QueueManager:
                                               "تمام پردازش‌های ویدیو با موفقیت به پایان رسیدند.")
 
     def _start_next(self):
-        """شروع وظیفه بعدی در صف"""
-        if self.queue and len(self.running) < self.max_concurrent:
-            next_thread = self.queue.pop(0)
-            self.running.append(next_thread)
+        """شروع وظایف بعدی صف تا جایی که ظرفیت و هسته آزاد وجود دارد"""
+        ready = self.jobs.take_ready()
+        for next_thread, share in ready:
+            next_thread.set_cpu_share(share)
             widget = self.widgets.get(next_thread)
             if widget:
                 widget.status_changed("running")
             next_thread.start()
 
+        if ready and self.parent:
+            self.parent.update_queue_info()
+
     def cancel_task(self, thread):
         """لغو یک وظیفه، چه در صف باشد چه در حال اجرا"""
         if thread in self.running:
             thread.cancel()
-            self.running.remove(thread)
+        if self.jobs.remove(thread):
             self._start_next()
-        elif thread in self.queue:
-            self.queue.remove(thread)
 
         # در هر دو صورت، وضعیت ویجت را به‌روزرسانی می‌کنیم
         widget = self.widgets.get(thread)
@@ -176,10 +196,17 @@ class QueueManager:
             widget = self.widgets.get(thread)
             if widget:
                 widget.status_changed("paused")
+            # پردازه‌های کار واقعاً متوقف شده‌اند؛ هسته‌های آن به کارهای صف داده می‌شود
+            self.jobs.suspend(thread)
+            self._start_next()
+            if self.parent:
+                self.parent.update_queue_info()
 
     def resume_task(self, thread):
         """ادامه یک وظیفه متوقف شده"""
         if thread in self.running:
+            # کار متوقف بلافاصله ادامه می‌یابد، حتی اگر هسته‌هایش موقتاً به کار دیگری داده شده باشد
+            self.jobs.unsuspend(thread)
             thread.resume()
             widget = self.widgets.get(thread)
             if widget:
@@ -243,470 +270,111 @@ class MultiFolderDialog(QDialog):
         return paths
 
 
-class VideoProcessThread(QThread):
-    progress_updated = Signal(str, float)
-    stage_updated = Signal(str, str)  # folder_path, stage_description
-    process_finished = Signal(str, bool, str)  # folder_path, success, message
-    check_output_file = Signal(str, str)  # folder_path, output_file_path
-    ask_output_path = Signal(str, str)  # folder_path, default_filename
+class MainThreadInvoker(QObject):
+    """اجرای توابع در ترد اصلی Qt؛ یک نمونه برای کل برنامه، به‌جای یک QObject برای هر کار"""
+    requested = Signal(object)
 
-    def __init__(self, folder_path, settings):
+    def __init__(self):
         super().__init__()
-        self.folder_path = folder_path
-        self.cancelled = False
-        self.paused = False
-        self.pause_lock = False  # قفل برای جلوگیری از ورود به حالت توقف در زمان‌های حساس
-        self.output_filename = ""  # مسیر فایل خروجی برای پاک کردن در صورت لغو
-        self.current_stage = ""
-        self.settings = settings
-        self.overwrite_confirmed = False  # آیا کاربر تایید کرده است که فایل موجود بازنویسی شود
-
-    def run(self):
-        try:
-            self.process_video()
-            if not self.cancelled:
-                self.process_finished.emit(self.folder_path, True, "عملیات با موفقیت انجام شد")
-            else:
-                # پاک کردن فایل ناقص در صورت لغو
-                self.cleanup_output_file()
-                self.process_finished.emit(self.folder_path, False, "عملیات لغو شد")
-        except Exception as e:
-            # پاک کردن فایل ناقص در صورت خطا
-            self.cleanup_output_file()
-            self.process_finished.emit(self.folder_path, False, str(e))
-
-    def cancel(self):
-        self.cancelled = True
-
-    def pause(self):
-        """توقف موقت پردازش"""
-        self.paused = True
-
-    def resume(self):
-        """ادامه پردازش"""
-        self.paused = False
-
-    def check_pause(self):
-        """بررسی وضعیت توقف و انتظار تا ادامه پردازش"""
-        # اگر قفل توقف فعال است، نمی‌توان توقف کرد
-        if self.pause_lock:
-            return
-
-        while self.paused and not self.cancelled:
-            # در حالت توقف، هر 0.5 ثانیه بررسی می‌کنیم که آیا باید ادامه دهیم
-            time.sleep(0.5)
-
-    def set_pause_lock(self, locked):
-        """تنظیم قفل توقف برای جلوگیری از توقف در مراحل حساس"""
-        self.pause_lock = locked
-
-    def cleanup_output_file(self):
-        """پاک کردن فایل خروجی ناقص در صورت لغو یا خطا"""
-        if self.output_filename and os.path.exists(self.output_filename) and not self.overwrite_confirmed:
-            try:
-                os.remove(self.output_filename)
-                print(f"فایل ناقص پاک شد: {self.output_filename}")
-            except Exception as e:
-                print(f"خطا در پاک کردن فایل ناقص: {e}")
-
-    def update_stage(self, stage):
-        """به‌روزرسانی مرحله فعلی پردازش"""
-        if stage != self.current_stage:
-            self.current_stage = stage
-            self.stage_updated.emit(self.folder_path, stage)
-            # بعد از تغییر مرحله، حتماً وضعیت توقف را بررسی کنیم
-            self.check_pause()
-
-    def set_overwrite_confirmed(self, confirmed):
-        """تنظیم وضعیت تایید بازنویسی فایل"""
-        self.overwrite_confirmed = confirmed
+        self.requested.connect(self._run, Qt.QueuedConnection)
 
-    def set_output_filename(self, path):
-        """تنظیم مسیر فایل خروجی"""
-        self.output_filename = path
-
-    class ThreadBarLogger(ProgressBarLogger):
-        def __init__(self, signal_fn, stage_fn, folder_path, check_pause_fn):
-            super().__init__()
-            self.signal_fn = signal_fn  # تابع سیگنال برای به‌روزرسانی درصد پیشرفت
-            self.stage_fn = stage_fn  # تابع سیگنال برای به‌روزرسانی مرحله
-            self.folder_path = folder_path
-            self.check_pause_fn = check_pause_fn  # تابع بررسی وضعیت توقف
-            self.stages = {
-                "t": "در حال آماده‌سازی زمان‌بندی",
-                "chunk": "در حال چانک کردن فایل‌ها",
-                "writing": "در حال نوشتن فایل خروجی",
-                "rendering": "در حال رندر کردن",
-                "finalize": "در حال نهایی کردن"
-            }
+    def _run(self, function):
+        function()
 
-        def bars_callback(self, bar, attr, value, old_value=None):
-            # بررسی وضعیت توقف
-            self.check_pause_fn()
+    def invoke(self, function):
+        """زمان‌بندی اجرای function در ترد اصلی (قابل فراخوانی از هر ترد)"""
+        self.requested.emit(function)
 
-            # به‌روزرسانی درصد پیشرفت
-            if bar not in self.bars:
-                return
 
-            if attr == 'index':
-                percentage = (value / self.bars[bar]['total']) * 100
-                self.signal_fn(self.folder_path, percentage)
-
-            # به‌روزرسانی مرحله پردازش
-            if bar == 'chunk' and old_value is None:
-                self.stage_fn("در حال چانک کردن فایل‌ها")
-            elif bar == 'moviepy.audio.AudioClip.reader.AudioFileClip':
-                self.stage_fn("در حال پردازش صدا")
-            elif bar == 'moviepy.video.VideoClip.reader.FFMPEG_VideoReader':
-                self.stage_fn("در حال پردازش ویدیو")
-            elif bar == 'moviepy.video.VideoClip.VideoClip.write_videofile.<locals>.ffmpeg_write_video':
-                self.stage_fn("در حال نوشتن فایل ویدیویی")
-            elif bar == 'moviepy.video.io.ffmpeg_tools.ffmpeg_merge_video_audio':
-                self.stage_fn("در حال ادغام ویدیو و صدا")
-
-    def extract_sort_key(self, file_path):
-        """استخراج کلید مرتب‌سازی از نام فایل براساس تنظیمات"""
-        file_name = os.path.basename(file_path)
-
-        # انتخاب روش مرتب‌سازی
-        sort_method = self.settings.get("sort_method")
-
-        # مرتب‌سازی براساس تاریخ (رجکس پیش‌فرض یا سفارشی)
-        if sort_method == "date":
-            regex_pattern = self.settings.get("custom_regex")
-            match = re.search(regex_pattern, file_name)
-            if match:
-                # بسته به تعداد گروه‌های رجکس، متفاوت عمل می‌کنیم
-                groups = match.groups()
-                if len(groups) == 7:  # فرمت پیش‌فرض: ماه، روز، سال، ساعت، دقیقه، ثانیه، AM/PM
-                    month, day, year, hour, minute, second, period = groups
-                    hour = int(hour)
-                    # تبدیل ساعت به فرمت 24 ساعته
-                    if period == "PM" and hour != 12:
-                        hour += 12
-                    elif period == "AM" and hour == 12:
-                        hour = 0
-                    return (1, int(year), int(month), int(day), hour, int(minute), int(second))
-                else:
-                    # اگر رجکس گروه‌های متفاوتی داشت، از مقادیر استخراج شده استفاده کنیم
-                    return (1,) + tuple(int(g) if g.isdigit() else g for g in groups)
-
-        # مرتب‌سازی بر اساس نام فایل
-        elif sort_method == "name":
-            return (2, file_name)
-
-        # مرتب‌سازی پیش‌فرض در صورت عدم تطابق
-        return (3, file_name)
-
-    def apply_scaling(self, clip, target_resolution, scaling_mode, maintain_aspect_ratio, bg_color):
-        """اعمال مقیاس‌دهی به یک کلیپ با توجه به تنظیمات"""
-        width, height = target_resolution
-
-        if not maintain_aspect_ratio or scaling_mode == "stretch":
-            # کشیدن کامل بدون حفظ نسبت
-            return clip.resize(width=width, height=height)
-
-        elif scaling_mode == "fit":
-            # قرار دادن کامل در قاب (ممکن است حاشیه‌های خالی اضافه شود)
-            resized_clip = clip.resize(width=width, height=height)
-
-            # ساخت یک کلیپ با اندازه و رنگ پس‌زمینه دلخواه
-            color_clip = ColorClip(size=(width, height), color=bg_color, duration=clip.duration)
-
-            # قرار دادن کلیپ اصلی در مرکز
-            result = CompositeVideoClip([color_clip, resized_clip.set_position("center")])
-            return result
-
-        elif scaling_mode == "fill":
-            # پر کردن کامل قاب (ممکن است بخشی از تصویر برش بخورد)
-            clip_aspect_ratio = clip.w / clip.h
-            target_aspect_ratio = width / height
-
-            if clip_aspect_ratio > target_aspect_ratio:
-                # تصویر عریض‌تر است - مقیاس بر اساس ارتفاع
-                resized_clip = clip.resize(height=height)
-                # برش از طرفین برای رسیدن به عرض هدف
-                resized_clip = resized_clip.crop(x_center=resized_clip.w / 2, y_center=resized_clip.h / 2,
-                                                 width=width, height=height)
-            else:
-                # تصویر کشیده‌تر است - مقیاس بر اساس عرض
-                resized_clip = clip.resize(width=width)
-                # برش از بالا و پایین برای رسیدن به ارتفاع هدف
-                resized_clip = resized_clip.crop(x_center=resized_clip.w / 2, y_center=resized_clip.h / 2,
-                                                 width=width, height=height)
-
-            return resized_clip
+class JobSignal:
+    """جایگزین سبک Signal برای رویدادهای یک کار؛ slotها در ترد اصلی Qt فراخوانی می‌شوند"""
 
-        # حالت پیش‌فرض - بدون تغییر مقیاس
-        return clip
+    def __init__(self, invoker):
+        self.invoker = invoker
+        self.slots = []
 
-    def process_video(self):
-        folder_path = self.folder_path
-        self.update_stage("در حال آماده‌سازی")
+    def connect(self, slot):
+        self.slots.append(slot)
 
-        if not os.path.exists(folder_path):
-            raise Exception(f"پوشه وجود ندارد: {folder_path}")
+    def emit(self, *args):
+        slots = list(self.slots)
+        self.invoker.invoke(lambda: [slot(*args) for slot in slots])
 
-        # تعیین مسیر و نام فایل خروجی براساس تنظیمات
-        folder_name = os.path.basename(os.path.dirname(folder_path))
-        output_path_type = self.settings.get("output_path_type")
-        output_filename_format = self.settings.get("output_filename_format")
 
-        # جایگزینی متغیرهای در فرمت نام فایل
-        output_filename = output_filename_format.format(folder_name=folder_name)
+class FolderJob:
+    """کار ادغام یک پوشه در رابط کاربری؛ کلاینت سبک موتور ادغام که در پردازه جداگانه اجرا می‌شود"""
 
-        if output_path_type == "same_folder":
-            # ذخیره در همان پوشه
-            self.output_filename = os.path.join(folder_path, output_filename)
-        elif output_path_type == "fixed_folder":
-            # ذخیره در پوشه ثابت
-            fixed_folder = self.settings.get("fixed_output_folder")
-            if not os.path.exists(fixed_folder):
-                os.makedirs(fixed_folder, exist_ok=True)
-            self.output_filename = os.path.join(fixed_folder, output_filename)
-        elif output_path_type == "ask_user":
-            # درخواست مسیر از کاربر
-            self.ask_output_path.emit(folder_path, output_filename)
-            # منتظر پاسخ کاربر می‌مانیم
-            while not self.cancelled and not self.output_filename:
-                time.sleep(0.1)
-
-            # اگر عملیات لغو شده یا کاربر مسیری انتخاب نکرده است
-            if self.cancelled or not self.output_filename:
-                return
+    def __init__(self, folder_path, settings, engine, invoker, replace_own_output=False):
+        self.folder_path = folder_path
+        self.settings = settings
+        self.engine = engine
+        # بازنویسی بدون پرسش خروجی‌هایی که قبلاً خود برنامه ساخته است (برای پوشه‌های پایش شده)
+        self.replace_own_output = replace_own_output
+        self.cpu_share = None  # تعداد هسته‌های اختصاص داده شده توسط مدیر صف
+        self.handle = None  # کنترل کار در موتور (پس از شروع)
+        self.progress_updated = JobSignal(invoker)  # folder_path, percent
+        self.stage_updated = JobSignal(invoker)  # folder_path, stage_description
+        self.process_finished = JobSignal(invoker)  # folder_path, success, message
+        self.check_output_file = JobSignal(invoker)  # folder_path, output_file_path
+        self.ask_output_path = JobSignal(invoker)  # folder_path, default_filename
+
+    def start(self):
+        """شروع کار در موتور با تنظیمات فعلی و سهم هسته‌های آن"""
+        spec = JobSpec(self.folder_path, self.settings.snapshot(self.cpu_share))
+        self.handle = self.engine.submit(
+            spec,
+            on_progress=lambda handle, percent: self.progress_updated.emit(self.folder_path, percent),
+            on_stage=lambda handle, stage: self.stage_updated.emit(self.folder_path, stage),
+            on_finished=lambda handle, success, message: self.process_finished.emit(
+                self.folder_path, success, message),
+            on_output_exists=self._output_exists,
+            on_ask_output_path=lambda handle, name: self.ask_output_path.emit(self.folder_path, name))
+
+    def _output_exists(self, handle, path):
+        """پرسش بازنویسی فایل خروجی موجود (مگر خروجی قبلی خود برنامه برای پوشه پایش شده)"""
+        if self.replace_own_output and os.path.exists(manifest_path(path)):
+            handle.confirm_overwrite(True)
         else:
-            # حالت پیش‌فرض: ذخیره در همان پوشه
-            self.output_filename = os.path.join(folder_path, f"{folder_name}_video.mp4")
-
-        # بررسی وجود فایل خروجی
-        if os.path.exists(self.output_filename):
-            # ارسال سیگنال برای بررسی تایید کاربر
-            self.check_output_file.emit(self.folder_path, self.output_filename)
-            # منتظر پاسخ کاربر می‌مانیم
-            while not self.cancelled and not self.overwrite_confirmed:
-                time.sleep(0.1)
-
-            # اگر عملیات لغو شده یا کاربر تایید نکرده است
-            if self.cancelled:
-                return
-
-        progress_callback = self.ThreadBarLogger(
-            self.progress_updated.emit,
-            self.update_stage,
-            folder_path,
-            self.check_pause
-        )
-
-        file_types = ['*.mp4', '*.avi', '*.mov', '*.mkv', '*.wmv',  # فرمت‌های ویدیو
-                      '*.jpg', '*.jpeg', '*.png', '*.bmp', '*.gif']  # فرمت‌های تصویر
-
-        self.update_stage("در حال جستجوی فایل‌ها")
-        self.check_pause()  # بررسی وضعیت توقف
-
-        # استفاده از set برای حذف تکراری‌ها
-        unique_files = set()
-        for file_type in file_types:
-            # اضافه کردن با حروف کوچک
-            files_found = glob.glob(os.path.join(folder_path, file_type))
-            unique_files.update(files_found)
-
-        # تبدیل به لیست برای مرتب‌سازی
-        all_files = list(unique_files)
-
-        if not all_files:
-            raise Exception(f"فایل قابل پشتیبانی در {folder_path} پیدا نشد")
-
-        # مرتب‌سازی براساس روش انتخاب شده
-        self.update_stage("در حال مرتب‌سازی فایل‌ها")
-        self.check_pause()  # بررسی وضعیت توقف
-        sorted_files = sorted(all_files, key=self.extract_sort_key)
-
-        clips = []
-        self.update_stage("در حال بارگذاری فایل‌ها")
-
-        # مقادیر تنظیمات
-        image_duration = self.settings.get("image_duration")
-        output_resolution = self.settings.get("output_resolution")
-        use_custom_resolution = self.settings.get("use_custom_resolution")
-        output_width = self.settings.get("output_width")
-        output_height = self.settings.get("output_height")
-
-        # تنظیمات مقیاس‌دهی
-        normalize_all_clips = self.settings.get("normalize_all_clips")
-        maintain_aspect_ratio = self.settings.get("maintain_aspect_ratio")
-        scaling_mode = self.settings.get("scaling_mode")
-        background_color = self.settings.get("background_color")
-
-        # تبدیل رنگ پس‌زمینه از فرمت هگز به RGB
-        bg_color = tuple(int(background_color.lstrip('#')[i:i + 2], 16) for i in (0, 2, 4))
-
-        # تعیین رزولوشن خروجی
-        target_resolution = None
-        if use_custom_resolution:
-            # اگر رزولوشن سفارشی فعال باشد، از مقادیر سفارشی استفاده کن
-            target_resolution = (output_width, output_height)
-        elif output_resolution != "original":
-            # در غیر این صورت اگر original نباشد، از رزولوشن‌های از پیش تعریف شده استفاده کن
-            if output_resolution == "480p":
-                target_resolution = (640, 480)
-            elif output_resolution == "720p":
-                target_resolution = (1280, 720)
-            elif output_resolution == "1080p":
-                target_resolution = (1920, 1080)
-
-        # نمایش تعداد فایل‌ها برای اطلاعات بیشتر
-        self.update_stage(f"بارگذاری {len(sorted_files)} فایل")
-
-        total_files = len(sorted_files)
-        processed_extensions = set()  # برای نمایش اطلاعات انواع فایل‌های پردازش شده
-
-        for index, file_path in enumerate(sorted_files):
-            # بررسی وضعیت توقف
-            self.check_pause()
-
-            if self.cancelled:
-                # آزاد کردن منابع
-                for c in clips:
-                    try:
-                        c.close()
-                    except:
-                        pass
-                return
-
-            file_ext = os.path.splitext(file_path)[1].lower()
-            processed_extensions.add(file_ext)
-            file_name = os.path.basename(file_path)
-
-            # به‌روزرسانی پیشرفت بارگذاری فایل‌ها
-            progress_percent = (index / total_files) * 100
-            self.progress_updated.emit(self.folder_path, progress_percent)
-            self.update_stage(f"در حال بارگذاری {file_name} [{index + 1}/{total_files}]")
-
-            try:
-                if file_ext in ['.jpg', '.jpeg', '.png', '.bmp', '.gif']:
-                    # تصویر - با مدت زمان تنظیم شده
-                    clip = ImageClip(file_path, duration=image_duration)
-
-                    # اعمال مقیاس‌دهی
-                    if normalize_all_clips and target_resolution:
-                        clip = self.apply_scaling(clip, target_resolution, scaling_mode, maintain_aspect_ratio,
-                                                  bg_color)
-                    elif target_resolution:
-                        clip = clip.resize(height=target_resolution[1])
-
-                elif file_ext in ['.mp4', '.avi', '.mov', '.mkv', '.wmv']:
-                    # ویدیو
-                    video_clip = VideoFileClip(file_path)
-
-                    # اعمال مقیاس‌دهی
-                    if normalize_all_clips and target_resolution:
-                        video_clip = self.apply_scaling(video_clip, target_resolution, scaling_mode,
-                                                        maintain_aspect_ratio, bg_color)
-                    elif target_resolution:  # مقیاس‌دهی ساده اگر یکسان‌سازی فعال نیست
-                        video_clip = video_clip.resize(height=target_resolution[1])
-
-                    clip = video_clip
-                else:
-                    continue
-
-                clips.append(clip)
-
-            except Exception as e:
-                # رد کردن فایل‌های مشکل‌دار
-                self.update_stage(f"رد کردن فایل مشکل‌دار: {file_name} - خطا: {str(e)}")
-                time.sleep(1)  # کمی مکث برای خواندن پیام
-                continue
+            self.check_output_file.emit(self.folder_path, path)
 
-        if not clips:
-            raise Exception(f"هیچ کلیپ معتبری برای ادغام در {folder_path} وجود ندارد")
+    def set_cpu_share(self, cores):
+        """تعیین سهم هسته‌های این کار پیش از شروع"""
+        self.cpu_share = cores
 
-        # نمایش اطلاعات تعداد کلیپ‌ها و انواع فایل‌ها
-        self.update_stage(f"آماده ادغام {len(clips)} کلیپ (انواع فایل: {', '.join(processed_extensions)})")
-
-        if self.cancelled:
-            # آزاد کردن منابع
-            for c in clips:
-                try:
-                    c.close()
-                except:
-                    pass
-            return
-
-        try:
-            self.update_stage("در حال ادغام کلیپ‌ها")
-            self.check_pause()  # بررسی وضعیت توقف
-
-            # فعال کردن قفل توقف برای عملیات حساس
-            self.set_pause_lock(True)
-            final_clip = concatenate_videoclips(clips, method="compose")
-            self.set_pause_lock(False)
-
-            # نمایش طول ویدیوی نهایی
-            duration_seconds = int(final_clip.duration)
-            minutes = duration_seconds // 60
-            seconds = duration_seconds % 60
-            self.update_stage(f"طول ویدیوی نهایی: {minutes} دقیقه و {seconds} ثانیه")
-
-            # بررسی مجدد وضعیت لغو قبل از نوشتن فایل
-            if self.cancelled:
-                final_clip.close()
-                for c in clips:
-                    try:
-                        c.close()
-                    except:
-                        pass
-                return
+    def cancel(self):
+        if self.handle:
+            self.handle.cancel()
 
-            # نوشتن در آدرس نهایی
-            self.update_stage("در حال نوشتن فایل ویدیویی نهایی")
-            self.check_pause()  # بررسی وضعیت توقف
-
-            # استفاده از تنظیمات کیفیت خروجی
-            final_clip.write_videofile(
-                self.output_filename,
-                codec=self.settings.get("video_codec"),
-                bitrate=self.settings.get("video_bitrate"),
-                audio_codec=self.settings.get("audio_codec"),
-                audio_bitrate=self.settings.get("audio_bitrate"),
-                fps=self.settings.get("fps"),
-                preset=self.settings.get("preset"),
-                threads=self.settings.get("threads"),
-                logger=progress_callback
-            )
+    def pause(self):
+        """توقف موقت پردازش"""
+        if self.handle:
+            self.handle.pause()
 
-            # آزاد کردن منابع
-            self.update_stage("در حال آزادسازی منابع")
-            for clip in clips:
-                try:
-                    clip.close()
-                except:
-                    pass
-            try:
-                final_clip.close()
-            except:
-                pass
+    def resume(self):
+        """ادامه پردازش"""
+        if self.handle:
+            self.handle.resume()
 
-            self.update_stage("عملیات با موفقیت به پایان رسید")
+    def set_overwrite_confirmed(self, confirmed):
+        """تنظیم وضعیت تایید بازنویسی فایل"""
+        self.handle.confirm_overwrite(confirmed)
 
-        except Exception as e:
-            # آزاد کردن منابع
-            for clip in clips:
-                try:
-                    clip.close()
-                except:
-                    pass
-            raise e
+    def set_output_filename(self, path):
+        """تنظیم مسیر فایل خروجی"""
+        self.handle.set_output_path(path)
 
 
 class FolderProcessWidget(QWidget):
     remove_requested = Signal(object)  # سیگنال برای درخواست حذف ویجت
 
-    def __init__(self, folder_path, queue_manager, settings, parent=None):
+    def __init__(self, folder_path, queue_manager, settings, parent=None, watched=False):
         super().__init__(parent)
         self.folder_path = folder_path
         self.queue_manager = queue_manager
         self.settings = settings
-        self.thread = VideoProcessThread(folder_path, settings)
+        self.watched = watched  # آیا پوشه با پایش پوشه اضافه شده است
+        self.rerun_pending = False  # فایل‌های جدید در حین پردازش رسیده‌اند و پس از پایان دوباره ادغام می‌شود
+        self.thread = queue_manager.create_job(folder_path, settings, watched)
         self.status = "pending"  # وضعیت‌ها: pending, queued, running, paused, completed, cancelled, failed
 
         self.setup_ui()
@@ -785,6 +453,13 @@ class FolderProcessWidget(QWidget):
             """)
         self.rebuild_button.setToolTip("ساخت مجدد ویدیو برای این پوشه")
 
+        # دکمه جلو انداختن پوشه در صف
+        self.priority_button = QPushButton("اولویت بالا")
+        self.priority_button.setCheckable(True)
+        self.priority_button.setToolTip("اجرای این پوشه پیش از بقیه پوشه‌های صف")
+        self.priority_button.toggled.connect(self.toggle_priority)
+        self.priority_button.setVisible(False)
+
         self.pause_button = QPushButton("توقف")
         self.pause_button.clicked.connect(self.toggle_pause)
 
@@ -792,6 +467,7 @@ class FolderProcessWidget(QWidget):
         self.cancel_button.clicked.connect(self.cancel_process)
 
         button_layout.addWidget(self.rebuild_button)
+        button_layout.addWidget(self.priority_button)
         button_layout.addWidget(self.pause_button)
         button_layout.addWidget(self.cancel_button)
 
@@ -818,9 +494,17 @@ class FolderProcessWidget(QWidget):
         self.status = "pending"
         self.queue_manager.add_task(self, self.thread)
 
+    def toggle_priority(self, high):
+        """جلو انداختن یا بازگرداندن این پوشه در صف"""
+        self.queue_manager.set_high_priority(self.thread, high)
+
     def status_changed(self, new_status):
         """به‌روزرسانی وضعیت ویجت"""
         self.status = new_status
+        # اولویت فقط برای پوشه‌های در صف معنا دارد
+        self.priority_button.setVisible(new_status == "queued")
+        if new_status != "queued":
+            self.priority_button.setChecked(False)
         if new_status == "queued":
             self.status_label.setText("وضعیت: در صف 🕒")
             self.stage_label.setText("مرحله: در انتظار اجرا")
@@ -905,10 +589,15 @@ class FolderProcessWidget(QWidget):
         # اعلام پایان به مدیر صف
         self.queue_manager.task_finished(self.thread)
 
+        # فایل‌هایی که در حین پردازش به پوشه پایش شده رسیده‌اند
+        if self.rerun_pending:
+            self.rerun_pending = False
+            self.rebuild_process()
+
     def rebuild_process(self):
         """شروع مجدد پردازش پوشه"""
         # ایجاد یک ترد جدید
-        self.thread = VideoProcessThread(self.folder_path, self.settings)
+        self.thread = self.queue_manager.create_job(self.folder_path, self.settings, self.watched)
 
         # اتصال مجدد سیگنال‌ها
         self.thread.progress_updated.connect(self.update_progress)
@@ -1194,18 +883,23 @@ class SettingsDialog(QDialog):
 
         self.sort_date = QRadioButton("مرتب‌سازی براساس تاریخ")
         self.sort_name = QRadioButton("مرتب‌سازی براساس نام فایل")
+        self.sort_capture_time = QRadioButton("مرتب‌سازی براساس زمان ثبت (EXIF تصاویر و تاریخ ساخت ویدیوها)")
 
         self.sort_method_group.addButton(self.sort_date, 1)
         self.sort_method_group.addButton(self.sort_name, 2)
+        self.sort_method_group.addButton(self.sort_capture_time, 3)
 
         # تنظیم وضعیت پیش‌فرض
         if self.settings.get("sort_method") == "date":
             self.sort_date.setChecked(True)
         elif self.settings.get("sort_method") == "name":
             self.sort_name.setChecked(True)
+        elif self.settings.get("sort_method") == "capture_time":
+            self.sort_capture_time.setChecked(True)
 
         sort_layout.addWidget(self.sort_date)
         sort_layout.addWidget(self.sort_name)
+        sort_layout.addWidget(self.sort_capture_time)
 
         # فیلد برای وارد کردن الگوی رجکس سفارشی
         regex_layout = QFormLayout()
@@ -1222,6 +916,11 @@ class SettingsDialog(QDialog):
         sort_layout.addLayout(regex_layout)
         sort_layout.addWidget(regex_info)
 
+        # جستجوی فایل‌ها در زیرپوشه‌ها
+        self.include_subfolders = QCheckBox("ادغام فایل‌های زیرپوشه‌ها همراه با فایل‌های خود پوشه")
+        self.include_subfolders.setChecked(self.settings.get("include_subfolders"))
+        sort_layout.addWidget(self.include_subfolders)
+
         # اتصال وضعیت فعال/غیرفعال بودن فیلد رجکس به رادیو باتن تاریخ
         self.sort_date.toggled.connect(self.toggle_regex_field)
 
@@ -1283,6 +982,39 @@ class SettingsDialog(QDialog):
 
         self.layout.addWidget(output_path_group)
 
+        # گروه پایش پوشه
+        watch_group = QGroupBox("پایش پوشه")
+        watch_layout = QVBoxLayout(watch_group)
+
+        watch_folder_layout = QHBoxLayout()
+        self.watch_folder = QLineEdit(self.settings.get("watch_folder"))
+        self.watch_folder.setPlaceholderText("غیرفعال")
+        self.watch_folder.setToolTip("زیرپوشه‌هایی که فایل جدید دریافت می‌کنند پس از پایان بارگذاری خودکار ادغام می‌شوند")
+        self.watch_browse_button = QPushButton("انتخاب...")
+        self.watch_browse_button.clicked.connect(self.browse_watch_folder)
+        watch_folder_layout.addWidget(QLabel("پوشه پایش:"))
+        watch_folder_layout.addWidget(self.watch_folder)
+        watch_folder_layout.addWidget(self.watch_browse_button)
+        watch_layout.addLayout(watch_folder_layout)
+
+        settle_layout = QHBoxLayout()
+        self.watch_settle_seconds = QSpinBox()
+        self.watch_settle_seconds.setRange(1, 3600)
+        self.watch_settle_seconds.setValue(self.settings.get("watch_settle_seconds"))
+        self.watch_settle_seconds.setSuffix(" ثانیه")
+        self.watch_settle_seconds.setToolTip("ادغام پوشه پس از این مدت بدون فایل جدید شروع می‌شود")
+        settle_layout.addWidget(QLabel("انتظار پس از آخرین فایل:"))
+        settle_layout.addWidget(self.watch_settle_seconds)
+        settle_layout.addStretch(1)
+        watch_layout.addLayout(settle_layout)
+
+        if not watch_supported():
+            # پایش رویدادمحور پوشه‌ها به inotify نیاز دارد
+            watch_group.setEnabled(False)
+            watch_group.setToolTip("پایش پوشه فقط در لینوکس پشتیبانی می‌شود")
+
+        self.layout.addWidget(watch_group)
+
         # گروه تنظیمات کیفیت خروجی
         quality_group = QGroupBox("تنظیمات کیفیت خروجی")
         quality_layout = QFormLayout(quality_group)
@@ -1325,10 +1057,74 @@ class SettingsDialog(QDialog):
 
         # تعداد ترد
         self.threads = QSpinBox()
-        self.threads.setRange(1, 16)
+        self.threads.setRange(0, 64)
+        self.threads.setSpecialValueText("خودکار")
         self.threads.setValue(self.settings.get("threads"))
         quality_layout.addRow("تعداد ترد (پردازنده):", self.threads)
 
+        # تعداد پردازش‌های همزمان پوشه‌ها
+        self.max_concurrent_jobs = QSpinBox()
+        self.max_concurrent_jobs.setRange(0, 64)
+        self.max_concurrent_jobs.setSpecialValueText("خودکار")
+        self.max_concurrent_jobs.setValue(self.settings.get("max_concurrent_jobs"))
+        quality_layout.addRow("پردازش‌های همزمان:", self.max_concurrent_jobs)
+        cpu_info = QLabel(f"خودکار = تقسیم {available_cpus()} هسته بین پوشه‌های در حال پردازش")
+        cpu_info.setStyleSheet("color: #666666; font-size: 10px;")
+        quality_layout.addRow("", cpu_info)
+
+        # ترتیب اجرای پوشه‌های صف
+        self.queue_policy = QComboBox()
+        self.queue_policy.addItem("اول کارهای کوتاه‌تر (براساس مدت و رزولوشن)", "shortest_first")
+        self.queue_policy.addItem("به ترتیب اضافه شدن", "fifo")
+        index = self.queue_policy.findData(self.settings.get("queue_policy"))
+        if index >= 0:
+            self.queue_policy.setCurrentIndex(index)
+        quality_layout.addRow("ترتیب اجرای صف:", self.queue_policy)
+
+        # تعداد پردازه‌های رندر همزمان در ادغام هوشمند
+        self.segment_workers = QSpinBox()
+        self.segment_workers.setRange(0, 64)
+        self.segment_workers.setSpecialValueText("خودکار")
+        self.segment_workers.setValue(self.settings.get("segment_workers"))
+        quality_layout.addRow("پردازه‌های رندر همزمان:", self.segment_workers)
+        segment_workers_info = QLabel("خودکار = سهم هسته‌های هر پوشه تقسیم بر تعداد ترد هر انکودر")
+        segment_workers_info.setStyleSheet("color: #666666; font-size: 10px;")
+        quality_layout.addRow("", segment_workers_info)
+
+        # کش قطعه‌های رندر شده برای ساخت مجدد سریع
+        self.segment_cache_size = QSpinBox()
+        self.segment_cache_size.setRange(0, 1024 * 1024)
+        self.segment_cache_size.setSingleStep(512)
+        self.segment_cache_size.setSuffix(" MB")
+        self.segment_cache_size.setSpecialValueText("غیرفعال")
+        self.segment_cache_size.setValue(self.settings.get("segment_cache_size_mb"))
+        quality_layout.addRow("حجم کش قطعه‌ها:", self.segment_cache_size)
+
+        # ادغام بدون رندر در صورت یکسان بودن فرمت ویدیوها
+        self.stream_copy_when_possible = QCheckBox("ادغام بدون رندر مجدد وقتی همه ویدیوها فرمت یکسان دارند")
+        self.stream_copy_when_possible.setChecked(self.settings.get("stream_copy_when_possible"))
+        quality_layout.addRow("", self.stream_copy_when_possible)
+
+        # ادغام هوشمند: رندر فقط فایل‌های ناسازگار
+        self.smart_render = QCheckBox("ادغام هوشمند (فقط تصاویر و ویدیوهای ناسازگار رندر شوند)")
+        self.smart_render.setChecked(self.settings.get("smart_render"))
+        quality_layout.addRow("", self.smart_render)
+
+        # نرخ فریم متغیر برای تصاویر ثابت
+        self.still_image_vfr = QCheckBox("نرخ فریم متغیر برای تصاویر (رندر سریع‌تر و حجم کمتر در ادغام هوشمند)")
+        self.still_image_vfr.setToolTip("فقط برای تصاویری که ادغام هوشمند رندر می‌کند (کدک H.264 یا H.265)؛ "
+                                         "رندر کامل همیشه نرخ فریم ثابت خروجی را می‌نویسد")
+        self.still_image_vfr.setChecked(self.settings.get("still_image_vfr"))
+        quality_layout.addRow("", self.still_image_vfr)
+        # نرخ فریم متغیر فقط در ادغام هوشمند کاربرد دارد
+        self.smart_render.toggled.connect(self.still_image_vfr.setEnabled)
+        self.still_image_vfr.setEnabled(self.smart_render.isChecked())
+
+        # رندر کامل بدون عبور فریم‌ها از moviepy
+        self.frame_pipeline = QCheckBox("رندر کامل سریع (دیکد، مقیاس‌دهی و انکد مستقیم با ffmpeg)")
+        self.frame_pipeline.setChecked(self.settings.get("frame_pipeline"))
+        quality_layout.addRow("", self.frame_pipeline)
+
         self.layout.addWidget(quality_group)
 
         # وضعیت اولیه فیلدهای رزولوشن سفارشی، رجکس و پوشه ثابت
@@ -1439,6 +1235,13 @@ class SettingsDialog(QDialog):
         if folder:
             self.fixed_output_folder.setText(folder)
 
+    def browse_watch_folder(self):
+        """انتخاب پوشه پایش"""
+        folder = QFileDialog.getExistingDirectory(
+            self, "انتخاب پوشه پایش", self.watch_folder.text())
+        if folder:
+            self.watch_folder.setText(folder)
+
     def accept(self):
         """ذخیره تنظیمات و بستن دیالوگ"""
         # هشدار در مورد پردازش‌های در حال اجرا
@@ -1466,9 +1269,12 @@ class SettingsDialog(QDialog):
             self.settings.set("sort_method", "date")
         elif self.sort_name.isChecked():
             self.settings.set("sort_method", "name")
+        elif self.sort_capture_time.isChecked():
+            self.settings.set("sort_method", "capture_time")
 
         # ذخیره رجکس سفارشی
         self.settings.set("custom_regex", self.custom_regex.text())
+        self.settings.set("include_subfolders", self.include_subfolders.isChecked())
 
         # ذخیره تنظیمات مسیر خروجی
         if self.same_folder_radio.isChecked():
@@ -1482,6 +1288,10 @@ class SettingsDialog(QDialog):
         self.settings.set("output_filename_format", self.output_filename_format.text())
         self.settings.set("fixed_output_folder", self.fixed_output_folder.text())
 
+        # ذخیره تنظیمات پایش پوشه
+        self.settings.set("watch_folder", self.watch_folder.text())
+        self.settings.set("watch_settle_seconds", self.watch_settle_seconds.value())
+
         # ذخیره تنظیمات کیفیت خروجی
         self.settings.set("video_codec", self.video_codec.currentText())
         self.settings.set("video_bitrate", self.video_bitrate.text())
@@ -1490,6 +1300,14 @@ class SettingsDialog(QDialog):
         self.settings.set("fps", self.fps.value())
         self.settings.set("preset", self.preset.currentText())
         self.settings.set("threads", self.threads.value())
+        self.settings.set("max_concurrent_jobs", self.max_concurrent_jobs.value())
+        self.settings.set("queue_policy", self.queue_policy.currentData())
+        self.settings.set("segment_workers", self.segment_workers.value())
+        self.settings.set("segment_cache_size_mb", self.segment_cache_size.value())
+        self.settings.set("stream_copy_when_possible", self.stream_copy_when_possible.isChecked())
+        self.settings.set("smart_render", self.smart_render.isChecked())
+        self.settings.set("still_image_vfr", self.still_image_vfr.isChecked())
+        self.settings.set("frame_pipeline", self.frame_pipeline.isChecked())
 
         # ذخیره تنظیمات مقیاس‌دهی
         self.settings.set("normalize_all_clips", self.normalize_all_clips.isChecked())
@@ -1537,7 +1355,7 @@ class EmptyStateWidget(QWidget):
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.setWindowTitle("مرج کننده ویدئوهای فولدر (حداکثر 2 پردازش همزمان)")
+        self.setWindowTitle("مرج کننده ویدئوهای فولدر")
         self.setMinimumSize(800, 600)
         self.folder_widgets = {}
 
@@ -1547,14 +1365,20 @@ class MainWindow(QMainWindow):
         # ایجاد آیکون ترای سیستم برای نوتیفیکیشن
         self.setup_system_tray()
 
-        # ایجاد مدیر صف با محدودیت 2 پردازش همزمان
-        self.queue_manager = QueueManager(max_concurrent=2, parent=self)
+        # ایجاد مدیر صف (تعداد پردازش‌های همزمان و ترد هر کار براساس هسته‌های سیستم)
+        self.queue_manager = QueueManager(max_concurrent=self.settings.get("max_concurrent_jobs"),
+                                          policy=self.settings.get("queue_policy"), parent=self)
 
         self.setup_ui()
 
         # فعال کردن پشتیبانی از درگ و دراپ
         self.setAcceptDrops(True)
 
+        # پایش پوشه برای ادغام خودکار پوشه‌هایی که فایل جدید دریافت می‌کنند
+        self.folder_watcher = None
+        self.watch_config = None
+        self.update_folder_watcher()
+
     def setup_system_tray(self):
         """راه‌اندازی آیکون ترای سیستم برای نوتیفیکیشن"""
         try:
@@ -1694,6 +1518,8 @@ class MainWindow(QMainWindow):
         sort_text = "نام فایل"
         if self.settings.get("sort_method") == "date":
             sort_text = "تاریخ"
+        elif self.settings.get("sort_method") == "capture_time":
+            sort_text = "زمان ثبت"
 
         # متن محل ذخیره
         output_path_type = self.settings.get("output_path_type")
@@ -1742,7 +1568,45 @@ class MainWindow(QMainWindow):
             folders = dialog.selected_folders()
             self.process_folders(folders)
 
-    def process_folders(self, folders):
+    def update_folder_watcher(self):
+        """شروع، تغییر یا توقف پایش پوشه براساس تنظیمات"""
+        watch_config = (self.settings.get("watch_folder"), self.settings.get("watch_settle_seconds"))
+        if watch_config == self.watch_config:
+            return
+        self.watch_config = watch_config
+        if self.folder_watcher:
+            self.folder_watcher.stop()
+            self.folder_watcher = None
+
+        watch_folder, settle_seconds = watch_config
+        if not watch_folder or not watch_supported():
+            return
+        if not os.path.isdir(watch_folder):
+            print(f"پوشه پایش وجود ندارد: {watch_folder}")
+            return
+        self.folder_watcher = FolderWatcher(
+            watch_folder,
+            # اعلام پوشه آماده از ترد پایش به ترد اصلی
+            on_ready=lambda folder: self.queue_manager.invoker.invoke(lambda: self.watch_folder_ready(folder)),
+            extensions=VIDEO_EXTENSIONS + IMAGE_EXTENSIONS,
+            settle_seconds=settle_seconds,
+            ignore=lambda file_path: is_merge_output(file_path, self.settings))
+        self.folder_watcher.start()
+
+    def watch_folder_ready(self, folder):
+        """افزودن خودکار پوشه‌ای که بارگذاری فایل‌های جدیدش تمام شده است"""
+        widget = self.folder_widgets.get(folder)
+        if widget is None:
+            self.process_folders([folder], watched=True)
+        elif widget.status in ("running", "paused"):
+            # پس از پایان پردازش فعلی دوباره با فایل‌های جدید ادغام می‌شود
+            widget.rerun_pending = True
+        elif widget.status in ("completed", "failed", "cancelled"):
+            # فقط فایل‌های جدید رندر می‌شوند؛ بقیه از کش اطلاعات و قطعه‌ها برداشته می‌شوند
+            widget.watched = True
+            widget.rebuild_process()
+
+    def process_folders(self, folders, watched=False):
         """پردازش لیستی از پوشه‌ها"""
         if not folders:
             return
@@ -1753,7 +1617,7 @@ class MainWindow(QMainWindow):
                 continue
 
             # ایجاد ویجت برای این پوشه
-            folder_widget = FolderProcessWidget(folder, self.queue_manager, self.settings)
+            folder_widget = FolderProcessWidget(folder, self.queue_manager, self.settings, watched=watched)
             self.folder_widgets[folder] = folder_widget
 
             # اتصال سیگنال حذف ویجت
@@ -1801,6 +1665,9 @@ class MainWindow(QMainWindow):
         """نمایش دیالوگ تنظیمات"""
         dialog = SettingsDialog(self.settings, self.queue_manager, self)
         if dialog.exec():
+            self.queue_manager.set_policy(self.settings.get("queue_policy"))
+            self.queue_manager.set_max_concurrent(self.settings.get("max_concurrent_jobs"))
+            self.update_folder_watcher()
             # به‌روزرسانی نمایش تنظیمات
             self.update_settings_display()
 
@@ -1894,6 +1761,8 @@ class MainWindow(QMainWindow):
 
 
 if __name__ == "__main__":
+    # لازم برای پردازه‌های رندر در نسخه اجرایی ساخته شده با PyInstaller
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
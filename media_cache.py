@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+
+from PIL import Image
+
+from ffmpeg_tools import empty_media_info
+
+# با تغییر روش خواندن اطلاعات فایل‌ها افزایش می‌یابد تا اطلاعات قدیمی کش دوباره خوانده شوند
+PROBE_CACHE_VERSION = 3
+
+# با تغییر روش رندر قطعه‌ها افزایش می‌یابد تا قطعه‌های قدیمی دوباره استفاده نشوند
+SEGMENT_CACHE_VERSION = 2
+
+# اجاره قطعه‌هایی که کاری پس از این مدت آزاد نکرده است (مثلاً پردازه بسته شده) نادیده گرفته می‌شود (ثانیه)
+SEGMENT_LEASE_TIMEOUT = 24 * 3600
+
+
+# برچسب‌های EXIF مربوط به زمان ثبت تصویر
+EXIF_IFD = 0x8769
+EXIF_DATETIME = 0x0132
+EXIF_DATETIME_ORIGINAL = 0x9003
+EXIF_OFFSET_TIME_ORIGINAL = 0x9011
+
+
+def exif_capture_time(exif):
+    """زمان ثبت تصویر (ثانیه از مبدا یونیکس) از DateTimeOriginal در EXIF، یا None"""
+    exif_ifd = exif.get_ifd(EXIF_IFD)
+    value = exif_ifd.get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+    if not isinstance(value, str):
+        return None
+    try:
+        taken = datetime.strptime(value.strip("\0 ")[:19], "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+    offset = exif_ifd.get(EXIF_OFFSET_TIME_ORIGINAL)
+    if isinstance(offset, str) and len(offset) >= 6 and offset[0] in "+-":
+        # با اختلاف ساعت ثبت شده، زمان با creation_time ویدیوها (وقت جهانی) قابل مقایسه است
+        try:
+            hours, minutes = int(offset[1:3]), int(offset[4:6])
+        except ValueError:
+            hours = minutes = 0
+        sign = 1 if offset[0] == "+" else -1
+        return taken.replace(tzinfo=timezone(sign * timedelta(hours=hours, minutes=minutes))).timestamp()
+    # بدون اختلاف ساعت، زمان EXIF به وقت محلی سیستم فرض می‌شود
+    return taken.timestamp()
+
+
+def probe_image(file_path):
+    """خواندن ابعاد و زمان ثبت یک تصویر فقط از روی هدر فایل (بدون دیکد کامل)"""
+    with Image.open(file_path) as image:
+        width, height = image.size
+        try:
+            capture_time = exif_capture_time(image.getexif())
+        except Exception:
+            # EXIF خراب نباید مانع استفاده از خود تصویر شود
+            capture_time = None
+    info = empty_media_info("image")
+    info["width"] = width
+    info["height"] = height
+    info["capture_time"] = capture_time
+    return info
+
+
+class ProbeCache:
+    """کش دائمی اطلاعات فایل‌ها در SQLite با کلید (مسیر، حجم، زمان تغییر)"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = None
+        try:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            if self.conn.execute("PRAGMA user_version").fetchone()[0] != PROBE_CACHE_VERSION:
+                self.conn.execute("DROP TABLE IF EXISTS probes")
+                self.conn.execute(f"PRAGMA user_version = {PROBE_CACHE_VERSION}")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS probes ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, info TEXT)")
+            self.conn.commit()
+        except (sqlite3.Error, OSError) as e:
+            # بدون کش هم برنامه کار می‌کند، فقط هر بار فایل‌ها دوباره بررسی می‌شوند
+            print(f"خطا در باز کردن کش اطلاعات فایل‌ها: {e}")
+            self.conn = None
+
+    def lookup(self, file_path):
+        """اطلاعات ذخیره شده یک فایل، اگر از زمان ذخیره تغییری نکرده باشد"""
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        if self.conn is None:
+            return None
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, info FROM probes WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return json.loads(row[2])
+        return None
+
+    def store(self, file_path, info):
+        """ذخیره اطلاعات یک فایل همراه با حجم و زمان تغییر فعلی آن"""
+        if self.conn is None:
+            return
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        try:
+            with self.lock:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO probes (path, size, mtime_ns, info) VALUES (?, ?, ?, ?)",
+                    (path, stat.st_size, stat.st_mtime_ns, json.dumps(info)))
+                self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"خطا در ذخیره کش اطلاعات فایل: {e}")
+
+    def get(self, file_path, probe_fn):
+        """اطلاعات فایل از کش؛ در صورت نبود یا تغییر فایل، با probe_fn خوانده و ذخیره می‌شود"""
+        info = self.lookup(file_path)
+        if info is None:
+            info = probe_fn(file_path)
+            self.store(file_path, info)
+        return info
+
+
+def segment_key(file_path, kind, reference_signature, options):
+    """کلید محتوایی یک قطعه: هویت فایل منبع به‌همراه مشخصات مرجع و تنظیمات موثر بر رندر"""
+    stat = os.stat(file_path)
+    payload = json.dumps({
+        "version": SEGMENT_CACHE_VERSION,
+        "source": [os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns],
+        "kind": kind,
+        "reference": reference_signature,
+        "options": options,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf8")).hexdigest()
+
+
+class SegmentCache:
+    """کش قطعه‌های رندر شده با کلید محتوایی و حذف کم‌استفاده‌ترین‌ها براساس حجم (LRU)
+
+    کارها در پردازه‌های جداگانه از یک کش مشترک استفاده می‌کنند؛ هر قطعه‌ای که کاری برداشته یا ذخیره کرده
+    تا آزاد شدن با release برای آن کار اجاره می‌شود و evict آن را پاک نمی‌کند.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+        self.conn = None
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.conn = sqlite3.connect(os.path.join(cache_dir, "segments.sqlite3"),
+                                        timeout=30, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS segments ("
+                "key TEXT PRIMARY KEY, size INTEGER, last_used REAL)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "key TEXT, owner TEXT, acquired REAL, PRIMARY KEY (key, owner))")
+            self.conn.commit()
+        except (sqlite3.Error, OSError) as e:
+            print(f"خطا در باز کردن کش قطعه‌ها: {e}")
+            self.conn = None
+
+    def path_for(self, key):
+        """مسیر فایل قطعه در پوشه کش"""
+        return os.path.join(self.cache_dir, f"{key}.mp4")
+
+    def _begin(self):
+        """شروع تراکنش نوشتنی تا بررسی و تغییر کش بین پردازه‌ها یکجا انجام شود"""
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def lookup(self, key, owner):
+        """مسیر قطعه ذخیره شده (و اجاره آن برای owner) یا None در صورت نبود آن"""
+        if self.conn is None:
+            return None
+        path = self.path_for(key)
+        with self.lock:
+            try:
+                self._begin()
+                row = self.conn.execute("SELECT size FROM segments WHERE key = ?", (key,)).fetchone()
+                if row is not None and (not os.path.exists(path) or os.path.getsize(path) != row[0]):
+                    # فایل قطعه بیرون از برنامه پاک یا خراب شده است
+                    self.conn.execute("DELETE FROM segments WHERE key = ?", (key,))
+                    row = None
+                if row is not None:
+                    now = time.time()
+                    self.conn.execute("UPDATE segments SET last_used = ? WHERE key = ?", (now, key))
+                    self.conn.execute("INSERT OR REPLACE INTO leases (key, owner, acquired) VALUES (?, ?, ?)",
+                                      (key, owner, now))
+                self.conn.commit()
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                print(f"خطا در خواندن کش قطعه‌ها: {e}")
+                return None
+        return path if row is not None else None
+
+    def store(self, key, file_path, owner):
+        """انتقال یک قطعه تازه رندر شده به کش (اجاره شده برای owner)؛ مسیر نهایی قطعه را برمی‌گرداند"""
+        if self.conn is None:
+            return file_path
+        path = self.path_for(key)
+        try:
+            with self.lock:
+                self._begin()
+                try:
+                    shutil.move(file_path, path)
+                    now = time.time()
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO segments (key, size, last_used) VALUES (?, ?, ?)",
+                        (key, os.path.getsize(path), now))
+                    self.conn.execute("INSERT OR REPLACE INTO leases (key, owner, acquired) VALUES (?, ?, ?)",
+                                      (key, owner, now))
+                    self.conn.commit()
+                except BaseException:
+                    self.conn.rollback()
+                    raise
+        except (sqlite3.Error, OSError) as e:
+            print(f"خطا در ذخیره قطعه در کش: {e}")
+            return path if os.path.exists(path) else file_path
+        return path
+
+    def release(self, owner):
+        """آزاد کردن همه قطعه‌های اجاره شده یک کار (پس از چسباندن قطعه‌ها یا پایان کار)"""
+        if self.conn is None:
+            return
+        try:
+            with self.lock:
+                self.conn.execute("DELETE FROM leases WHERE owner = ?", (owner,))
+                self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"خطا در آزاد کردن قطعه‌های کش: {e}")
+
+    def evict(self, max_bytes):
+        """حذف کم‌استفاده‌ترین قطعه‌ها تا حجم کل کش از max_bytes بیشتر نباشد
+
+        قطعه‌هایی که کار دیگری در حال استفاده از آن‌هاست (اجاره معتبر دارند) پاک نمی‌شوند.
+        """
+        if self.conn is None:
+            return
+        try:
+            with self.lock:
+                self._begin()
+                try:
+                    self.conn.execute("DELETE FROM leases WHERE acquired < ?",
+                                      (time.time() - SEGMENT_LEASE_TIMEOUT,))
+                    leased = {row[0] for row in self.conn.execute("SELECT DISTINCT key FROM leases")}
+                    rows = self.conn.execute("SELECT key, size FROM segments ORDER BY last_used DESC").fetchall()
+                    total = 0
+                    for key, size in rows:
+                        total += size
+                        if total <= max_bytes or key in leased:
+                            continue
+                        try:
+                            os.remove(self.path_for(key))
+                        except OSError:
+                            pass
+                        self.conn.execute("DELETE FROM segments WHERE key = ?", (key,))
+                    self.conn.commit()
+                except BaseException:
+                    self.conn.rollback()
+                    raise
+        except sqlite3.Error as e:
+            print(f"خطا در پاک‌سازی کش قطعه‌ها: {e}")
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def open_probe_cache(db_path):
+    """کش مشترک برای یک فایل پایگاه داده (همه پردازش‌ها از یک اتصال استفاده می‌کنند)"""
+    with _caches_lock:
+        if db_path not in _caches:
+            _caches[db_path] = ProbeCache(db_path)
+        return _caches[db_path]
+
+
+def open_segment_cache(cache_dir):
+    """کش مشترک قطعه‌ها برای یک پوشه"""
+    with _caches_lock:
+        if cache_dir not in _caches:
+            _caches[cache_dir] = SegmentCache(cache_dir)
+        return _caches[cache_dir]
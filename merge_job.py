@@ -0,0 +1,1304 @@
+import os
+import re
+import time
+import signal
+import shutil
+import tempfile
+import uuid
+import threading
+from collections import Counter
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+from proglog import ProgressBarLogger
+from moviepy.editor import ImageClip, VideoFileClip
+from moviepy.tools import find_extension
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+from ffmpeg_tools import (FFmpegError, ENCODER_CODEC_NAMES, AUDIO_ENCODER_CODEC_NAMES, SEGMENT_JOIN_CODECS,
+                          empty_media_info, probe_media, stream_signature, concat_copy)
+from media_cache import open_probe_cache, open_segment_cache, segment_key, probe_image
+from job_manifest import is_up_to_date, write_manifest
+from scaling import scale_clip, open_scaled_image, prepare_images, ffmpeg_scale_filter
+from lazy_clips import ClipDescriptor, LazyTimeline
+from frame_pipeline import render_frames
+from segment_encoder import (encode_segment_job, encode_segments, segment_worker_count, segment_encoding_plan,
+                             available_cpus,
+                             PROGRESS_INTERVAL)
+
+# پسوند فایل‌های قابل پشتیبانی
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv', '.wmv']
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.gif']
+MEDIA_EXTENSIONS = frozenset(VIDEO_EXTENSIONS + IMAGE_EXTENSIONS)
+
+# فرمان‌هایی که رابط کاربری می‌تواند به پردازه کار بفرستد
+CONTROL_COMMANDS = ("cancel", "pause", "resume", "set_overwrite_confirmed", "set_output_filename")
+
+
+# تنظیمات پیش‌فرض (مشترک بین رابط کاربری و خط فرمان)
+DEFAULT_SETTINGS = {
+    "image_duration": 10,  # مدت زمان نمایش هر تصویر (ثانیه)
+    "output_resolution": "original",  # سایز خروجی (original, 720p, 1080p, etc.)
+    "output_width": 1920,  # عرض خروجی سفارشی
+    "output_height": 1080,  # ارتفاع خروجی سفارشی
+    "use_custom_resolution": False,  # استفاده از رزولوشن سفارشی
+    "sort_method": "date",  # روش مرتب‌سازی: date, name, capture_time یا custom
+    "custom_regex": r"_(\d+)_(\d+)_(\d+)_(\d+)_(\d+)_(\d+)\s(AM|PM)",  # رجکس سفارشی
+    "include_subfolders": False,  # ادغام فایل‌های زیرپوشه‌ها همراه با فایل‌های خود پوشه
+    "output_path_type": "same_folder",  # same_folder, fixed_folder, ask_user
+    "output_filename_format": "{folder_name}_video.mp4",  # فرمت نام فایل خروجی
+    "fixed_output_folder": os.path.expanduser("~/Videos"),  # پوشه ثابت (پیش‌فرض: پوشه ویدیوها)
+
+    # تنظیمات کیفیت خروجی
+    "video_codec": "libx264",  # کدک ویدیو
+    "video_bitrate": "700k",  # نرخ بیت ویدیو
+    "audio_codec": "aac",  # کدک صدا
+    "audio_bitrate": "128k",  # نرخ بیت صدا
+    "fps": 30,  # فریم بر ثانیه
+    "preset": "medium",  # پیش‌تنظیم کدک
+    "threads": 0,  # تعداد ترد برای کدینگ (0 = خودکار: همه سهم هسته‌های کار در رندر کامل، چند ترد برای هر پردازه رندر قطعه)
+    "stream_copy_when_possible": True,  # ادغام بدون رندر وقتی همه ویدیوها فرمت یکسان دارند
+    "smart_render": True,  # رندر فقط فایل‌های ناسازگار و کپی مستقیم بقیه
+    "still_image_vfr": False,  # نرخ فریم متغیر برای تصاویر ثابت (یک فریم در ثانیه؛ فقط در ادغام هوشمند)
+    "segment_workers": 0,  # تعداد پردازه‌های رندر همزمان قطعه‌ها (0 = خودکار براساس هسته‌ها)
+    "max_concurrent_jobs": 0,  # حداکثر پردازش‌های همزمان (0 = خودکار براساس هسته‌ها)
+    "queue_policy": "shortest_first",  # ترتیب اجرای صف: shortest_first یا fifo
+    "segment_cache_size_mb": 2048,  # حداکثر حجم کش قطعه‌های رندر شده (0 = غیرفعال)
+    "frame_pipeline": True,  # رندر کامل با دیکد و انکد مستقیم ffmpeg روی حافظه مشترک
+    "watch_folder": "",  # پوشه‌ای که زیرپوشه‌های دارای فایل جدید آن خودکار ادغام می‌شوند (خالی = غیرفعال)
+    "watch_settle_seconds": 30,  # مدت بدون تغییر پیش از ادغام پوشه پایش شده (ثانیه)
+
+    # تنظیمات مقیاس‌دهی
+    "scaling_mode": "fit",  # شیوه مقیاس‌دهی: fit, fill, stretch
+    "background_color": "#000000",  # رنگ پس‌زمینه برای حالت fit
+    "maintain_aspect_ratio": True,  # حفظ نسبت تصویر
+    "normalize_all_clips": True,  # یکسان‌سازی ابعاد همه کلیپ‌ها
+}
+
+
+# هزینه نسبی رندر هر ثانیه تصویر ثابت نسبت به ویدیو (بدون دیکد فریم‌های متوالی)
+STILL_COST_FACTOR = 0.25
+
+
+def find_media_files(folder_path, recursive=False):
+    """لیست فایل‌های ویدیو و تصویر قابل پشتیبانی یک پوشه (و در صورت نیاز زیرپوشه‌های آن)
+
+    هر پوشه فقط یک بار فهرست می‌شود و پسوندها بدون توجه به حروف بزرگ و کوچک (مثلاً .JPG دوربین‌ها) بررسی می‌شوند.
+    فایل‌ها و پوشه‌های مخفی (مانند پوشه قطعه‌های موقت ادغام هوشمند) مانند قبل نادیده گرفته می‌شوند.
+    """
+    media_files = []
+    pending = [folder_path]
+    while pending:
+        directory = pending.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError as e:
+            if directory == folder_path:
+                raise
+            print(f"خطا در خواندن پوشه {directory}: {e}")
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    if entry.is_file():
+                        if os.path.splitext(entry.name)[1].lower() in MEDIA_EXTENSIONS:
+                            media_files.append(entry.path)
+                    elif recursive and entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                except OSError:
+                    # فایلی که در حین فهرست کردن حذف شده یا پیوند شکسته است
+                    continue
+    return media_files
+
+
+def output_file_path(folder_path, settings):
+    """مسیر فایل خروجی یک پوشه براساس تنظیمات، یا None وقتی مسیر از کاربر پرسیده می‌شود"""
+    folder_name = os.path.basename(os.path.dirname(folder_path))
+    output_path_type = settings.get("output_path_type")
+
+    # جایگزینی متغیرهای در فرمت نام فایل
+    output_filename = settings.get("output_filename_format").format(folder_name=folder_name)
+
+    if output_path_type == "same_folder":
+        # ذخیره در همان پوشه
+        return os.path.join(folder_path, output_filename)
+    if output_path_type == "fixed_folder":
+        # ذخیره در پوشه ثابت
+        return os.path.join(settings.get("fixed_output_folder"), output_filename)
+    if output_path_type == "ask_user":
+        return None
+    # حالت پیش‌فرض: ذخیره در همان پوشه
+    return os.path.join(folder_path, f"{folder_name}_video.mp4")
+
+
+def is_merge_output(file_path, settings):
+    """آیا فایل، خروجی ادغام خود برنامه است (و نه یک ورودی جدید)"""
+    directory = os.path.abspath(os.path.dirname(file_path))
+    if settings.get("output_path_type") == "fixed_folder":
+        return directory == os.path.abspath(settings.get("fixed_output_folder"))
+    output_path = output_file_path(directory, settings)
+    return output_path is not None and os.path.abspath(output_path) == os.path.abspath(file_path)
+
+
+def output_target_resolution(settings):
+    """ابعاد قاب خروجی براساس تنظیمات، یا None برای اندازه اصلی"""
+    # اگر رزولوشن سفارشی فعال باشد، از مقادیر سفارشی استفاده کن
+    if settings.get("use_custom_resolution"):
+        return (settings.get("output_width"), settings.get("output_height"))
+    # در غیر این صورت از رزولوشن‌های از پیش تعریف شده استفاده کن
+    return {
+        "480p": (640, 480),
+        "720p": (1280, 720),
+        "1080p": (1920, 1080),
+    }.get(settings.get("output_resolution"))
+
+
+def estimate_job_cost(folder_path, settings):
+    """برآورد سریع هزینه ادغام یک پوشه برای زمان‌بندی صف
+
+    هزینه برابر مدت کل ویدیوها و تصاویر (تصاویر با وزن کمتر) ضرب در نسبت پیکسل‌های قاب خروجی به 1080p است.
+    مدت ویدیوها از کش اطلاعات فایل‌ها خوانده می‌شود و همان کش در شروع پردازش دوباره استفاده خواهد شد.
+    """
+    probe_cache = open_probe_cache(os.path.join(settings.cache_dir(), "media_cache.sqlite3"))
+    videos = []
+    stills = 0
+    for file_path in find_media_files(folder_path, settings.get("include_subfolders")):
+        if os.path.splitext(file_path)[1].lower() in IMAGE_EXTENSIONS:
+            stills += 1
+        else:
+            videos.append(file_path)
+
+    def duration_of(file_path):
+        try:
+            return probe_cache.get(file_path, probe_media)["duration"] or 0
+        except Exception:
+            return 0
+
+    with ThreadPoolExecutor(max_workers=min(8, len(videos)) or 1) as executor:
+        video_seconds = sum(executor.map(duration_of, videos))
+
+    target_resolution = output_target_resolution(settings)
+    pixel_factor = 1.0
+    if target_resolution:
+        pixel_factor = target_resolution[0] * target_resolution[1] / (1920 * 1080)
+    still_seconds = stills * settings.get("image_duration") * STILL_COST_FACTOR
+    return {
+        "video_seconds": video_seconds,
+        "stills": stills,
+        "cost": (video_seconds + still_seconds) * pixel_factor,
+    }
+
+
+class JobCancelled(Exception):
+    """لغو کار در میانه رندر (برای خروج فوری از حلقه فریم‌ها)"""
+
+
+class JobSettings:
+    """نسخه ثابت (فقط خواندنی) و قابل ارسال تنظیمات برای پردازه کار (بدون وابستگی به Qt)"""
+
+    def __init__(self, values, cache_dir):
+        self._values = dict(values)
+        self._cache_dir = cache_dir
+
+    @property
+    def values(self):
+        """مقادیر تنظیمات (فقط خواندنی)"""
+        return MappingProxyType(self._values)
+
+    def get(self, key):
+        """دریافت مقدار یک تنظیم"""
+        return self._values.get(key)
+
+    def cache_dir(self):
+        """پوشه فایل‌های کش برنامه"""
+        return self._cache_dir
+
+
+def job_settings(values, cache_dir, cpu_share=None):
+    """ساخت تنظیمات ثابت یک کار از مقادیر تنظیمات و سهم هسته‌های آن
+
+    cpu_share تعداد هسته‌هایی است که صف به این کار اختصاص داده است.
+    """
+    values = dict(values)
+    values["cpu_share"] = cpu_share or available_cpus()
+    return JobSettings(values, cache_dir)
+
+
+class EventChannel:
+    """جایگزین سیگنال Qt در پردازه کار؛ هر emit به‌صورت یک پیام برای رابط کاربری ارسال می‌شود"""
+
+    def __init__(self, send, name, before_send=None):
+        self.send = send
+        self.name = name
+        self.before_send = before_send  # مثلاً ارسال پیشرفت‌های در انتظار پیش از پیام پایان کار
+
+    def emit(self, *args):
+        if self.before_send:
+            self.before_send()
+        self.send((self.name,) + args)
+
+
+class ThrottledChannel(EventChannel):
+    """کانال رویدادی که فقط آخرین مقدار را حداکثر یک بار در هر بازه ارسال می‌کند (مثلاً پیشرفت 10 بار در ثانیه)"""
+
+    def __init__(self, send, name, interval=PROGRESS_INTERVAL):
+        super().__init__(send, name)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.pending = None  # آخرین مقدار ارسال نشده
+        self.last_sent = 0
+        self.timer = None  # ارسال مقدار آخر در پایان بازه فعلی
+
+    def emit(self, *args):
+        with self.lock:
+            self.pending = args
+            wait = self.last_sent + self.interval - time.monotonic()
+            if wait > 0:
+                if self.timer is None:
+                    self.timer = threading.Timer(wait, self.flush)
+                    self.timer.daemon = True
+                    self.timer.start()
+                return
+        self.flush()
+
+    def flush(self):
+        """ارسال فوری آخرین مقدار در انتظار"""
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            args, self.pending = self.pending, None
+            if args is None:
+                return
+            self.last_sent = time.monotonic()
+            self.send((self.name,) + args)
+
+
+class MergeJob:
+    """پردازش ادغام یک پوشه؛ در پردازه جداگانه اجرا می‌شود و رویدادها را با send گزارش می‌کند"""
+
+    def __init__(self, folder_path, settings, send):
+        self.folder_path = folder_path
+        self.cancelled = False
+        self.paused = False
+        self.pause_lock = False  # قفل برای جلوگیری از ورود به حالت توقف در زمان‌های حساس
+        # تغییر وضعیت (لغو، توقف، پاسخ کاربر) ترد‌های منتظر را بیدار می‌کند
+        self.state_changed = threading.Condition()
+        self.output_filename = ""  # مسیر فایل خروجی برای پاک کردن در صورت لغو
+        self.output_started = False  # آیا نوشتن فایل خروجی توسط همین کار شروع شده است
+        self.current_stage = ""
+        self.settings = settings
+        self.overwrite_confirmed = False  # آیا کاربر تایید کرده است که فایل موجود بازنویسی شود
+        self.input_files = []  # فایل‌های ورودی مرتب شده (برای ثبت مشخصات کار)
+        self.up_to_date = False  # آیا خروجی قبلی از همین ورودی‌ها و تنظیمات ساخته شده است
+        self.prepared_images = {}  # مسیر تصویر -> فریم آماده شده در اندازه خروجی
+        self.temp_dirs = []  # پوشه‌های موقت که پس از پایان پردازش پاک می‌شوند
+        self.skipped_files = {}  # فایل‌های مشکل‌دار رد شده -> پیام خطا
+        self.capture_times = {}  # مسیر فایل -> زمان ثبت از فراداده (برای مرتب‌سازی براساس زمان ثبت)
+        self.active_processes = set()  # زیرپردازه‌های انکودر/دیکدر در حال اجرا که با لغو فوراً بسته می‌شوند
+        # کش دائمی اطلاعات فایل‌ها (مشترک بین همه پردازش‌ها)
+        self.probe_cache = open_probe_cache(os.path.join(settings.cache_dir(), "media_cache.sqlite3"))
+
+        # رویدادهای پردازش با همان نام سیگنال‌های ترد رابط کاربری ارسال می‌شوند
+        # پیشرفت و مرحله با نرخ ثابت و فقط با آخرین مقدار ارسال می‌شوند تا صف رویدادهای رابط کاربری پر نشود
+        self.progress_updated = ThrottledChannel(send, "progress_updated")
+        self.stage_updated = ThrottledChannel(send, "stage_updated")
+        self.process_finished = EventChannel(send, "process_finished", self.flush_updates)
+        self.check_output_file = EventChannel(send, "check_output_file", self.flush_updates)
+        self.ask_output_path = EventChannel(send, "ask_output_path", self.flush_updates)
+
+    def run(self):
+        try:
+            self.process_video()
+            if self.up_to_date:
+                self.process_finished.emit(self.folder_path, True, "فایل خروجی به‌روز است")
+            elif not self.cancelled:
+                # ثبت مشخصات کار تا اجرای بعدی بدون تغییر، فوراً به پایان برسد؛ اگر فایلی رد شده باشد
+                # (مثلاً فایلی که هنوز در حال کپی بوده) ثبت نمی‌شود تا اجرای بعدی دوباره آن را ادغام کند
+                if not self.skipped_files:
+                    write_manifest(self.output_filename, self.input_files, self.effective_settings())
+                self.process_finished.emit(self.folder_path, True, "عملیات با موفقیت انجام شد")
+            else:
+                # پاک کردن فایل ناقص در صورت لغو
+                self.cleanup_output_file()
+                self.process_finished.emit(self.folder_path, False, "عملیات لغو شد")
+        except Exception as e:
+            # پاک کردن فایل ناقص در صورت خطا
+            self.cleanup_output_file()
+            self.process_finished.emit(self.folder_path, False, str(e))
+        finally:
+            for temp_dir in self.temp_dirs:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def flush_updates(self):
+        """ارسال آخرین پیشرفت و مرحله در انتظار، پیش از پیام‌هایی که ترتیبشان مهم است"""
+        self.stage_updated.flush()
+        self.progress_updated.flush()
+
+    def _update_state(self, **changes):
+        """تغییر وضعیت کار و بیدار کردن فوری همه ترد‌های منتظر"""
+        with self.state_changed:
+            for name, value in changes.items():
+                setattr(self, name, value)
+            self.state_changed.notify_all()
+
+    def wait_until(self, predicate):
+        """انتظار بدون مصرف پردازنده تا برقرار شدن شرط یا لغو کار"""
+        with self.state_changed:
+            self.state_changed.wait_for(lambda: self.cancelled or predicate())
+
+    def cancel(self):
+        self._update_state(cancelled=True)
+        # انکودر در حال اجرا منتظر پایان حلقه فریم‌ها نمی‌ماند
+        with self.state_changed:
+            processes = list(self.active_processes)
+        for process in processes:
+            self._kill_process(process)
+
+    def _kill_process(self, process):
+        """بستن فوری یک زیرپردازه (subprocess یا multiprocessing)"""
+        try:
+            process.kill()
+        except Exception as e:
+            print(f"خطا در بستن زیرپردازه: {e}")
+
+    def track_process(self, process):
+        """ثبت زیرپردازه در حال اجرا تا با لغو کار بسته شود؛ اگر کار از قبل لغو شده باشد فوراً بسته می‌شود"""
+        with self.state_changed:
+            self.active_processes.add(process)
+            cancelled = self.cancelled
+        if cancelled:
+            self._kill_process(process)
+
+    def untrack_process(self, process):
+        """حذف زیرپردازه پایان یافته از فهرست"""
+        with self.state_changed:
+            self.active_processes.discard(process)
+
+    def pause(self):
+        """توقف موقت پردازش"""
+        self._update_state(paused=True)
+
+    def resume(self):
+        """ادامه پردازش"""
+        self._update_state(paused=False)
+
+    def check_pause(self):
+        """بررسی وضعیت توقف و انتظار تا ادامه پردازش"""
+        # اگر قفل توقف فعال است، نمی‌توان توقف کرد (بدون قفل گرفتن، چون در حلقه رندر زیاد فراخوانی می‌شود)
+        if self.pause_lock or not self.paused:
+            return
+
+        # در حالت توقف، ترد تا فرمان ادامه یا لغو بیدار نمی‌شود
+        self.wait_until(lambda: not self.paused)
+
+    def set_pause_lock(self, locked):
+        """تنظیم قفل توقف برای جلوگیری از توقف در مراحل حساس"""
+        self.pause_lock = locked
+
+    def begin_output(self):
+        """ثبت شروع نوشتن فایل خروجی؛ فقط فایلی که خود کار نوشته است در صورت لغو یا خطا پاک می‌شود"""
+        self.output_started = True
+
+    def cleanup_output_file(self):
+        """پاک کردن فایل خروجی ناقص در صورت لغو یا خطا (فایل موجودی که بازنویسی نشده دست نمی‌خورد)"""
+        if self.output_started and self.output_filename and os.path.exists(self.output_filename):
+            try:
+                os.remove(self.output_filename)
+                print(f"فایل ناقص پاک شد: {self.output_filename}")
+            except Exception as e:
+                print(f"خطا در پاک کردن فایل ناقص: {e}")
+
+    def update_stage(self, stage):
+        """به‌روزرسانی مرحله فعلی پردازش"""
+        if stage != self.current_stage:
+            self.current_stage = stage
+            self.stage_updated.emit(self.folder_path, stage)
+            # بعد از تغییر مرحله، حتماً وضعیت توقف را بررسی کنیم
+            self.check_pause()
+
+    def set_overwrite_confirmed(self, confirmed):
+        """تنظیم وضعیت تایید بازنویسی فایل"""
+        self._update_state(overwrite_confirmed=confirmed)
+
+    def set_output_filename(self, path):
+        """تنظیم مسیر فایل خروجی"""
+        self._update_state(output_filename=path)
+
+    class ThreadBarLogger(ProgressBarLogger):
+        def __init__(self, signal_fn, stage_fn, folder_path, check_pause_fn, is_cancelled_fn=None):
+            # فراخوانی‌های بین دو گزارش در حلقه فریم‌های proglog حذف می‌شوند
+            super().__init__(min_time_interval=PROGRESS_INTERVAL)
+            self.signal_fn = signal_fn  # تابع سیگنال برای به‌روزرسانی درصد پیشرفت
+            self.stage_fn = stage_fn  # تابع سیگنال برای به‌روزرسانی مرحله
+            self.folder_path = folder_path
+            self.check_pause_fn = check_pause_fn  # تابع بررسی وضعیت توقف
+            self.is_cancelled_fn = is_cancelled_fn or (lambda: False)  # تابع بررسی وضعیت لغو
+            self.stages = {
+                "t": "در حال آماده‌سازی زمان‌بندی",
+                "chunk": "در حال چانک کردن فایل‌ها",
+                "writing": "در حال نوشتن فایل خروجی",
+                "rendering": "در حال رندر کردن",
+                "finalize": "در حال نهایی کردن"
+            }
+
+        def bars_callback(self, bar, attr, value, old_value=None):
+            # بررسی وضعیت توقف
+            self.check_pause_fn()
+            # خروج فوری از حلقه فریم‌ها یا نمونه‌های صدا در صورت لغو
+            if self.is_cancelled_fn():
+                raise JobCancelled()
+
+            # به‌روزرسانی درصد پیشرفت
+            if bar not in self.bars:
+                return
+
+            if attr == 'index':
+                percentage = (value / self.bars[bar]['total']) * 100
+                self.signal_fn(self.folder_path, percentage)
+
+            # به‌روزرسانی مرحله پردازش
+            if bar == 'chunk' and old_value is None:
+                self.stage_fn("در حال چانک کردن فایل‌ها")
+            elif bar == 'moviepy.audio.AudioClip.reader.AudioFileClip':
+                self.stage_fn("در حال پردازش صدا")
+            elif bar == 'moviepy.video.VideoClip.reader.FFMPEG_VideoReader':
+                self.stage_fn("در حال پردازش ویدیو")
+            elif bar == 'moviepy.video.VideoClip.VideoClip.write_videofile.<locals>.ffmpeg_write_video':
+                self.stage_fn("در حال نوشتن فایل ویدیویی")
+            elif bar == 'moviepy.video.io.ffmpeg_tools.ffmpeg_merge_video_audio':
+                self.stage_fn("در حال ادغام ویدیو و صدا")
+
+    def extract_sort_key(self, file_path):
+        """استخراج کلید مرتب‌سازی از نام فایل (یا زمان ثبت آن) براساس تنظیمات"""
+        file_name = os.path.basename(file_path)
+
+        # انتخاب روش مرتب‌سازی
+        sort_method = self.settings.get("sort_method")
+
+        # مرتب‌سازی براساس تاریخ (رجکس پیش‌فرض یا سفارشی)
+        if sort_method == "date":
+            regex_pattern = self.settings.get("custom_regex")
+            match = re.search(regex_pattern, file_name)
+            if match:
+                # بسته به تعداد گروه‌های رجکس، متفاوت عمل می‌کنیم
+                groups = match.groups()
+                if len(groups) == 7:  # فرمت پیش‌فرض: ماه، روز، سال، ساعت، دقیقه، ثانیه، AM/PM
+                    month, day, year, hour, minute, second, period = groups
+                    hour = int(hour)
+                    # تبدیل ساعت به فرمت 24 ساعته
+                    if period == "PM" and hour != 12:
+                        hour += 12
+                    elif period == "AM" and hour == 12:
+                        hour = 0
+                    return (1, int(year), int(month), int(day), hour, int(minute), int(second))
+                else:
+                    # اگر رجکس گروه‌های متفاوتی داشت، از مقادیر استخراج شده استفاده کنیم
+                    return (1,) + tuple(int(g) if g.isdigit() else g for g in groups)
+
+        # مرتب‌سازی براساس زمان ثبت واقعی (EXIF تصاویر و creation_time ویدیوها)
+        elif sort_method == "capture_time":
+            capture_time = self.capture_times.get(file_path)
+            if capture_time is not None:
+                return (1, capture_time, os.path.relpath(file_path, self.folder_path))
+
+        # با جستجوی زیرپوشه‌ها، مسیر نسبی ترتیب فایل‌های هم‌نام پوشه‌های مختلف را ثابت نگه می‌دارد
+        relative_name = os.path.relpath(file_path, self.folder_path)
+
+        # مرتب‌سازی بر اساس نام فایل
+        if sort_method == "name":
+            return (2, relative_name)
+
+        # مرتب‌سازی پیش‌فرض در صورت عدم تطابق
+        return (3, relative_name)
+
+    def apply_scaling(self, clip, target_resolution, scaling_mode, maintain_aspect_ratio, bg_color):
+        """اعمال مقیاس‌دهی به یک کلیپ با توجه به تنظیمات (هندسه یک بار برای هر کلیپ محاسبه می‌شود)"""
+        return scale_clip(clip, target_resolution, scaling_mode, maintain_aspect_ratio, bg_color)
+
+    def matches_output_format(self, info, target_resolution):
+        """بررسی اینکه آیا استریم‌های یک ویدیو با تنظیمات خروجی مطابقت دارند"""
+        if not info["has_video"]:
+            return False
+
+        # کدک، رزولوشن و فریم‌ریت باید با تنظیمات خروجی مطابقت داشته باشد
+        if info["video_codec"] != ENCODER_CODEC_NAMES.get(self.settings.get("video_codec")):
+            return False
+        if target_resolution and (info["width"], info["height"]) != tuple(target_resolution):
+            return False
+        if not info["fps"] or abs(info["fps"] - self.settings.get("fps")) > 0.01:
+            return False
+        if info["has_audio"] and info["audio_codec"] != AUDIO_ENCODER_CODEC_NAMES.get(self.settings.get("audio_codec")):
+            return False
+
+        return True
+
+    def probe_file(self, file_path):
+        """خواندن و اعتبارسنجی اطلاعات یک فایل (از کش در صورت امکان)"""
+        file_ext = os.path.splitext(file_path)[1].lower()
+        probe_fn = probe_image if file_ext in IMAGE_EXTENSIONS else probe_media
+        info = self.probe_cache.get(file_path, probe_fn)
+        if info["kind"] == "video" and not info["has_video"]:
+            raise Exception("فایل استریم تصویری ندارد")
+        return info
+
+    def read_capture_times(self, files):
+        """خواندن همزمان زمان ثبت فایل‌ها از هدر آن‌ها؛ نتیجه در کش اطلاعات فایل‌ها می‌ماند
+
+        همان اطلاعات در مرحله بررسی مشخصات فایل‌ها دوباره از کش خوانده می‌شود.
+        """
+        self.update_stage(f"در حال خواندن زمان ثبت {len(files)} فایل")
+
+        def capture_time_of(file_path):
+            try:
+                return self.probe_file(file_path)["capture_time"]
+            except Exception:
+                # فایل خراب در مرحله بررسی مشخصات گزارش و رد می‌شود
+                return None
+
+        with ThreadPoolExecutor() as executor:
+            return dict(zip(files, executor.map(capture_time_of, files)))
+
+    def probe_files(self, sorted_files):
+        """بررسی همزمان فایل‌ها با چند ترد؛ فایل‌های خراب در نتیجه نیستند و در skipped_files ثبت می‌شوند"""
+        self.update_stage(f"در حال بررسی مشخصات {len(sorted_files)} فایل")
+        infos = {}
+        # هر بررسی یک زیرپردازه ffmpeg یا خواندن هدر فایل است، پس ترد کافی است
+        with ThreadPoolExecutor() as executor:
+            futures = {executor.submit(self.probe_file, file_path): file_path for file_path in sorted_files}
+            for done, future in enumerate(as_completed(futures), start=1):
+                if self.cancelled:
+                    for pending in futures:
+                        pending.cancel()
+                    break
+                file_path = futures[future]
+                try:
+                    infos[file_path] = future.result()
+                except Exception as e:
+                    self.skipped_files[file_path] = str(e)
+                self.progress_updated.emit(self.folder_path, done / len(sorted_files) * 100)
+        return infos
+
+    def report_skipped_files(self, skipped):
+        """نمایش یک خلاصه از فایل‌های مشکل‌دار رد شده (مسیر -> پیام خطا)"""
+        if not skipped:
+            return
+        names = [os.path.basename(file_path) for file_path in skipped]
+        shown = ", ".join(names[:5]) + (f" و {len(names) - 5} فایل دیگر" if len(names) > 5 else "")
+        self.update_stage(f"رد کردن {len(names)} فایل مشکل‌دار: {shown}")
+        for file_path, error in skipped.items():
+            print(f"فایل مشکل‌دار رد شد: {file_path} - خطا: {error}")
+
+    def try_stream_copy(self, sorted_files, infos, target_resolution):
+        """تلاش برای ادغام با کپی مستقیم استریم‌ها؛ در صورت عدم امکان False برمی‌گرداند"""
+        # همه فایل‌ها باید ویدیوی سالم باشند
+        if len(infos) != len(sorted_files) or any(not info["has_video"] for info in infos.values()):
+            return False
+
+        # همه فایل‌ها باید پارامترهای استریم کاملاً یکسان و مطابق خروجی داشته باشند
+        signatures = {stream_signature(info) for info in infos.values()}
+        first = infos[sorted_files[0]]
+        if len(signatures) != 1 or not self.matches_output_format(first, target_resolution):
+            return False
+
+        total_duration = sum(info["duration"] or 0 for info in infos.values())
+        self.update_stage(f"در حال ادغام بدون رندر {len(sorted_files)} ویدیو")
+        self.begin_output()
+        try:
+            concat_copy(
+                sorted_files,
+                self.output_filename,
+                duration=total_duration,
+                progress_fn=lambda fraction: self.progress_updated.emit(self.folder_path, fraction * 100),
+                is_cancelled=lambda: self.cancelled
+            )
+        except FFmpegError as e:
+            # بازگشت خودکار به مسیر رندر کامل
+            print(f"ادغام بدون رندر ناموفق بود: {e}")
+            if os.path.exists(self.output_filename):
+                os.remove(self.output_filename)
+            self.update_stage("ادغام بدون رندر ممکن نشد، بازگشت به رندر کامل")
+            return False
+
+        if not self.cancelled:
+            self.update_stage("عملیات با موفقیت به پایان رسید")
+        return True
+
+    def effective_settings(self):
+        """مقادیر فعلی همه تنظیمات (همراه با مقادیر پیش‌فرض)"""
+        return dict(self.settings.values)
+
+    def background_rgb(self):
+        """رنگ پس‌زمینه تنظیم شده به‌صورت RGB"""
+        background_color = self.settings.get("background_color")
+        return tuple(int(background_color.lstrip('#')[i:i + 2], 16) for i in (0, 2, 4))
+
+    def default_reference_profile(self, infos, target_resolution):
+        """مشخصات مرجع براساس تنظیمات خروجی، وقتی هیچ ویدیوی سازگاری وجود ندارد"""
+        video_codec = ENCODER_CODEC_NAMES.get(self.settings.get("video_codec"))
+        if video_codec not in SEGMENT_JOIN_CODECS:
+            return None
+
+        if target_resolution:
+            width, height = target_resolution
+        else:
+            # مانند ادغام compose، قاب خروجی به اندازه بزرگ‌ترین کلیپ است
+            sizes = []
+            for info in infos:
+                if not info["width"]:
+                    continue
+                if info["rotation"] in (90, 270):
+                    sizes.append((info["height"], info["width"]))
+                else:
+                    sizes.append((info["width"], info["height"]))
+            if not sizes:
+                return None
+            width = max(size[0] for size in sizes)
+            height = max(size[1] for size in sizes)
+
+        reference = empty_media_info()
+        reference.update({
+            "has_video": True,
+            "video_codec": video_codec,
+            "pix_fmt": "yuv420p",
+            # yuv420p ابعاد زوج لازم دارد
+            "width": width - width % 2,
+            "height": height - height % 2,
+            "fps": float(self.settings.get("fps")),
+            # مقیاس زمانی ثابت برای همه قطعه‌ها تا قطعه‌های با نرخ فریم متفاوت بدون خطای گرد کردن چسبانده شوند
+            "timescale": 90000,
+        })
+
+        # اگر هیچ کلیپی صدا نداشته باشد، خروجی هم بدون صدا خواهد بود
+        if any(info["has_audio"] for info in infos):
+            reference.update({
+                "has_audio": True,
+                "audio_codec": AUDIO_ENCODER_CODEC_NAMES.get(self.settings.get("audio_codec")),
+                "sample_rate": 44100,
+                "channel_layout": "stereo",
+            })
+        return reference
+
+    def find_reference_profile(self, infos, target_resolution):
+        """انتخاب پرتکرارترین مشخصات استریم سازگار با خروجی به‌عنوان مرجع ادغام هوشمند"""
+        candidates = [
+            info for info in infos
+            if self.matches_output_format(info, target_resolution)
+            and info["video_codec"] in SEGMENT_JOIN_CODECS
+            and info["rotation"] == 0
+            # moviepy صدا را همیشه استریو می‌نویسد
+            and (not info["has_audio"] or info["channel_layout"] == "stereo")
+        ]
+        if not candidates:
+            return None
+
+        best_signature = Counter(stream_signature(info) for info in candidates).most_common(1)[0][0]
+        return next(info for info in candidates if stream_signature(info) == best_signature)
+
+    def encoder_threads(self):
+        """ترد انکودر رندر کامل؛ در حالت خودکار همه هسته‌های سهم این کار"""
+        return self.settings.get("threads") or self.settings.get("cpu_share")
+
+    def segment_options(self):
+        """تنظیمات موثر بر خروجی رندر قطعه‌ها (قابل ارسال به پردازه‌های رندر و بخشی از کلید کش قطعه‌ها)
+
+        تعداد ترد انکودر خروجی را تغییر نمی‌دهد و جداگانه در هر قطعه ثبت می‌شود تا برخورد کش
+        به تعداد کارهای همزمان بستگی نداشته باشد.
+        """
+        options = {key: self.settings.get(key) for key in (
+            "video_codec", "video_bitrate", "audio_codec", "audio_bitrate", "preset",
+            "image_duration", "still_image_vfr", "scaling_mode", "maintain_aspect_ratio", "normalize_all_clips")}
+        options["background_color"] = self.background_rgb()
+        return options
+
+    def open_segment_cache(self):
+        """کش قطعه‌های رندر شده، یا None اگر حجم کش صفر (غیرفعال) باشد"""
+        if self.settings.get("segment_cache_size_mb") <= 0:
+            return None
+        return open_segment_cache(os.path.join(self.settings.cache_dir(), "segments"))
+
+    def try_smart_render(self, sorted_files, infos, target_resolution):
+        """ادغام هوشمند: فقط فایل‌های ناسازگار رندر و بقیه بدون رندر کپی می‌شوند"""
+        reference = self.find_reference_profile(infos.values(), target_resolution)
+        if reference is None:
+            # بدون ویدیوی سازگار (مثلاً پوشه‌های عکس)، مرجع از تنظیمات خروجی ساخته می‌شود
+            reference = self.default_reference_profile(infos.values(), target_resolution)
+        if reference is None:
+            return False
+
+        ref_signature = stream_signature(reference)
+        conforming = {path for path, info in infos.items() if stream_signature(info) == ref_signature}
+
+        # مدت هر فایل برای محاسبه پیشرفت کلی
+        image_duration = self.settings.get("image_duration")
+        durations = []
+        for file_path in sorted_files:
+            info = infos.get(file_path)
+            if info and info["kind"] == "image":
+                durations.append(image_duration)
+            else:
+                durations.append((info and info["duration"]) or 1)
+        total_duration = sum(durations) or 1
+
+        self.update_stage(f"ادغام هوشمند: {len(conforming)} فایل بدون رندر، "
+                          f"{len(sorted_files) - len(conforming)} فایل نیازمند رندر")
+
+        # قطعه‌هایی که قبلاً با همین منبع و تنظیمات رندر شده‌اند از کش برداشته می‌شوند
+        segment_cache = self.open_segment_cache()
+        # شناسه اجاره قطعه‌های این کار در کش مشترک بین پردازه‌ها
+        lease_owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+
+        # قطعه‌ها کنار فایل خروجی ساخته می‌شوند تا کپی آن‌ها بین دیسک‌ها جابه‌جا نشود
+        segments_dir = tempfile.mkdtemp(prefix=".stellar_segments_",
+                                        dir=os.path.dirname(os.path.abspath(self.output_filename)))
+        try:
+            # قطعه‌های نهایی به ترتیب اندیس؛ فایل‌های سازگار بدون هیچ تغییری در لیست چسباندن قرار می‌گیرند
+            segments = {}
+            jobs = []
+            options = self.segment_options()
+            segment_keys = {}
+            for index, file_path in enumerate(sorted_files):
+                if file_path in conforming:
+                    segments[index] = file_path
+                    continue
+                file_ext = os.path.splitext(file_path)[1].lower()
+                kind = "image" if file_ext in IMAGE_EXTENSIONS else "video"
+                if segment_cache:
+                    try:
+                        segment_keys[index] = segment_key(
+                            file_path, kind, stream_signature(reference) + (reference["timescale"],), options)
+                    except OSError:
+                        pass
+                    cached_path = index in segment_keys and segment_cache.lookup(segment_keys[index], lease_owner)
+                    if cached_path:
+                        segments[index] = cached_path
+                        continue
+                jobs.append({
+                    "index": index,
+                    "file_path": file_path,
+                    "segment_path": os.path.join(segments_dir, f"{index:05d}.mp4"),
+                    "kind": kind,
+                    "reference": reference,
+                    "options": options,
+                })
+
+            if segment_cache and len(jobs) < len(sorted_files) - len(conforming):
+                self.update_stage(f"{len(sorted_files) - len(conforming) - len(jobs)} قطعه از کش برداشته شد، "
+                                  f"{len(jobs)} قطعه نیازمند رندر")
+
+            # پیشرفت کلی براساس مدت هر فایل و پیشرفت قطعه‌های در حال رندر
+            fractions = {index: 1.0 for index in segments}
+
+            def report(index, fraction):
+                fractions[index] = fraction
+                done_duration = sum(durations[i] * f for i, f in fractions.items())
+                self.progress_updated.emit(self.folder_path, done_duration / total_duration * 100)
+
+            def finished(index, error):
+                file_name = os.path.basename(sorted_files[index])
+                if error is not None:
+                    # رد کردن فایل‌های مشکل‌دار مثل مسیر رندر کامل
+                    self.skipped_files[sorted_files[index]] = str(error)
+                    self.update_stage(f"رد کردن فایل مشکل‌دار: {file_name} - خطا: {str(error)}")
+                    return
+                segment_path = os.path.join(segments_dir, f"{index:05d}.mp4")
+                if index in segment_keys:
+                    segment_path = segment_cache.store(segment_keys[index], segment_path, lease_owner)
+                segments[index] = segment_path
+                report(index, 1.0)
+
+            workers, threads = segment_encoding_plan(self.settings.get("segment_workers"),
+                                                     self.settings.get("threads"), self.settings.get("cpu_share"))
+            if not (workers > 1 and len(jobs) > 1) and not self.settings.get("threads"):
+                # رندر یکی‌یکی: انکودر همه هسته‌های سهم این کار را می‌گیرد
+                threads = self.encoder_threads()
+            for job in jobs:
+                job["threads"] = threads
+            if workers > 1 and len(jobs) > 1:
+                # رندر همزمان قطعه‌ها در پردازه‌های جداگانه (هر قطعه مستقل از بقیه است)
+                self.update_stage(f"در حال رندر {len(jobs)} قطعه با {min(workers, len(jobs))} پردازه همزمان")
+                encode_segments(jobs, workers, report, lambda: self.cancelled, lambda: self.paused, finished)
+            else:
+                for job in jobs:
+                    self.check_pause()
+                    if self.cancelled:
+                        return True
+
+                    index = job["index"]
+                    self.update_stage(
+                        f"در حال رندر {os.path.basename(job['file_path'])} [{index + 1}/{len(sorted_files)}]")
+                    try:
+                        completed = encode_segment_job(
+                            job,
+                            progress_fn=lambda fraction, index=index: report(index, fraction),
+                            is_cancelled=lambda: self.cancelled,
+                            wait_if_paused=self.check_pause
+                        )
+                    except Exception as e:
+                        finished(index, e)
+                        continue
+                    if completed:
+                        finished(index, None)
+
+            if self.cancelled:
+                return True
+
+            if not segments:
+                return False
+
+            self.update_stage(f"در حال چسباندن {len(segments)} قطعه بدون رندر نهایی")
+            self.begin_output()
+            try:
+                concat_copy([segments[index] for index in sorted(segments)], self.output_filename, is_cancelled=lambda: self.cancelled)
+            except FFmpegError as e:
+                print(f"چسباندن قطعه‌ها ناموفق بود: {e}")
+                if os.path.exists(self.output_filename):
+                    os.remove(self.output_filename)
+                self.update_stage("ادغام هوشمند ممکن نشد، بازگشت به رندر کامل")
+                return False
+
+            if not self.cancelled:
+                self.update_stage("عملیات با موفقیت به پایان رسید")
+            return True
+        finally:
+            shutil.rmtree(segments_dir, ignore_errors=True)
+            if segment_cache:
+                # قطعه‌های این کار پس از چسباندن آزاد می‌شوند تا حذف آن‌ها از کش ممکن شود
+                segment_cache.release(lease_owner)
+                segment_cache.evict(self.settings.get("segment_cache_size_mb") * 1024 * 1024)
+
+    def load_clip(self, file_path, target_resolution, info=None):
+        """بارگذاری یک فایل به‌صورت کلیپ moviepy و اعمال مقیاس‌دهی براساس تنظیمات"""
+        file_ext = os.path.splitext(file_path)[1].lower()
+
+        # تنظیمات مقیاس‌دهی
+        normalize_all_clips = self.settings.get("normalize_all_clips")
+        maintain_aspect_ratio = self.settings.get("maintain_aspect_ratio")
+        scaling_mode = self.settings.get("scaling_mode")
+        bg_color = self.background_rgb()
+
+        if file_ext in IMAGE_EXTENSIONS:
+            if normalize_all_clips and target_resolution:
+                # تصویر یک بار با Pillow به قاب خروجی برده می‌شود (همراه با شفافیت روی رنگ پس‌زمینه)
+                prepared_path = self.prepared_images.get(file_path)
+                if prepared_path:
+                    # فریم از قبل در مرحله آماده‌سازی موازی ساخته شده است
+                    return ImageClip(prepared_path, duration=self.settings.get("image_duration"))
+                frame = open_scaled_image(file_path, target_resolution, scaling_mode, maintain_aspect_ratio, bg_color)
+                return ImageClip(np.array(frame), duration=self.settings.get("image_duration"))
+            # تصویر - با مدت زمان تنظیم شده
+            clip = ImageClip(file_path, duration=self.settings.get("image_duration"))
+        elif file_ext in VIDEO_EXTENSIONS:
+            # ویدیو
+            clip = VideoFileClip(file_path)
+        else:
+            return None
+
+        # کلیپ‌هایی که طبق کش از قبل هم‌اندازه خروجی هستند نیازی به مقیاس‌دهی ندارند
+        if info and target_resolution and info["rotation"] == 0 and \
+                (info["width"], info["height"]) == tuple(target_resolution):
+            return clip
+
+        # اعمال مقیاس‌دهی
+        if normalize_all_clips and target_resolution:
+            clip = self.apply_scaling(clip, target_resolution, scaling_mode, maintain_aspect_ratio, bg_color)
+        elif target_resolution:  # مقیاس‌دهی ساده اگر یکسان‌سازی فعال نیست
+            clip = clip.resize(height=target_resolution[1])
+
+        return clip
+
+    def prepare_images(self, sorted_files, target_resolution):
+        """آماده‌سازی موازی تصاویر پوشه در اندازه خروجی (دیکد کاهش‌یافته و مقیاس‌دهی در چند پردازه)"""
+        image_files = [f for f in sorted_files if os.path.splitext(f)[1].lower() in IMAGE_EXTENSIONS]
+        if not image_files:
+            return
+
+        workers = segment_worker_count(self.settings.get("segment_workers"), 1, self.settings.get("cpu_share"))
+        self.update_stage(f"در حال آماده‌سازی {len(image_files)} تصویر با {min(workers, len(image_files))} پردازه")
+        prepared_dir = tempfile.mkdtemp(prefix="stellar_images_")
+        self.temp_dirs.append(prepared_dir)
+        self.prepared_images = prepare_images(
+            image_files, prepared_dir, target_resolution,
+            self.settings.get("scaling_mode"), self.settings.get("maintain_aspect_ratio"), self.background_rgb(),
+            workers,
+            is_cancelled=lambda: self.cancelled,
+            progress_fn=lambda fraction: self.progress_updated.emit(self.folder_path, fraction * 100)
+        )
+
+    def describe_clip(self, file_path, target_resolution, info=None):
+        """توصیف سبک یک فایل برای خط زمان؛ فایل فقط در صورت نبود اطلاعات کافی لحظه‌ای باز و بسته می‌شود"""
+        file_ext = os.path.splitext(file_path)[1].lower()
+        if file_ext not in VIDEO_EXTENSIONS and file_ext not in IMAGE_EXTENSIONS:
+            return None
+
+        def open_clip():
+            return self.load_clip(file_path, target_resolution, info)
+
+        # با یکسان‌سازی ابعاد، اندازه هر کلیپ همان قاب خروجی است و مدت آن از کش اطلاعات می‌آید
+        if info and target_resolution and self.settings.get("normalize_all_clips"):
+            if info["kind"] == "image":
+                return ClipDescriptor(file_path, self.settings.get("image_duration"), target_resolution,
+                                      False, open_clip)
+            if info["duration"]:
+                return ClipDescriptor(file_path, info["duration"], target_resolution, info["has_audio"], open_clip)
+
+        clip = open_clip()
+        try:
+            return ClipDescriptor(file_path, clip.duration, clip.size, clip.audio is not None, open_clip)
+        finally:
+            try:
+                clip.close()
+            except:
+                pass
+
+    def frame_pipeline_sources(self, clips, infos, target_resolution):
+        """منابع خط لوله فریم (دیکد و مقیاس‌دهی با ffmpeg)، یا None اگر کلیپی با این مسیر سازگار نباشد"""
+        if not (self.settings.get("frame_pipeline") and self.settings.get("normalize_all_clips") and target_resolution):
+            return None
+
+        fps = self.settings.get("fps")
+        scaling = (self.settings.get("scaling_mode"), self.settings.get("maintain_aspect_ratio"), self.background_rgb())
+        sources = []
+        for descriptor in clips:
+            info = infos.get(descriptor.file_path)
+            if not info or descriptor.size != tuple(target_resolution):
+                return None
+            frames = max(1, round(descriptor.duration * fps))
+            if info["kind"] == "image":
+                sources.append({
+                    "kind": "image",
+                    "file_path": self.prepared_images.get(descriptor.file_path, descriptor.file_path),
+                    "frames": frames,
+                    "scaling": scaling,
+                })
+                continue
+            if not info["width"] or not info["height"]:
+                return None
+            # ffmpeg ویدیوهای چرخیده را هنگام دیکد می‌چرخاند
+            src_size = (info["width"], info["height"])
+            if info["rotation"] in (90, 270):
+                src_size = (info["height"], info["width"])
+            sources.append({
+                "kind": "video",
+                "file_path": descriptor.file_path,
+                "filter": ffmpeg_scale_filter(src_size, target_resolution, *scaling),
+                "frames": frames,
+            })
+        return sources
+
+    def render_frame_pipeline(self, timeline, final_clip, sources, target_resolution):
+        """نوشتن خروجی با خط لوله دیکد/انکد روی حافظه مشترک؛ صدا پیش از آن جداگانه رندر می‌شود"""
+        audio_path = None
+        if final_clip.audio is not None:
+            self.update_stage("در حال پردازش صدا")
+            audio_dir = tempfile.mkdtemp(prefix="stellar_audio_")
+            self.temp_dirs.append(audio_dir)
+            audio_path = os.path.join(audio_dir, "audio.wav")
+            final_clip.audio.write_audiofile(audio_path, fps=timeline.audio_fps, codec="pcm_s16le", logger=None)
+            if self.cancelled:
+                return
+
+        encoder_args = ["-c:v", self.settings.get("video_codec"), "-b:v", self.settings.get("video_bitrate"),
+                        "-preset", self.settings.get("preset"), "-threads", str(self.encoder_threads()),
+                        "-pix_fmt", "yuv420p"]
+        if audio_path:
+            encoder_args += ["-c:a", self.settings.get("audio_codec"), "-b:a", self.settings.get("audio_bitrate")]
+
+        self.update_stage("در حال نوشتن فایل ویدیویی")
+        self.begin_output()
+        render_frames(
+            sources, self.output_filename, target_resolution, self.settings.get("fps"), encoder_args,
+            audio_path=audio_path,
+            total_frames=sum(source["frames"] for source in sources),
+            progress_fn=lambda fraction: self.progress_updated.emit(self.folder_path, fraction * 100),
+            is_cancelled=lambda: self.cancelled,
+            check_pause=self.check_pause,
+            track_process=self.track_process,
+            untrack_process=self.untrack_process
+        )
+
+    def write_clip(self, final_clip, progress_callback):
+        """نوشتن خروجی با moviepy (معادل write_videofile) با انکودری که در صورت لغو فوراً بسته می‌شود"""
+        fps = self.settings.get("fps")
+        audio_path = None
+        if final_clip.audio is not None:
+            # فایل صدای موقت در پوشه موقت کار ساخته می‌شود تا پس از لغو یا خطا کنار خروجی باقی نماند
+            audio_dir = tempfile.mkdtemp(prefix="stellar_audio_")
+            self.temp_dirs.append(audio_dir)
+            audio_codec = self.settings.get("audio_codec")
+            audio_path = os.path.join(audio_dir, "audio." + find_extension(audio_codec))
+            final_clip.audio.write_audiofile(audio_path, 44100, 4, 2000, audio_codec,
+                                             bitrate=self.settings.get("audio_bitrate"), logger=progress_callback)
+
+        self.update_stage("در حال نوشتن فایل ویدیویی")
+        self.begin_output()
+        # استفاده از تنظیمات کیفیت خروجی
+        writer = FFMPEG_VideoWriter(
+            self.output_filename, final_clip.size, fps,
+            codec=self.settings.get("video_codec"),
+            audiofile=audio_path,
+            preset=self.settings.get("preset"),
+            bitrate=self.settings.get("video_bitrate"),
+            threads=self.encoder_threads()
+        )
+        process = writer.proc
+        self.track_process(process)
+        try:
+            for frame in final_clip.iter_frames(fps=fps, dtype="uint8", logger=progress_callback):
+                writer.write_frame(frame)
+        except (IOError, OSError):
+            # انکودر با لغو کار بسته شده است
+            if not self.cancelled:
+                raise
+        finally:
+            self.untrack_process(process)
+            if self.cancelled:
+                self._kill_process(process)
+                process.wait()
+            else:
+                writer.close()
+
+    def process_video(self):
+        folder_path = self.folder_path
+        self.update_stage("در حال آماده‌سازی")
+
+        if not os.path.exists(folder_path):
+            raise Exception(f"پوشه وجود ندارد: {folder_path}")
+
+        # تعیین مسیر و نام فایل خروجی براساس تنظیمات
+        output_path = output_file_path(folder_path, self.settings)
+        output_path_type = self.settings.get("output_path_type")
+
+        if output_path_type == "fixed_folder":
+            # ذخیره در پوشه ثابت
+            fixed_folder = self.settings.get("fixed_output_folder")
+            if not os.path.exists(fixed_folder):
+                os.makedirs(fixed_folder, exist_ok=True)
+            self.output_filename = output_path
+        elif output_path_type == "ask_user":
+            # درخواست مسیر از کاربر
+            folder_name = os.path.basename(os.path.dirname(folder_path))
+            output_filename = self.settings.get("output_filename_format").format(folder_name=folder_name)
+            self.ask_output_path.emit(folder_path, output_filename)
+            # منتظر پاسخ کاربر می‌مانیم
+            self.wait_until(lambda: self.output_filename)
+
+            # اگر عملیات لغو شده یا کاربر مسیری انتخاب نکرده است
+            if self.cancelled or not self.output_filename:
+                return
+        else:
+            self.output_filename = output_path
+
+        progress_callback = self.ThreadBarLogger(
+            self.progress_updated.emit,
+            self.update_stage,
+            folder_path,
+            self.check_pause,
+            lambda: self.cancelled
+        )
+
+        self.update_stage("در حال جستجوی فایل‌ها")
+        self.check_pause()  # بررسی وضعیت توقف
+        unique_files = find_media_files(folder_path, self.settings.get("include_subfolders"))
+
+        # تبدیل به لیست برای مرتب‌سازی (فایل خروجی قبلی نباید به‌عنوان ورودی ادغام شود)
+        output_abspath = os.path.abspath(self.output_filename)
+        all_files = [f for f in unique_files if os.path.abspath(f) != output_abspath]
+
+        if not all_files:
+            raise Exception(f"فایل قابل پشتیبانی در {folder_path} پیدا نشد")
+
+        # مرتب‌سازی براساس روش انتخاب شده
+        self.update_stage("در حال مرتب‌سازی فایل‌ها")
+        self.check_pause()  # بررسی وضعیت توقف
+        if self.settings.get("sort_method") == "capture_time":
+            self.capture_times = self.read_capture_times(all_files)
+        sorted_files = sorted(all_files, key=self.extract_sort_key)
+
+        # اگر خروجی قبلی از همین فایل‌ها و تنظیمات ساخته شده باشد، کاری لازم نیست
+        self.input_files = sorted_files
+        if is_up_to_date(self.output_filename, sorted_files, self.effective_settings()):
+            self.up_to_date = True
+            self.progress_updated.emit(self.folder_path, 100)
+            self.update_stage("فایل خروجی به‌روز است، نیازی به ساخت مجدد نیست")
+            return
+
+        # بررسی وجود فایل خروجی
+        if os.path.exists(self.output_filename):
+            # ارسال سیگنال برای بررسی تایید کاربر
+            self.check_output_file.emit(self.folder_path, self.output_filename)
+            # منتظر پاسخ کاربر می‌مانیم
+            self.wait_until(lambda: self.overwrite_confirmed)
+
+            # اگر عملیات لغو شده یا کاربر تایید نکرده است
+            if self.cancelled:
+                return
+
+        clips = []
+        self.update_stage("در حال بارگذاری فایل‌ها")
+
+        # تعیین رزولوشن خروجی
+        target_resolution = output_target_resolution(self.settings)
+
+        # اطلاعات فایل‌ها (از کش دائمی) برای انتخاب روش ادغام و مقیاس‌دهی
+        infos = self.probe_files(sorted_files)
+        if self.cancelled:
+            return
+
+        # فایل‌های خراب یک‌جا گزارش و از ادامه کار کنار گذاشته می‌شوند
+        self.report_skipped_files(self.skipped_files)
+        sorted_files = [file_path for file_path in sorted_files if file_path in infos]
+        if not sorted_files:
+            raise Exception(f"هیچ کلیپ معتبری برای ادغام در {folder_path} وجود ندارد")
+
+        # مسیر سریع: اگر همه ویدیوها فرمت یکسان دارند، بدون رندر مجدد چسبانده می‌شوند
+        if self.settings.get("stream_copy_when_possible") and \
+                self.try_stream_copy(sorted_files, infos, target_resolution):
+            return
+
+        # در غیر این صورت فقط فایل‌های ناسازگار رندر می‌شوند
+        if self.settings.get("smart_render") and self.try_smart_render(sorted_files, infos, target_resolution):
+            return
+
+        # رندر کامل همه فریم‌ها را با نرخ فریم خروجی می‌نویسد
+        if self.settings.get("still_image_vfr") and \
+                any(infos[file_path]["kind"] == "image" for file_path in sorted_files):
+            self.update_stage("نرخ فریم متغیر تصاویر فقط در ادغام هوشمند اعمال می‌شود و در رندر کامل نادیده گرفته شد")
+            # پیام مرحله بعد جایگزین این پیام نشود
+            self.stage_updated.flush()
+
+        # نمایش تعداد فایل‌ها برای اطلاعات بیشتر
+        self.update_stage(f"بارگذاری {len(sorted_files)} فایل")
+
+        # تصاویر پیش از ساخت خط زمان به‌صورت موازی در اندازه خروجی آماده می‌شوند
+        if self.settings.get("normalize_all_clips") and target_resolution:
+            self.prepare_images(sorted_files, target_resolution)
+            if self.cancelled:
+                return
+
+        # توصیف کلیپ‌ها به‌صورت همزمان (ترتیب فایل‌ها حفظ می‌شود)
+        self.check_pause()
+        processed_extensions = {os.path.splitext(f)[1].lower() for f in sorted_files}
+        failed = {}
+        with ThreadPoolExecutor() as executor:
+            futures = [executor.submit(self.describe_clip, file_path, target_resolution, infos.get(file_path))
+                       for file_path in sorted_files]
+            for file_path, future in zip(sorted_files, futures):
+                if self.cancelled:
+                    for pending in futures:
+                        pending.cancel()
+                    return
+                try:
+                    descriptor = future.result()
+                except Exception as e:
+                    # رد کردن فایل‌های مشکل‌دار (در خلاصه نهایی نمایش داده می‌شوند)
+                    failed[file_path] = str(e)
+                    continue
+                if descriptor is not None:
+                    clips.append(descriptor)
+        self.skipped_files.update(failed)
+        self.report_skipped_files(failed)
+
+        if not clips:
+            raise Exception(f"هیچ کلیپ معتبری برای ادغام در {folder_path} وجود ندارد")
+
+        # نمایش اطلاعات تعداد کلیپ‌ها و انواع فایل‌ها
+        self.update_stage(f"آماده ادغام {len(clips)} کلیپ (انواع فایل: {', '.join(processed_extensions)})")
+
+        if self.cancelled:
+            return
+
+        # در هر لحظه فقط خواننده کلیپی که در حال رندر است باز می‌ماند
+        timeline = LazyTimeline(clips)
+        try:
+            self.update_stage("در حال ادغام کلیپ‌ها")
+            self.check_pause()  # بررسی وضعیت توقف
+
+            # فعال کردن قفل توقف برای عملیات حساس
+            self.set_pause_lock(True)
+            final_clip = timeline.clip()
+            self.set_pause_lock(False)
+
+            # نمایش طول ویدیوی نهایی
+            duration_seconds = int(final_clip.duration)
+            minutes = duration_seconds // 60
+            seconds = duration_seconds % 60
+            self.update_stage(f"طول ویدیوی نهایی: {minutes} دقیقه و {seconds} ثانیه")
+
+            # بررسی مجدد وضعیت لغو قبل از نوشتن فایل
+            if self.cancelled:
+                return
+
+            # نوشتن در آدرس نهایی
+            self.update_stage("در حال نوشتن فایل ویدیویی نهایی")
+            self.check_pause()  # بررسی وضعیت توقف
+
+            # کلیپ‌های هم‌اندازه خروجی بدون عبور فریم‌ها از moviepy رندر می‌شوند
+            sources = self.frame_pipeline_sources(clips, infos, target_resolution)
+            if sources:
+                self.render_frame_pipeline(timeline, final_clip, sources, target_resolution)
+            else:
+                self.write_clip(final_clip, progress_callback)
+
+            if self.cancelled:
+                return
+            self.update_stage("عملیات با موفقیت به پایان رسید")
+        except JobCancelled:
+            return
+        finally:
+            # آزاد کردن منابع
+            timeline.close()
+
+
+def _signal_job_children(signum):
+    """ارسال سیگنال به همه زیرپردازه‌های پردازه کار (دیکد، انکد، رندر قطعه‌ها) از طریق گروه پردازه آن
+
+    فقط وقتی پردازه کار سرگروه خودش باشد انجام می‌شود؛ در ویندوز توقف فقط همکارانه است.
+    """
+    if not hasattr(os, "killpg") or os.getpgrp() != os.getpid():
+        return
+    try:
+        os.killpg(os.getpid(), signum)
+    except OSError as e:
+        print(f"خطا در ارسال سیگنال به زیرپردازه‌های کار: {e}")
+
+
+def _ignore_stop_signal(signum, frame):
+    """پردازه کار با SIGTSTP گروه خودش متوقف نمی‌شود (زیرپردازه‌ها با exec به رفتار پیش‌فرض برمی‌گردند)"""
+
+
+def _listen_for_commands(job, control_queue):
+    """دریافت فرمان‌های رابط کاربری (لغو، توقف، پاسخ کاربر) و اعمال آن‌ها روی کار
+
+    در توقف، خود پردازه کار متوقف نمی‌شود: ترد‌های آن در check_pause منتظر می‌مانند و فقط زیرپردازه‌ها
+    با SIGTSTP فوراً متوقف می‌شوند. به این ترتیب پردازه کار هرگز در حین نگه داشتن قفل صف رویدادهای مشترک
+    موتور یا تراکنش کش‌های SQLite مشترک منجمد نمی‌شود.
+    """
+    while True:
+        message = control_queue.get()
+        if message is None:
+            return
+        command, *args = message
+        if command not in CONTROL_COMMANDS:
+            continue
+        if command in ("resume", "cancel"):
+            # زیرپردازه‌های متوقف باید ادامه یابند تا ادامه کار یا لغو را ببینند
+            _signal_job_children(signal.SIGCONT)
+        getattr(job, command)(*args)
+        if command == "pause":
+            _signal_job_children(signal.SIGTSTP)
+
+
+def run_job_process(folder_path, settings, event_queue, control_queue):
+    """نقطه شروع پردازه کار: اجرای کامل ادغام یک پوشه و ارسال رویدادها از طریق صف"""
+    # پردازه کار سرگروه زیرپردازه‌های خود می‌شود تا توقف، ادامه و بستن با یک سیگنال به همه آن‌ها برسد
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+        signal.signal(signal.SIGTSTP, _ignore_stop_signal)
+    job = MergeJob(folder_path, settings, event_queue.put)
+    listener = threading.Thread(target=_listen_for_commands, args=(job, control_queue), daemon=True)
+    listener.start()
+    job.run()
@@ -0,0 +1,171 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from PIL import Image
+
+
+def scaling_geometry(src_size, target_size, scaling_mode, maintain_aspect_ratio):
+    """محاسبه ابعاد مقیاس‌شده منبع و محل قرارگیری آن در قاب خروجی"""
+    src_width, src_height = src_size
+    width, height = target_size
+
+    if not maintain_aspect_ratio or scaling_mode == "stretch":
+        # کشیدن کامل بدون حفظ نسبت
+        return width, height, 0, 0
+
+    if scaling_mode == "fill":
+        # پر کردن کامل قاب (بخش‌های بیرون از قاب برش می‌خورند)
+        scale = max(width / src_width, height / src_height)
+    else:
+        # قرار دادن کامل در قاب (حاشیه‌ها با رنگ پس‌زمینه پر می‌شوند)
+        scale = min(width / src_width, height / src_height)
+
+    scaled_width = max(1, round(src_width * scale))
+    scaled_height = max(1, round(src_height * scale))
+    return scaled_width, scaled_height, (width - scaled_width) // 2, (height - scaled_height) // 2
+
+
+def scale_image(image, target_size, scaling_mode, maintain_aspect_ratio, bg_color):
+    """مقیاس‌دهی یک تصویر Pillow به ابعاد دقیق قاب خروجی"""
+    scaled_width, scaled_height, x, y = scaling_geometry(
+        image.size, target_size, scaling_mode, maintain_aspect_ratio)
+
+    # تصاویر شفاف روی رنگ پس‌زمینه قرار می‌گیرند
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    image = image.convert("RGBA" if has_alpha else "RGB")
+
+    resized = image.resize((scaled_width, scaled_height), Image.LANCZOS)
+    frame = Image.new("RGB", tuple(target_size), tuple(bg_color))
+    frame.paste(resized, (x, y), resized if has_alpha else None)
+    return frame
+
+
+def ffmpeg_scale_filter(src_size, target_size, scaling_mode, maintain_aspect_ratio, bg_color):
+    """فیلتر ffmpeg معادل scaling_geometry (مقیاس، سپس حاشیه یا برش) برای مقیاس‌دهی درون دیکدر"""
+    width, height = target_size
+    scaled_width, scaled_height, x, y = scaling_geometry(src_size, target_size, scaling_mode, maintain_aspect_ratio)
+    filters = [f"scale={scaled_width}:{scaled_height}:flags=lanczos", "setsar=1"]
+    if x < 0 or y < 0:
+        filters.append(f"crop={width}:{height}:{max(0, -x)}:{max(0, -y)}")
+    elif (scaled_width, scaled_height) != (width, height):
+        color = "0x{:02x}{:02x}{:02x}".format(*bg_color)
+        filters.append(f"pad={width}:{height}:{x}:{y}:color={color}")
+    return ",".join(filters)
+
+
+def open_scaled_image(file_path, target_size, scaling_mode, maintain_aspect_ratio, bg_color):
+    """باز کردن و مقیاس‌دهی یک تصویر؛ JPEG مستقیماً در نزدیک‌ترین اندازه بزرگ‌تر از نیاز دیکد می‌شود"""
+    with Image.open(file_path) as image:
+        scaled_width, scaled_height, _, _ = scaling_geometry(
+            image.size, target_size, scaling_mode, maintain_aspect_ratio)
+        # حالت draft در JPEG دیکد را با مقیاس 1/2، 1/4 یا 1/8 انجام می‌دهد (فقط تا جایی که از اندازه نهایی کوچک‌تر نشود)
+        image.draft(image.mode, (scaled_width, scaled_height))
+        return scale_image(image, target_size, scaling_mode, maintain_aspect_ratio, bg_color)
+
+
+def _prepare_image(file_path, output_path, target_size, scaling_mode, maintain_aspect_ratio, bg_color):
+    """آماده‌سازی یک تصویر در اندازه قاب خروجی و ذخیره آن (اجرا در پردازه جداگانه)"""
+    frame = open_scaled_image(file_path, target_size, scaling_mode, maintain_aspect_ratio, bg_color)
+    frame.save(output_path, compress_level=1)
+    return output_path
+
+
+def prepare_images(file_paths, output_dir, target_size, scaling_mode, maintain_aspect_ratio, bg_color,
+                   workers, is_cancelled, progress_fn=None):
+    """آماده‌سازی موازی تصاویر در اندازه قاب خروجی
+
+    خروجی دیکشنری مسیر تصویر -> مسیر فریم آماده است؛ تصاویر ناموفق در آن نیستند.
+    """
+    prepared = {}
+    jobs = [(file_path, os.path.join(output_dir, f"{index:05d}.png"))
+            for index, file_path in enumerate(file_paths)]
+    options = (tuple(target_size), scaling_mode, maintain_aspect_ratio, tuple(bg_color))
+
+    if workers <= 1 or len(jobs) <= 1:
+        for done, (file_path, output_path) in enumerate(jobs, start=1):
+            if is_cancelled():
+                break
+            try:
+                prepared[file_path] = _prepare_image(file_path, output_path, *options)
+            except Exception as e:
+                print(f"خطا در آماده‌سازی تصویر {file_path}: {e}")
+            if progress_fn:
+                progress_fn(done / len(jobs))
+        return prepared
+
+    # پردازه‌ها به‌صورت spawn ساخته می‌شوند تا fork از برنامه چندتردی Qt رخ ندهد
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=context) as executor:
+        futures = {executor.submit(_prepare_image, file_path, output_path, *options): file_path
+                   for file_path, output_path in jobs}
+        for done, future in enumerate(as_completed(futures), start=1):
+            if is_cancelled():
+                for pending in futures:
+                    pending.cancel()
+                break
+            try:
+                prepared[futures[future]] = future.result()
+            except Exception as e:
+                print(f"خطا در آماده‌سازی تصویر {futures[future]}: {e}")
+            if progress_fn:
+                progress_fn(done / len(jobs))
+    return prepared
+
+
+class FrameScaler:
+    """مقیاس‌دهی فریم‌های ویدیو با هندسه از پیش محاسبه شده و قاب پس‌زمینه قابل استفاده مجدد
+
+    هندسه (ابعاد، حاشیه‌ها و ناحیه برش) فقط یک بار برای هر کلیپ محاسبه می‌شود و هر فریم
+    با یک فراخوانی resize (همراه با برش از طریق box) مستقیماً در بافر ثابت خروجی نوشته می‌شود.
+    """
+
+    def __init__(self, src_size, target_size, scaling_mode, maintain_aspect_ratio, bg_color):
+        src_width, src_height = src_size
+        width, height = target_size
+        scaled_width, scaled_height, x, y = scaling_geometry(
+            src_size, target_size, scaling_mode, maintain_aspect_ratio)
+
+        self.target_size = (width, height)
+        self.is_identity = (scaled_width, scaled_height, x, y) == (src_width, src_height, 0, 0) and \
+            (scaled_width, scaled_height) == (width, height)
+
+        # ناحیه قابل مشاهده تصویر در قاب خروجی (در حالت fill کل قاب)
+        left, top = max(0, x), max(0, y)
+        right, bottom = min(width, x + scaled_width), min(height, y + scaled_height)
+        self.dst_box = (left, top, right, bottom)
+        self.dst_size = (right - left, bottom - top)
+
+        # ناحیه متناظر در فریم منبع؛ بخش‌های بیرون از قاب اصلاً مقیاس‌دهی نمی‌شوند
+        scale_x = scaled_width / src_width
+        scale_y = scaled_height / src_height
+        self.src_box = ((left - x) / scale_x, (top - y) / scale_y,
+                        (right - x) / scale_x, (bottom - y) / scale_y)
+
+        self.covers_frame = self.dst_box == (0, 0, width, height)
+        self.frame = None
+        if not self.covers_frame:
+            # حاشیه‌ها فقط یک بار با رنگ پس‌زمینه پر می‌شوند
+            self.frame = np.empty((height, width, 3), dtype=np.uint8)
+            self.frame[:] = bg_color
+
+    def __call__(self, frame):
+        if self.is_identity:
+            return frame
+        resized = Image.fromarray(frame).resize(self.dst_size, Image.LANCZOS, box=self.src_box)
+        if self.covers_frame:
+            return np.asarray(resized)
+        left, top, right, bottom = self.dst_box
+        self.frame[top:bottom, left:right] = np.asarray(resized)
+        return self.frame
+
+
+def scale_clip(clip, target_size, scaling_mode, maintain_aspect_ratio, bg_color):
+    """اعمال FrameScaler روی فریم‌های یک کلیپ moviepy (بدون CompositeVideoClip)"""
+    scaler = FrameScaler(clip.size, target_size, scaling_mode, maintain_aspect_ratio, bg_color)
+    if scaler.is_identity:
+        return clip
+    scaled = clip.fl_image(scaler)
+    scaled.size = scaler.target_size
+    return scaled
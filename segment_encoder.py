@@ -0,0 +1,291 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from queue import Empty
+
+import numpy as np
+from proglog import ProgressBarLogger
+from moviepy.editor import VideoFileClip, AudioClip
+from moviepy.tools import find_extension
+
+from ffmpeg_tools import encode_still, encoder_profile_params
+from scaling import scale_clip, open_scaled_image
+
+
+# ترد هر انکودر قطعه در حالت خودکار؛ بقیه هسته‌ها به پردازه‌های رندر همزمان بیشتر داده می‌شوند
+THREADS_PER_SEGMENT_WORKER = 2
+
+# کمترین فاصله زمانی بین دو گزارش پیشرفت (ثانیه)؛ گزارش‌های بین آن در حلقه فریم‌ها اصلاً ساخته نمی‌شوند
+PROGRESS_INTERVAL = 0.1
+
+
+class SegmentCancelled(Exception):
+    """لغو رندر قطعه توسط کاربر"""
+
+
+def silent_audio(duration, fps):
+    """ساخت یک کلیپ صدای خالی استریو برای کلیپ‌های بدون صدا"""
+    def make_frame(t):
+        if isinstance(t, np.ndarray):
+            return np.zeros((len(t), 2))
+        return np.zeros(2)
+
+    return AudioClip(make_frame, duration=duration, fps=fps)
+
+
+def segment_params(reference):
+    """پارامترهای اضافه انکودر برای هم‌خوانی قطعه با مرجع (پروفایل و مقیاس زمانی)"""
+    ffmpeg_params = encoder_profile_params(reference["video_profile"])
+    if reference["timescale"]:
+        ffmpeg_params += ["-video_track_timescale", str(reference["timescale"])]
+    return ffmpeg_params
+
+
+def available_cpus():
+    """تعداد هسته‌های قابل استفاده این پردازه (با درنظر گرفتن محدودیت affinity در صورت وجود)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def segment_worker_count(workers, threads, cpu_budget=None):
+    """تعداد پردازه‌های رندر همزمان؛ مقدار 0 یعنی تقسیم هسته‌های سهم این کار بر تعداد ترد هر انکودر"""
+    if workers > 0:
+        return workers
+    return max(1, (cpu_budget or available_cpus()) // max(1, threads))
+
+
+def segment_encoding_plan(workers, threads, cpu_budget=None):
+    """تقسیم هسته‌های سهم کار بین پردازه‌های رندر قطعه و ترد هر انکودر؛ (workers, threads) برمی‌گرداند
+
+    مقدار 0 برای هر کدام یعنی خودکار: با تعداد پردازه ثابت، هسته‌ها بین آن‌ها تقسیم می‌شوند و در غیر این صورت
+    هر انکودر THREADS_PER_SEGMENT_WORKER ترد می‌گیرد و تعداد پردازه‌ها از باقی هسته‌ها به دست می‌آید.
+    """
+    cpu_budget = cpu_budget or available_cpus()
+    if threads <= 0:
+        if workers > 0:
+            threads = max(1, cpu_budget // workers)
+        else:
+            threads = min(THREADS_PER_SEGMENT_WORKER, cpu_budget)
+    return segment_worker_count(workers, threads, cpu_budget), threads
+
+
+def _segment_scaling(options):
+    """شیوه مقیاس‌دهی قطعه‌ها (مشترک بین تصاویر و ویدیوها): (scaling_mode, maintain_aspect_ratio)
+
+    قطعه باید هم‌اندازه قاب مرجع باشد؛ نسبت تصویر جز با غیرفعال بودن حفظ نسبت کشیده نمی‌شود
+    و بدون یکسان‌سازی ابعاد، کلیپ کامل در وسط قاب (با حاشیه) قرار می‌گیرد.
+    """
+    if not options["maintain_aspect_ratio"]:
+        return "stretch", False
+    if not options["normalize_all_clips"]:
+        return "fit", True
+    return options["scaling_mode"], True
+
+
+def _audio_extension(audio_codec):
+    """پسوند فایل صدای موقت برای یک کدک (Matroska برای کدک‌هایی که moviepy نمی‌شناسد)"""
+    try:
+        return find_extension(audio_codec)
+    except ValueError:
+        return "mka"
+
+
+class SegmentBarLogger(ProgressBarLogger):
+    """گزارش پیشرفت moviepy برای یک قطعه، همراه با بررسی توقف و لغو"""
+
+    def __init__(self, progress_fn, is_cancelled, wait_if_paused):
+        super().__init__(min_time_interval=PROGRESS_INTERVAL)
+        self.progress_fn = progress_fn
+        self.is_cancelled = is_cancelled
+        self.wait_if_paused = wait_if_paused
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        self.wait_if_paused()
+        if self.is_cancelled():
+            raise SegmentCancelled()
+        if attr == 'index' and bar in self.bars and self.bars[bar]['total']:
+            self.progress_fn(value / self.bars[bar]['total'])
+
+
+def encode_still_segment(job, progress_fn=None, is_cancelled=None):
+    """رندر یک تصویر به قطعه: مقیاس‌دهی یک‌باره با Pillow و حلقه تصویر با خود ffmpeg"""
+    reference = job["reference"]
+    options = job["options"]
+    ref_size = (reference["width"], reference["height"])
+    frame = open_scaled_image(job["file_path"], ref_size, *_segment_scaling(options), options["background_color"])
+
+    frame_path = os.path.splitext(job["segment_path"])[0] + ".png"
+    frame.save(frame_path, compress_level=1)
+    try:
+        audio = None
+        if reference["has_audio"]:
+            audio = {
+                "codec": options["audio_codec"],
+                "bitrate": options["audio_bitrate"],
+                "sample_rate": reference["sample_rate"],
+                "channel_layout": reference["channel_layout"],
+            }
+        return encode_still(
+            frame_path, job["segment_path"],
+            duration=options["image_duration"],
+            fps=reference["fps"],
+            video_codec=options["video_codec"],
+            video_bitrate=options["video_bitrate"],
+            preset=options["preset"],
+            threads=job["threads"],
+            audio=audio,
+            extra_params=segment_params(reference),
+            vfr=options["still_image_vfr"],
+            progress_fn=progress_fn,
+            is_cancelled=is_cancelled
+        )
+    finally:
+        os.remove(frame_path)
+
+
+def encode_video_segment(job, progress_fn=None, is_cancelled=None, wait_if_paused=None):
+    """رندر یک ویدیوی ناسازگار به قطعه‌ای با همان مشخصات استریم مرجع"""
+    reference = job["reference"]
+    options = job["options"]
+    ref_size = (reference["width"], reference["height"])
+    # فایل صدای موقت moviepy در پوشه قطعه‌های همین کار ساخته می‌شود (نه پوشه جاری پردازه)
+    # تا کارهای همزمان با شماره قطعه یکسان صدای یکدیگر را بازنویسی نکنند و پس از لغو باقی نماند
+    temp_audiofile = os.path.splitext(job["segment_path"])[0] + "_audio." + _audio_extension(options["audio_codec"])
+    clip = VideoFileClip(job["file_path"])
+    try:
+        clip = scale_clip(clip, ref_size, *_segment_scaling(options), options["background_color"])
+
+        # قطعه باید دقیقاً همان استریم‌های مرجع را داشته باشد
+        if reference["has_audio"] and clip.audio is None:
+            clip = clip.set_audio(silent_audio(clip.duration, reference["sample_rate"]))
+        elif not reference["has_audio"]:
+            clip = clip.without_audio()
+
+        logger = SegmentBarLogger(progress_fn or (lambda fraction: None),
+                                  is_cancelled or (lambda: False),
+                                  wait_if_paused or (lambda: None))
+        clip.write_videofile(
+            job["segment_path"],
+            codec=options["video_codec"],
+            bitrate=options["video_bitrate"],
+            audio_codec=options["audio_codec"],
+            audio_bitrate=options["audio_bitrate"],
+            audio_fps=reference["sample_rate"] or 44100,
+            fps=reference["fps"],
+            preset=options["preset"],
+            threads=job["threads"],
+            ffmpeg_params=segment_params(reference),
+            temp_audiofile=temp_audiofile,
+            logger=logger
+        )
+        return True
+    except SegmentCancelled:
+        return False
+    finally:
+        try:
+            clip.close()
+        except:
+            pass
+        if os.path.exists(temp_audiofile):
+            os.remove(temp_audiofile)
+
+
+def encode_segment_job(job, progress_fn=None, is_cancelled=None, wait_if_paused=None):
+    """رندر یک قطعه (تصویر یا ویدیو)؛ در صورت لغو False برمی‌گرداند"""
+    if job["kind"] == "image":
+        return encode_still_segment(job, progress_fn, is_cancelled)
+    return encode_video_segment(job, progress_fn, is_cancelled, wait_if_paused)
+
+
+# وضعیت مشترک هر پردازه رندر (در زمان ساخت پردازه مقداردهی می‌شود)
+_worker_state = {}
+
+
+def _init_worker(progress_queue, cancel_event, run_event):
+    """مقداردهی اولیه پردازه رندر با صف پیشرفت و رویدادهای لغو و اجرا"""
+    _worker_state["progress_queue"] = progress_queue
+    _worker_state["cancel_event"] = cancel_event
+    _worker_state["run_event"] = run_event
+
+
+def _run_worker_job(job):
+    """اجرای یک قطعه در پردازه رندر و ارسال پیشرفت آن به پردازه اصلی"""
+    progress_queue = _worker_state["progress_queue"]
+    cancel_event = _worker_state["cancel_event"]
+    run_event = _worker_state["run_event"]
+
+    def wait_if_paused():
+        # رویداد اجرا در توقف پاک و با ادامه یا لغو دوباره برقرار می‌شود
+        run_event.wait()
+
+    if cancel_event.is_set():
+        return False
+    return encode_segment_job(
+        job,
+        progress_fn=lambda fraction: progress_queue.put((job["index"], fraction)),
+        is_cancelled=cancel_event.is_set,
+        wait_if_paused=wait_if_paused
+    )
+
+
+def encode_segments(jobs, workers, progress_fn, is_cancelled, is_paused, done_fn=None):
+    """رندر موازی قطعه‌ها در چند پردازه جداگانه
+
+    progress_fn(index, fraction) پیشرفت هر قطعه و done_fn(index, error) پایان آن را گزارش می‌کند.
+    خروجی دیکشنری index -> خطا (یا None برای قطعه موفق) است؛ در صورت لغو قطعه‌های ناتمام در آن نیستند.
+    """
+    results = {}
+    # پردازه‌ها به‌صورت spawn ساخته می‌شوند تا fork از برنامه چندتردی Qt رخ ندهد
+    context = multiprocessing.get_context("spawn")
+    progress_queue = context.Queue()
+    cancel_event = context.Event()
+    run_event = context.Event()
+    run_event.set()
+
+    def drain_progress():
+        while True:
+            try:
+                index, fraction = progress_queue.get_nowait()
+            except Empty:
+                return
+            progress_fn(index, fraction)
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)) or 1, mp_context=context,
+                             initializer=_init_worker,
+                             initargs=(progress_queue, cancel_event, run_event)) as executor:
+        futures = {executor.submit(_run_worker_job, job): job["index"] for job in jobs}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            drain_progress()
+
+            if is_cancelled() and not cancel_event.is_set():
+                cancel_event.set()
+                # بیدار کردن پردازه‌های متوقف تا لغو را ببینند
+                run_event.set()
+                # قطعه‌هایی که هنوز شروع نشده‌اند اصلاً اجرا نمی‌شوند
+                for future in pending:
+                    future.cancel()
+            elif is_paused():
+                run_event.clear()
+            else:
+                run_event.set()
+
+            for future in done:
+                index = futures[future]
+                if future.cancelled():
+                    continue
+                try:
+                    completed = future.result()
+                except Exception as e:
+                    results[index] = e
+                else:
+                    if not completed:
+                        continue
+                    results[index] = None
+                if done_fn:
+                    done_fn(index, results[index])
+
+        drain_progress()
+    return results
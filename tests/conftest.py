@@ -0,0 +1,5 @@
+import os
+import sys
+
+# ماژول‌های برنامه در ریشه مخزن قرار دارند
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,104 @@
+import io
+from datetime import datetime
+
+import pytest
+from PIL import Image
+
+import ffmpeg_tools
+from ffmpeg_tools import FFmpegError, encode_still, parse_creation_time, parse_probe_output
+from media_cache import (EXIF_DATETIME_ORIGINAL, EXIF_IFD, EXIF_OFFSET_TIME_ORIGINAL,
+                         exif_capture_time)
+
+
+PHONE_VIDEO_OUTPUT = """\
+Input #0, mov,mp4,m4a,3gp,3g2,mj2, from 'clip.mp4':
+  Metadata:
+    major_brand     : isom
+    creation_time   : 2021-05-01T12:34:56.000000Z
+  Duration: 00:01:02.50, start: 0.000000, bitrate: 197 kb/s
+  Stream #0:0[0x1](und): Video: h264 (High) (avc1 / 0x31637661), yuv420p(progressive), 1920x1080 [SAR 1:1 DAR 16:9], 56 kb/s, 29.97 fps, 29.97 tbr, 90k tbn (default)
+      Metadata:
+        creation_time   : 2000-01-01T00:00:00.000000Z
+      Side data:
+        displaymatrix: rotation of -90.00 degrees
+  Stream #0:1[0x2](und): Audio: aac (LC) (mp4a / 0x6134706D), 48000 Hz, stereo, fltp, 128 kb/s (default)
+"""
+
+
+def test_parse_probe_output_reads_streams():
+    info = parse_probe_output(PHONE_VIDEO_OUTPUT)
+
+    assert info["duration"] == pytest.approx(62.5)
+    assert (info["video_codec"], info["video_profile"], info["pix_fmt"]) == ("h264", "High", "yuv420p")
+    assert (info["width"], info["height"], info["fps"], info["timescale"]) == (1920, 1080, 29.97, 90000)
+    assert info["rotation"] == 270
+    assert (info["audio_codec"], info["sample_rate"], info["channel_layout"]) == ("aac", 48000, "stereo")
+    # زمان ثبت از فراداده خود فایل خوانده می‌شود، نه از استریم‌ها
+    assert info["capture_time"] == datetime.fromisoformat("2021-05-01T12:34:56+00:00").timestamp()
+
+
+def test_parse_probe_output_ignores_attached_cover_art():
+    output = """\
+  Duration: 00:03:00.00, start: 0.000000, bitrate: 320 kb/s
+  Stream #0:0: Audio: mp3, 44100 Hz, stereo, fltp, 320 kb/s
+  Stream #0:1: Video: mjpeg (Baseline), yuvj420p(pc), 500x500, 90k tbr, 90k tbn (attached pic)
+"""
+    info = parse_probe_output(output)
+
+    assert info["has_audio"] and not info["has_video"]
+
+
+def test_parse_probe_output_rejects_unreadable_file():
+    with pytest.raises(FFmpegError):
+        parse_probe_output("clip.mp4: Invalid data found when processing input\n")
+
+
+def test_parse_creation_time():
+    assert parse_creation_time("2021-05-01T12:34:56Z") == \
+        datetime.fromisoformat("2021-05-01T12:34:56+00:00").timestamp()
+    # بدون منطقه زمانی، وقت جهانی فرض می‌شود
+    assert parse_creation_time("2021-05-01T12:34:56") == parse_creation_time("2021-05-01T12:34:56Z")
+    # تاریخ صفر دوربین‌های بدون ساعت و مقادیر نامعتبر
+    assert parse_creation_time("1970-01-01T00:00:00.000000Z") is None
+    assert parse_creation_time("1904-01-01T00:00:00Z") is None
+    assert parse_creation_time("unknown") is None
+
+
+def exif_with(values):
+    """EXIF یک تصویر JPEG که پس از ذخیره دوباره خوانده شده است (مانند probe_image)"""
+    exif = Image.Exif()
+    exif[EXIF_IFD] = values
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 4)).save(buffer, "JPEG", exif=exif)
+    buffer.seek(0)
+    return Image.open(buffer).getexif()
+
+
+def test_exif_capture_time_uses_recorded_offset():
+    exif = exif_with({EXIF_DATETIME_ORIGINAL: "2021:05:01 16:04:56",
+                      EXIF_OFFSET_TIME_ORIGINAL: "+03:30"})
+
+    assert exif_capture_time(exif) == datetime.fromisoformat("2021-05-01T12:34:56+00:00").timestamp()
+
+
+def test_exif_capture_time_without_offset_is_local_time():
+    exif = exif_with({EXIF_DATETIME_ORIGINAL: "2021:05:01 12:34:56"})
+
+    assert exif_capture_time(exif) == datetime(2021, 5, 1, 12, 34, 56).timestamp()
+
+
+def test_exif_capture_time_missing_or_invalid():
+    assert exif_capture_time(Image.Exif()) is None
+    assert exif_capture_time(exif_with({EXIF_DATETIME_ORIGINAL: "0000:00:00 00:00:00"})) is None
+
+
+@pytest.mark.parametrize("vfr", [False, True])
+def test_encode_still_keeps_configured_bitrate(monkeypatch, vfr):
+    calls = []
+    monkeypatch.setattr(ffmpeg_tools, "run_ffmpeg", lambda args, **kwargs: calls.append(args))
+
+    encode_still("frame.png", "segment.mp4", 3, 30, "libx264", "4000k", "fast", 2, vfr=vfr)
+
+    args = calls[0]
+    assert args[args.index("-b:v") + 1] == "4000k"
+    assert "-crf" not in args
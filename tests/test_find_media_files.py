@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from merge_job import find_media_files
+
+
+def touch(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"")
+    return str(path)
+
+
+@pytest.fixture
+def folder(tmp_path):
+    """پوشه نمونه با پسوندهای بزرگ و کوچک، فایل‌های مخفی و زیرپوشه"""
+    touch(tmp_path / "a.mp4")
+    touch(tmp_path / "B.JPG")
+    touch(tmp_path / "c.Mov")
+    touch(tmp_path / "notes.txt")
+    touch(tmp_path / ".hidden.mp4")
+    touch(tmp_path / ".stellar_segments" / "segment.mp4")
+    touch(tmp_path / "day2" / "d.png")
+    touch(tmp_path / "day2" / "deeper" / "e.mkv")
+    return tmp_path
+
+
+def names(files, root):
+    return sorted(os.path.relpath(path, root) for path in files)
+
+
+def test_extensions_are_case_insensitive_and_hidden_files_skipped(folder):
+    assert names(find_media_files(str(folder)), folder) == ["B.JPG", "a.mp4", "c.Mov"]
+
+
+def test_recursive_includes_subfolders_but_not_hidden_ones(folder):
+    assert names(find_media_files(str(folder), recursive=True), folder) == [
+        "B.JPG", "a.mp4", "c.Mov", os.path.join("day2", "d.png"), os.path.join("day2", "deeper", "e.mkv")]
+
+
+def test_missing_folder_raises(tmp_path):
+    with pytest.raises(OSError):
+        find_media_files(str(tmp_path / "missing"))
@@ -0,0 +1,67 @@
+import subprocess
+
+import pytest
+from PIL import Image
+
+from ffmpeg_tools import FFmpegError, get_ffmpeg_binary
+from frame_pipeline import render_frames
+
+FRAME_SIZE = (64, 48)
+FPS = 10
+ENCODER_ARGS = ["-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p"]
+
+
+def image_source(path, frames=5):
+    return {"kind": "image", "file_path": str(path), "frames": frames, "scaling": ("fit", True, (0, 0, 0))}
+
+
+def video_source(path, frames=5):
+    return {"kind": "video", "file_path": str(path), "frames": frames,
+            "filter": f"scale={FRAME_SIZE[0]}:{FRAME_SIZE[1]}"}
+
+
+def render(sources, output):
+    return render_frames(sources, str(output), FRAME_SIZE, FPS, ENCODER_ARGS,
+                         total_frames=sum(source["frames"] for source in sources))
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "photo.png"
+    Image.new("RGB", FRAME_SIZE, "blue").save(path)
+    return path
+
+
+def test_render_frames_writes_output(tmp_path, image):
+    video = tmp_path / "clip.mp4"
+    subprocess.run([get_ffmpeg_binary(), "-loglevel", "error", "-f", "lavfi", "-i",
+                    f"color=red:s={FRAME_SIZE[0]}x{FRAME_SIZE[1]}:d=1:r={FPS}", str(video)], check=True)
+    output = tmp_path / "out.mp4"
+
+    assert render([image_source(image), video_source(video)], output)
+    assert output.stat().st_size > 0
+
+
+def test_missing_image_fails_instead_of_truncating(tmp_path, image):
+    with pytest.raises(FFmpegError):
+        render([image_source(image), image_source(tmp_path / "missing.png")], tmp_path / "out.mp4")
+
+
+def test_corrupt_video_fails_instead_of_truncating(tmp_path, image):
+    video = tmp_path / "broken.mp4"
+    video.write_bytes(b"\0" * 4096)
+
+    with pytest.raises(FFmpegError):
+        render([image_source(image), video_source(video)], tmp_path / "out.mp4")
+
+
+def test_video_shorter_than_its_audio_is_padded(tmp_path):
+    # کانتینر سه ثانیه بیشتر از استریم ویدیو طول می‌کشد (صدای طولانی‌تر)
+    video = tmp_path / "clip.mp4"
+    subprocess.run([get_ffmpeg_binary(), "-loglevel", "error",
+                    "-f", "lavfi", "-i", f"color=red:s={FRAME_SIZE[0]}x{FRAME_SIZE[1]}:d=1:r={FPS}",
+                    "-f", "lavfi", "-i", "anullsrc=d=4", "-c:a", "aac", str(video)], check=True)
+    output = tmp_path / "out.mp4"
+
+    assert render([video_source(video, frames=4 * FPS)], output)
+    assert output.stat().st_size > 0
@@ -0,0 +1,80 @@
+import os
+
+from PIL import Image
+
+from engine import job_spec, run_job
+from job_manifest import is_up_to_date, manifest_path, write_manifest
+from merge_job import output_file_path
+
+
+SETTINGS = {"output_resolution": "720p", "scaling_mode": "fit", "threads": 0, "cpu_share": 4}
+
+
+def merged_folder(tmp_path):
+    """پوشه‌ای با دو ورودی و خروجی که مشخصات آن ثبت شده است"""
+    inputs = []
+    for name in ("a.mp4", "b.jpg"):
+        path = tmp_path / name
+        path.write_bytes(name.encode())
+        inputs.append(str(path))
+    output = tmp_path / "merged.mp4"
+    output.write_bytes(b"output")
+    write_manifest(str(output), inputs, SETTINGS)
+    return str(output), inputs
+
+
+def test_unchanged_output_is_up_to_date(tmp_path):
+    output, inputs = merged_folder(tmp_path)
+
+    assert os.path.basename(manifest_path(output)) == ".merged.mp4.stellar.json"
+    assert is_up_to_date(output, inputs, SETTINGS)
+    # تنظیماتی که روی خروجی اثری ندارند مقایسه نمی‌شوند
+    assert is_up_to_date(output, inputs, dict(SETTINGS, threads=8, cpu_share=1))
+
+
+def test_changes_make_output_stale(tmp_path):
+    output, inputs = merged_folder(tmp_path)
+
+    assert not is_up_to_date(output, list(reversed(inputs)), SETTINGS)
+    assert not is_up_to_date(output, inputs[:1], SETTINGS)
+    assert not is_up_to_date(output, inputs, dict(SETTINGS, scaling_mode="fill"))
+
+    with open(inputs[0], "ab") as input_file:
+        input_file.write(b"more")
+    assert not is_up_to_date(output, inputs, SETTINGS)
+
+
+def test_edited_or_missing_output_is_stale(tmp_path):
+    output, inputs = merged_folder(tmp_path)
+    with open(output, "ab") as output_file:
+        output_file.write(b"edited")
+    assert not is_up_to_date(output, inputs, SETTINGS)
+
+    os.remove(output)
+    assert not is_up_to_date(output, inputs, SETTINGS)
+
+
+def test_missing_or_corrupt_manifest_is_stale(tmp_path):
+    output, inputs = merged_folder(tmp_path)
+    with open(manifest_path(output), "w") as manifest_file:
+        manifest_file.write("{")
+    assert not is_up_to_date(output, inputs, SETTINGS)
+
+    os.remove(manifest_path(output))
+    assert not is_up_to_date(output, inputs, SETTINGS)
+
+
+def test_job_with_skipped_file_is_not_recorded(tmp_path):
+    folder = tmp_path / "trip"
+    folder.mkdir()
+    Image.new("RGB", (32, 24), "red").save(folder / "photo.jpg")
+    # فایلی که هنوز کامل کپی نشده است
+    (folder / "clip.mp4").write_bytes(b"\0" * 4096)
+    spec = job_spec(str(folder), cache_dir=str(tmp_path / "cache"))
+    output = output_file_path(spec.folder_path, spec.settings)
+
+    success, message = run_job(spec)
+
+    assert success, message
+    assert os.path.exists(output)
+    assert not os.path.exists(manifest_path(output))
@@ -0,0 +1,109 @@
+import threading
+
+from job_queue import JobQueue
+
+
+def make_queue(cpu_budget, jobs=(), **kwargs):
+    """صف با تعداد هسته مشخص و زمان ورود صفر برای همه کارها"""
+    queue = JobQueue(**kwargs)
+    queue.cpu_budget = cpu_budget
+    for job in jobs:
+        queue.add(job)
+        queue.enqueued_at[job] = 0.0
+    return queue
+
+
+def order(queue, now):
+    known = list(queue.costs.values())
+    default_cost = sum(known) / len(known) if known else 1.0
+    return sorted(queue.queue, key=lambda job: queue._queue_rank(job, now, default_cost))
+
+
+def test_shortest_first_ages_long_jobs():
+    queue = make_queue(8, ["long", "short"])
+    queue.costs.update({"long": 100.0, "short": 10.0})
+
+    assert order(queue, now=10.0) == ["short", "long"]
+
+    # کار کوتاهی که تازه وارد شده از کار طولانی که مدت زیادی منتظر مانده جلو نمی‌زند
+    queue.add("new")
+    queue.enqueued_at["new"] = 1000.0
+    queue.costs["new"] = 10.0
+    assert order(queue, now=1000.0) == ["short", "long", "new"]
+
+
+def test_high_priority_and_fifo():
+    queue = make_queue(8, ["a", "b", "c"], policy="fifo")
+    queue.enqueued_at.update({"a": 1.0, "b": 2.0, "c": 3.0})
+    assert order(queue, now=10.0) == ["a", "b", "c"]
+
+    queue.set_high_priority("c", True)
+    assert order(queue, now=10.0) == ["c", "a", "b"]
+
+
+def test_take_ready_splits_free_cores():
+    queue = make_queue(8, ["a", "b", "c"])
+
+    assert sorted(queue.take_ready()) == [("a", 2), ("b", 2), ("c", 2)]
+
+    queue.add("d")
+    queue.add("e")
+    # حداکثر چهار کار همزمان با دو هسته برای هر کار
+    assert queue.take_ready() == [("d", 2)]
+    assert queue.queue == ["e"]
+
+
+def test_lone_job_leaves_cores_for_later_jobs():
+    queue = make_queue(8, ["long"])
+    assert queue.take_ready() == [("long", 2)]
+
+    # کاری که بعداً اضافه می‌شود منتظر پایان کار طولانی نمی‌ماند
+    queue.add("dropped")
+    assert queue.take_ready() == [("dropped", 2)]
+
+
+def test_take_ready_reuses_cores_of_suspended_jobs():
+    queue = make_queue(4, ["a", "b", "c"])
+    assert queue.take_ready() == [("a", 2), ("b", 2)]
+    assert queue.take_ready() == []
+
+    # هسته‌های کار متوقف شده به کار بعدی صف داده می‌شود
+    queue.suspend("a")
+    assert queue.take_ready() == [("c", 2)]
+
+    assert queue.remove("a")
+    assert queue.free_cores() == 0
+
+
+def test_take_ready_with_fixed_concurrency():
+    queue = make_queue(8, ["a", "b", "c", "d"], max_concurrent=3)
+
+    assert [share for job, share in queue.take_ready()] == [2, 2, 2]
+    assert queue.queue == ["d"]
+
+
+def test_single_core_still_runs_one_job():
+    queue = make_queue(1, ["a", "b"])
+
+    assert queue.take_ready() == [("a", 1)]
+
+
+def test_cost_of_job_dequeued_during_estimate_is_dropped():
+    estimating = threading.Event()
+    release = threading.Event()
+
+    def estimate(job):
+        estimating.set()
+        release.wait(5)
+        return 10.0
+
+    queue = make_queue(8, estimate_fn=estimate)
+    queue.add("a")
+    assert estimating.wait(5)
+    assert queue.take_ready() == [("a", 2)]
+
+    release.set()
+    # منتظر پایان برآوردهای پس‌زمینه
+    for _ in range(2):
+        assert queue.estimate_slots.acquire(timeout=5)
+    assert queue.costs == {}
@@ -0,0 +1,43 @@
+import time
+
+from media_cache import SegmentCache
+
+
+def rendered_segment(tmp_path, name, size=1000):
+    path = tmp_path / name
+    path.write_bytes(b"\0" * size)
+    return str(path)
+
+
+def test_evict_keeps_segments_leased_by_another_job(tmp_path):
+    cache_dir = str(tmp_path / "segments")
+    # دو نمونه روی یک پوشه، مانند دو پردازه کار
+    job_cache = SegmentCache(cache_dir)
+    other_cache = SegmentCache(cache_dir)
+
+    stored = job_cache.store("stored", rendered_segment(tmp_path, "a.mp4"), "job")
+    other_cache.store("looked-up", rendered_segment(tmp_path, "b.mp4"), "other")
+    other_cache.release("other")
+    looked_up = job_cache.lookup("looked-up", "job")
+
+    other_cache.evict(0)
+    assert job_cache.lookup("stored", "job") == stored
+    assert job_cache.lookup("looked-up", "job") == looked_up
+
+    job_cache.release("job")
+    other_cache.evict(0)
+    assert job_cache.lookup("stored", "job") is None
+    assert job_cache.lookup("looked-up", "job") is None
+
+
+def test_evict_removes_least_recently_used_first(tmp_path):
+    cache = SegmentCache(str(tmp_path / "segments"))
+    cache.store("old", rendered_segment(tmp_path, "old.mp4"), "job")
+    time.sleep(0.01)
+    cache.store("new", rendered_segment(tmp_path, "new.mp4"), "job")
+    cache.release("job")
+
+    cache.evict(1000)
+
+    assert cache.lookup("old", "job") is None
+    assert cache.lookup("new", "job") is not None
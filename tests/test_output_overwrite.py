@@ -0,0 +1,42 @@
+from PIL import Image
+
+from engine import job_spec, run_job
+from merge_job import output_file_path
+
+
+def make_folder(tmp_path):
+    """پوشه‌ای با یک تصویر و یک فایل خروجی قبلی"""
+    folder = tmp_path / "trip"
+    folder.mkdir()
+    Image.new("RGB", (32, 24), "red").save(folder / "photo.jpg")
+    spec = job_spec(str(folder), cache_dir=str(tmp_path / "cache"))
+    output = output_file_path(spec.folder_path, spec.settings)
+    with open(output, "wb") as output_file:
+        output_file.write(b"previous output")
+    return spec, output
+
+
+def test_declined_overwrite_keeps_existing_output(tmp_path):
+    spec, output = make_folder(tmp_path)
+    asked = []
+
+    def decline(job, path):
+        asked.append(path)
+        job.confirm_overwrite(False)
+
+    success, _ = run_job(spec, on_output_exists=decline)
+
+    assert asked == [output]
+    assert not success
+    with open(output, "rb") as output_file:
+        assert output_file.read() == b"previous output"
+
+
+def test_existing_output_untouched_without_callback(tmp_path):
+    spec, output = make_folder(tmp_path)
+
+    success, _ = run_job(spec)
+
+    assert not success
+    with open(output, "rb") as output_file:
+        assert output_file.read() == b"previous output"
@@ -0,0 +1,57 @@
+import subprocess
+
+from ffmpeg_tools import get_ffmpeg_binary, probe_media
+from merge_job import DEFAULT_SETTINGS, MergeJob, job_settings
+from segment_encoder import _segment_scaling, encode_video_segment, segment_encoding_plan
+
+OPTIONS = {
+    "video_codec": "libx264", "video_bitrate": "200k", "audio_codec": "aac", "audio_bitrate": "64k",
+    "preset": "ultrafast", "image_duration": 1, "still_image_vfr": False,
+    "scaling_mode": "fill", "maintain_aspect_ratio": True, "normalize_all_clips": True,
+    "background_color": (0, 0, 0),
+}
+
+
+def test_segment_scaling_keeps_aspect_ratio_without_normalization():
+    assert _segment_scaling(OPTIONS) == ("fill", True)
+    assert _segment_scaling(dict(OPTIONS, normalize_all_clips=False)) == ("fit", True)
+    assert _segment_scaling(dict(OPTIONS, maintain_aspect_ratio=False)) == ("stretch", False)
+
+
+def test_segment_encoding_plan_splits_cpu_share():
+    # خودکار: چند پردازه با چند ترد، نه یک پردازه با همه هسته‌ها
+    assert segment_encoding_plan(0, 0, 8) == (4, 2)
+    assert segment_encoding_plan(0, 0, 1) == (1, 1)
+    assert segment_encoding_plan(2, 0, 8) == (2, 4)
+    assert segment_encoding_plan(0, 4, 8) == (2, 4)
+    assert segment_encoding_plan(3, 1, 8) == (3, 1)
+
+
+def test_segment_options_do_not_depend_on_cpu_share(tmp_path):
+    def options(cpu_share):
+        settings = job_settings(DEFAULT_SETTINGS, str(tmp_path), cpu_share)
+        return MergeJob(str(tmp_path), settings, lambda message: None).segment_options()
+
+    assert "threads" not in options(2)
+    assert options(2) == options(16)
+
+
+def test_video_segment_temp_audio_stays_in_segments_dir(tmp_path, monkeypatch):
+    source = tmp_path / "clip.mp4"
+    subprocess.run([get_ffmpeg_binary(), "-loglevel", "error",
+                    "-f", "lavfi", "-i", "color=red:s=64x48:d=1:r=10",
+                    "-f", "lavfi", "-i", "sine=d=1", "-shortest", str(source)], check=True)
+    reference = probe_media(str(source))
+    reference.update(width=80, height=48)
+    segments_dir = tmp_path / "segments"
+    segments_dir.mkdir()
+    working_dir = tmp_path / "cwd"
+    working_dir.mkdir()
+    monkeypatch.chdir(working_dir)
+
+    job = {"index": 0, "file_path": str(source), "segment_path": str(segments_dir / "00000.mp4"),
+           "kind": "video", "reference": reference, "options": OPTIONS, "threads": 1}
+    assert encode_video_segment(job)
+
+    assert list(working_dir.iterdir()) == []
+    assert [path.name for path in segments_dir.iterdir()] == ["00000.mp4"]
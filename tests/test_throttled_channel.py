@@ -0,0 +1,32 @@
+import time
+
+from merge_job import EventChannel, ThrottledChannel
+
+
+def test_coalesces_to_latest_value_per_interval():
+    sent = []
+    channel = ThrottledChannel(sent.append, "progress", interval=0.05)
+
+    for percent in range(10):
+        channel.emit("job", percent)
+    # اولین مقدار فوراً و بقیه فقط به‌صورت آخرین مقدار در پایان بازه ارسال می‌شوند
+    assert sent == [("progress", "job", 0)]
+
+    time.sleep(0.2)
+    assert sent == [("progress", "job", 0), ("progress", "job", 9)]
+
+
+def test_flush_sends_pending_value_once():
+    sent = []
+    channel = ThrottledChannel(sent.append, "stage", interval=10)
+    finished = EventChannel(sent.append, "finished", before_send=channel.flush)
+
+    channel.emit("job", "a")
+    channel.emit("job", "b")
+    channel.emit("job", "c")
+    # پیام پایان کار پس از آخرین مرحله در انتظار ارسال می‌شود
+    finished.emit("job", True, "")
+    channel.flush()
+
+    assert sent == [("stage", "job", "a"), ("stage", "job", "c"), ("finished", "job", True, "")]
+    assert channel.timer is None